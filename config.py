@@ -8,6 +8,8 @@ load_dotenv(override=True)
 # --- 基础配置 ---
 # 摄像头索引或视频路径
 SOURCE_VIDEO = 0  
+# 摄像头标识，写入事件用于区分多路画面
+CAMERA_ID = "cam0"
 # 检测频率 (秒)
 PROCESS_INTERVAL = 2
 # 高频采样/切片逻辑
@@ -15,6 +17,42 @@ FRAME_CAPTURE_INTERVAL = 2
 EVENT_MAX_DURATION_SECONDS = 60
 EVENT_INACTIVITY_TIMEOUT = 30
 
+# --- 本地风险信号与分析优先级 ---
+# 宽高比低于该值视为竖直 (站/坐)，高于 LYING 值视为横躺
+RISK_UPRIGHT_RATIO = 0.8
+RISK_LYING_RATIO = 1.2
+# 人体框顶部低于画面该比例高度时视为“位置偏低”
+RISK_LOW_POSITION_RATIO = 0.55
+# 相邻采样帧位移 (按框对角线归一化) 超过该值视为明显移动
+RISK_MOTION_THRESHOLD = 0.3
+RISK_STILLNESS_SECONDS = 20
+# 风险分数 -> 优先级：>= 第 0 个阈值为最高级 (走抢占通道)，依次类推
+RISK_PRIORITY_THRESHOLDS = [0.6, 0.3]
+# 常规分析线程数与最高级事件专用线程数
+ANALYSIS_WORKERS = 1
+ANALYSIS_URGENT_WORKERS = 1
+
+# --- 实时告警 (逐帧检测框规则引擎) ---
+ALERT_ENABLED = True
+# 单位：秒 / 比例。摄像头可在同名键下覆盖任意一项，例如 "cam0": {"inactivity_seconds": 900}
+ALERT_RULES = {
+    "default": {
+        "fall_window": 6,               # 判断“由竖直变横躺”的回看窗口
+        "fall_confirm": 4,              # 横躺需持续的时长，过滤单帧抖动
+        "drop_ratio": 0.5,              # 窗口内中心下降超过框高的比例，视为骤降
+        "still_threshold": 0.1,         # 位移低于框对角线该比例视为静止
+        "inactivity_seconds": 1800,     # 竖直姿态下长时间无动作
+        "lying_inactivity_seconds": 60, # 横躺姿态下无动作
+        "cooldown_seconds": 300,        # 同一摄像头同类告警的冷却时间
+        "track_timeout": 10
+    }
+}
+ALERT_LOG_PATH = "./memory_db/alerts.jsonl"
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL", "")
+ALERT_SNAPSHOT_DIR = "./event_images/alerts"
+# 告警触发后是否请 LVM 异步复核
+ALERT_LVM_CONFIRM = True
+
 # --- 存储路径 ---
 LANCEDB_PATH = "./memory_db/lancedb"
 SQLITE_DB_PATH = "./memory_db/knowledge.db"
@@ -26,13 +64,107 @@ LVM_API_KEY = os.getenv("LVM_API_KEY", "")
 LVM_BASE_URL = os.getenv("LVM_BASE_URL", "https://aistudio.baidu.com/llm/lmapi/v3")
 LVM_MODEL_NAME = "ernie-4.5-turbo-vl"  # 视觉模型
 
+# 关键帧预算：按事件时长自适应，图片数量是 LVM 延迟与费用的主要来源
+LVM_MIN_IMAGES = 3
+LVM_MAX_IMAGES = 15
+LVM_IMAGES_PER_MINUTE = 8
+# 低于该信息量分数的帧在满足最低预算后不再发送
+KEYFRAME_MIN_SCORE = 0.15
+# 单次调用模式：视觉模型同时输出摘要与知识图谱，校验失败时才单独调用 LLM 抽取
+LVM_FUSED_KG = True
+# 知识图谱批量抽取：需要单独抽取时，攒够 N 个事件或等待窗口到期后合并成一次 LLM 调用
+KG_BATCH_ENABLED = True
+KG_BATCH_MAX_EVENTS = 8
+KG_BATCH_WINDOW_SECONDS = 120
+# 向量写入缓冲：攒批 encode 并一次写入 LanceDB，减少 fragment 数量
+VECTOR_BATCH_SIZE = 32
+VECTOR_FLUSH_SECONDS = 30
+# 向量表维护：定期合并 fragment、清理旧版本，行数足够后建立 IVF-PQ 索引
+LANCE_MAINTENANCE_INTERVAL = 3600
+LANCE_CLEANUP_OLDER_THAN_HOURS = 24
+LANCE_INDEX_MIN_ROWS = 5000
+LANCE_INDEX_MIN_COVERAGE = 0.8     # 未被索引的新行超过 20% 时重建
+LANCE_INDEX_METRIC = "l2"
+LANCE_INDEX_NUM_PARTITIONS = None  # None 时按行数自动选择
+LANCE_INDEX_NUM_SUB_VECTORS = 48   # 需整除向量维度 384
+LANCE_SEARCH_NPROBES = 20
+LANCE_SEARCH_REFINE_FACTOR = 5
+# 知识图谱写入：(name, type) -> id 缓存容量
+KG_ENTITY_CACHE_SIZE = 5000
+# 混合检索：向量与全文检索各取 top_k * FACTOR 个候选，按倒数排名融合 (RRF)
+HYBRID_CANDIDATE_FACTOR = 4
+HYBRID_RRF_K = 60
+# 人员在场时间线：同一人在同一摄像头两次被识别的间隔不超过容差即视为连续在场；每隔 N 秒把区间写入 SQLite
+PRESENCE_GAP_TOLERANCE = 30
+PRESENCE_FLUSH_SECONDS = 10
+# 逐帧检测日志 (Arrow IPC，按小时滚动)：每 N 行或 N 秒由后台线程写入一批
+DETECTION_LOG_ENABLED = True
+DETECTION_LOG_PATH = "./memory_db/detections"
+DETECTION_LOG_FLUSH_ROWS = 512
+DETECTION_LOG_FLUSH_SECONDS = 10
+# 活动热力图：画面划分的网格 (行, 列)，内存增量每 N 秒合并进 SQLite
+HEATMAP_GRID = (36, 64)
+HEATMAP_FLUSH_SECONDS = 60
+# 按月分区：热库保留最近 N 个月 (含当月) 的事件，更早的月份封存为只读分片
+PARTITION_HOT_MONTHS = 2
+PARTITION_ARCHIVE_PATH = "./memory_db/archive"
+# 数据保留 (后台低优先级任务，每 N 秒一轮)：事件全部帧保留 N 天 -> 只留预览图 N 天 -> 只留摘要 N 天后删除 (None 为永久保留)
+RETENTION_ENABLED = True
+RETENTION_DRY_RUN = False           # 只生成清理报告，不删除任何数据
+RETENTION_INTERVAL = 3600
+RETENTION_FULL_FRAMES_DAYS = 7
+RETENTION_PREVIEW_DAYS = 90
+RETENTION_SUMMARY_DAYS = None
+RETENTION_DETECTION_LOG_DAYS = 30
+RETENTION_SNAPSHOT_DAYS = 90        # 告警快照
+# 图片所在磁盘使用率超过高水位时，按时间从旧到新提前清理 (检测日志 -> 完整帧 -> 预览图)，直到低于低水位；摘要不受影响
+RETENTION_DISK_HIGH_WATER = 0.90
+RETENTION_DISK_LOW_WATER = 0.80
+RETENTION_BATCH_SIZE = 200
+RETENTION_BATCH_PAUSE = 0.2         # 批次之间暂停，让出磁盘 IO
+# 重复事件跳过：与同一摄像头上一个已分析事件的身份、人数、框布局和画面哈希都一致时，复用其分析结果
+DEDUP_ENABLED = True
+DEDUP_MIN_BOX_IOU = 0.6
+DEDUP_MAX_HASH_DISTANCE = 0.15
+# 与上一事件的间隔超过该值视为新场景
+DEDUP_MAX_GAP_SECONDS = 90
+# 连续复用的最长跨度，超过后强制重新分析一次
+DEDUP_MAX_CHAIN_SECONDS = 600
+
 # --- 语言大模型 API 配置 (LLM) ---
 LLM_API_KEY = os.getenv("LLM_API_KEY", "")
 LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://aistudio.baidu.com/llm/lmapi/v3")
 LLM_MODEL_NAME = "ernie-4.5-21b-a3b-thinking"  # 思考/总结模型
 
+# --- 模型调用网关 (异步客户端：并发上限、限流、超时与重试) ---
+# 每个模型同时在途的请求数
+LLM_MAX_CONCURRENCY = {"default": 4, LVM_MODEL_NAME: 2}
+# 每个服务地址的令牌桶限流：平均每秒请求数与突发容量
+LLM_RATE_LIMIT_RPS = 2.0
+LLM_RATE_LIMIT_BURST = 4
+# 单次请求超时与整次调用 (含重试) 的截止时间，单位秒
+LLM_REQUEST_TIMEOUT = 60
+LLM_DEADLINE_SECONDS = 150
+# 日报等长文本生成单独放宽
+LLM_REPORT_TIMEOUT = 180
+LLM_REPORT_DEADLINE_SECONDS = 400
+LLM_MAX_RETRIES = 3
+LLM_RETRY_BASE_DELAY = 1.0
+LLM_RETRY_MAX_DELAY = 20.0
+
+# --- 模型响应缓存 (LVM / LLM 共用，按模型、参数、Prompt 与图片哈希寻址) ---
+LLM_CACHE_PATH = "./memory_db/llm_cache.db"
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+LLM_CACHE_MAX_MB = 256
+# 设为 1 时跳过缓存读取 (仍会写入)，用于强制重新分析
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "0") == "1"
+
 # --- 其他模型 ---
 EMBEDDING_MODEL_PATH = "sentence-transformers/all-MiniLM-L6-v2"
+# 查询向量 LRU 缓存与编码线程攒批
+EMBED_CACHE_SIZE = 2048
+EMBED_BATCH_MAX = 32
+EMBED_MAX_WAIT_MS = 5
 
 # PaddlePaddle 设置
 DET_MODEL_NAME = "PPLCNet_x1_0_person_detection"
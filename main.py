@@ -9,7 +9,6 @@ import logging
 import sys
 import threading
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
 import cv2
 import config
 
@@ -72,10 +71,34 @@ def main():
         from src.memory.long_term_memory import LongTermMemory
         print("  [Init] 正在连接记忆库...")
         ltm = LongTermMemory(config.LANCEDB_PATH, config.SQLITE_DB_PATH)
+        ltm.repair_pending_vectors()
+        from src.memory.vector_maintenance import VectorMaintenance
+        vector_maintenance = VectorMaintenance(ltm).start()
+        retention = None
+        if config.RETENTION_ENABLED:
+            from src.memory.retention import RetentionEngine
+            retention = RetentionEngine(ltm).start()
         
         from src.cognition.cognitive_core import CognitiveCore
         cognition = CognitiveCore()
         
+        tracker = alert_engine = detection_log = None
+        if config.ALERT_ENABLED or config.DETECTION_LOG_ENABLED:
+            from src.perception.tracker import SimpleTracker
+            tracker = SimpleTracker()
+        if config.ALERT_ENABLED:
+            from src.perception.alert_engine import AlertEngine, build_alert_sinks
+            alert_engine = AlertEngine(build_alert_sinks(), cognition.confirm_alert if config.ALERT_LVM_CONFIRM else None)
+        
+        kg_batcher = None
+        if config.KG_BATCH_ENABLED:
+            from src.cognition.kg_batcher import KGBatchExtractor
+            kg_batcher = KGBatchExtractor(cognition, ltm)
+        
+        if config.DETECTION_LOG_ENABLED:
+            from src.perception.detection_log import DetectionLog
+            detection_log = DetectionLog()
+        
     except Exception as e:
         print(f"❌ 初始化失败: {e}")
         return
@@ -89,7 +112,8 @@ def main():
         print(f"❌ 摄像头启动失败: {e}")
         return
 
-    executor = ThreadPoolExecutor(max_workers=1)
+    from src.cognition.analysis_queue import AnalysisScheduler
+    scheduler = AnalysisScheduler(lambda evt: bg_analyze(evt, cognition, ltm, kg_batcher))
     last_process_time = 0 
     
     try:
@@ -118,24 +142,38 @@ def main():
                 detections = perception.process_frame(small_frame)
                 
                 # B. 坐标还原 & 状态反馈
+                # 还原坐标到原图尺寸
+                for det in detections:
+                    if 'box' in det:
+                        det['box'] = [int(c / scale) for c in det['box']]
+                    if 'face_box' in det and det['face_box']:
+                        det['face_box'] = [int(c / scale) for c in det['face_box']]
+                
+                if tracker: tracker.update(detections, current_time)
+                
+                # 实时告警：逐帧规则判断，不等待事件结束
+                if alert_engine:
+                    alert_engine.process(config.CAMERA_ID, current_time, detections, (w, h), frame)
+                
+                # 逐帧检测日志 (后台批量写入)
+                if detection_log: detection_log.append(config.CAMERA_ID, current_time, detections, (w, h))
+                
+                # 在场时间线与活动热力图：逐帧在内存中累加，定期批量落库
+                ltm.presence.observe(config.CAMERA_ID, current_time, detections)
+                ltm.heatmap.observe(config.CAMERA_ID, current_time, detections, (w, h))
+                
                 if not detections:
                     print(f"[{current_time_str}] 💤 空间闲置中...", end='\r')
                 else:
-                    # 还原坐标到原图尺寸
-                    for det in detections:
-                        if 'box' in det:
-                            det['box'] = [int(c / scale) for c in det['box']]
-                        if 'face_box' in det and det['face_box']:
-                            det['face_box'] = [int(c / scale) for c in det['face_box']]
-
                     # C. 记忆流
                     event_pack = memory_stream.update(frame, detections)
                     
                     # D. 后台分析
                     if event_pack:
                         duration = event_pack['end_time'] - event_pack['start_time']
-                        print(f"\n📦 [{current_time_str}] 生成事件片段 ({duration:.1f}s) -> 提交大脑分析")
-                        executor.submit(bg_analyze, event_pack, cognition, ltm)
+                        risk = f" | ⚠️ 风险 {event_pack['risk_score']:.2f}: {', '.join(event_pack['risk_reasons'])}" if event_pack['risk_reasons'] else ""
+                        print(f"\n📦 [{current_time_str}] 生成事件片段 ({duration:.1f}s, P{event_pack['priority']}){risk} -> 提交大脑分析")
+                        scheduler.submit(event_pack)
 
             time.sleep(0.01)
 
@@ -143,12 +181,17 @@ def main():
         print("\n🛑 系统停止")
     finally:
         cam_loader.stop()
-        executor.shutdown(wait=False)
-
-def bg_analyze(event, cognition, ltm):
+        scheduler.stop()
+        if kg_batcher: kg_batcher.stop(timeout=30)
+        if detection_log: detection_log.stop(timeout=10)
+        vector_maintenance.stop(timeout=5)
+        if retention: retention.stop(timeout=5)
+        ltm.close(timeout=60)
+
+def bg_analyze(event, cognition, ltm, kg_batcher=None):
     """后台分析线程"""
     try:
-        result = cognition.analyze_event(event)
+        result = cognition.analyze_event(event, defer_kg=kg_batcher is not None)
         if result:
             success = ltm.save_event(
                 event_data=event, 
@@ -157,11 +200,14 @@ def bg_analyze(event, cognition, ltm):
                 scene_label=result.get('scene_label'),
                 interaction_score=result.get('interaction_score')
             )
+            if success and result.get('kg_pending'):
+                kg_batcher.submit(event['event_id'], result['summary'])
             if success:
                 # 打印更详细的日志以便调试
                 label = result.get('scene_label')
                 score = result.get('interaction_score')
-                print(f"💾 [入库] {label} (Score:{score}) | {result['summary'][:20]}...")
+                reused = f" (复用 {result['reused_from']})" if result.get('reused_from') else ""
+                print(f"💾 [入库]{reused} {label} (Score:{score}) | {result['summary'][:20]}...")
     except Exception as e:
         print(f"❌ [后台异常] {e}")
 
@@ -1,19 +1,62 @@
 # src/agent/master_agent.py
 import logging
-from openai import OpenAI
+from src.llm.client import create_chat_client
 import config
 from src.memory.long_term_memory import LongTermMemory
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
+import re
 import traceback
 
 logger = logging.getLogger(__name__)
 
+# 时段关键词 -> (起始小时, 结束小时)
+DAY_PARTS = {"凌晨": (0, 6), "早上": (5, 10), "早晨": (5, 10), "上午": (6, 12), "中午": (11, 14),
+             "下午": (12, 18), "傍晚": (17, 20), "晚上": (18, 24), "夜里": (20, 24), "今晚": (18, 24)}
+DAY_OFFSETS = {"今天": 0, "今日": 0, "今晚": 0, "昨天": 1, "昨日": 1, "昨晚": 1, "前天": 2}
+
+
+def infer_time_range(query, now=None):
+    """
+    从问题中解析时间范围 (本地规则，不调用模型)，返回 (start_ts, end_ts) 或 None。
+    支持：今天/昨天/前天 + 上午/下午/晚上等时段、最近N天/小时、本周、上周。
+    """
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    m = re.search(r"(?:最近|过去|近)\s*(\d+)\s*(天|小时|个小时)", query)
+    if m:
+        n = int(m.group(1))
+        delta = timedelta(days=n) if m.group(2) == "天" else timedelta(hours=n)
+        return (now - delta).timestamp(), now.timestamp()
+    if "本周" in query or "这周" in query:
+        return (today - timedelta(days=today.weekday())).timestamp(), now.timestamp()
+    if "上周" in query:
+        start = today - timedelta(days=today.weekday() + 7)
+        return start.timestamp(), (start + timedelta(days=7)).timestamp()
+
+    day = next((today - timedelta(days=off) for word, off in DAY_OFFSETS.items() if word in query), None)
+    if "昨晚" in query: part = DAY_PARTS["晚上"]
+    else: part = next((hours for word, hours in DAY_PARTS.items() if word in query), None)
+    if day is None and part is None: return None
+    day = day or today
+    start_h, end_h = part or (0, 24)
+    return (day + timedelta(hours=start_h)).timestamp(), (day + timedelta(hours=end_h)).timestamp()
+
+# 可由在场时间线直接回答的问题：到达 / 离开 / 停留时长 / 是否在场
+PRESENCE_PATTERN = re.compile(r"什么时候|几点|何时|多久|多长时间|待了|呆了|在不在|在家|来过|离开|回来|到家|出现")
+
+
+def _fmt_duration(seconds):
+    minutes = int(seconds // 60)
+    return f"{minutes // 60}小时{minutes % 60}分钟" if minutes >= 60 else f"{minutes}分钟"
+
+
 class MasterAgent:
     def __init__(self, memory: LongTermMemory):
         self.memory = memory
         # 使用 LLM 配置
-        self.llm_client = OpenAI(api_key=config.LLM_API_KEY, base_url=config.LLM_BASE_URL)
+        self.llm_client = create_chat_client(config.LLM_API_KEY, config.LLM_BASE_URL)
         logger.info("MasterAgent initialized.")
 
     def _get_query_route(self, query: str) -> str:
@@ -48,10 +91,15 @@ class MasterAgent:
 
     def _memory_retrieval_expert(self, query: str):
         """记忆检索专家：返回检索到的 Context 字符串"""
-        # 1. 尝试语义搜索
-        if hasattr(self.memory, 'semantic_search'):
+        # 1. 混合检索 (语义 + 关键词)，问题中的时间、人名作为预过滤条件
+        if hasattr(self.memory, 'search'):
+            filters = self._infer_search_filters(query)
             # 搜索最相关的 5 条
-            results = self.memory.semantic_search(query, top_k=5)
+            results = self.memory.search(query, top_k=5, **filters)
+            if not results and filters.get('person_names'):
+                # 人名可能未被识别到画面中，放宽为仅按时间过滤
+                filters.pop('person_names')
+                results = self.memory.search(query, top_k=5, **filters)
         else:
             # 降级方案
             results = self.memory.get_rich_event_details(limit=5)
@@ -63,15 +111,51 @@ class MasterAgent:
         context_str = "【相关记忆片段】:\n"
         for i, event in enumerate(results):
             t = datetime.fromtimestamp(event['start_time']).strftime('%Y-%m-%d %H:%M:%S')
-            # 确保解析摘要中的标签和评分
-            summary_text = event['summary'].split("|||")[0] 
-            context_str += f"- 时间: {t} | 事件: {summary_text}\n"
+            label = f" [{event['scene_label']}]" if event.get('scene_label') else ""
+            context_str += f"- 时间: {t}{label} | 事件: {event['summary']}\n"
             
         return context_str, results
 
+    def _infer_search_filters(self, query: str):
+        filters = {}
+        time_range = infer_time_range(query)
+        if time_range:
+            filters['start_time'], filters['end_time'] = time_range
+        try:
+            names = [n for n in self.memory.get_known_person_names() if n and n in query]
+        except Exception:
+            names = []
+        if names: filters['person_names'] = names
+        if filters: logger.info(f"检索过滤条件: {filters}")
+        return filters
+
+    def _presence_expert(self, query: str):
+        """
+        到达 / 离开 / 停留时长类问题直接查在场时间线 (SQL 毫秒级)，不经过向量检索与 LLM。
+        无法回答 (没有提到已知人物，或该时段没有在场记录) 时返回 None，交给常规流程。
+        """
+        if not PRESENCE_PATTERN.search(query): return None
+        try:
+            persons = [p for p in self.memory.presence.known_persons() if p in query]
+            if not persons: return None
+            start, end = infer_time_range(query) or (datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp(), datetime.now().timestamp())
+            window = f"{datetime.fromtimestamp(start).strftime('%m-%d %H:%M')} ~ {datetime.fromtimestamp(end).strftime('%m-%d %H:%M')}"
+            fmt = lambda ts: datetime.fromtimestamp(ts).strftime('%H:%M')
+            lines = []
+            for person in persons:
+                info = self.memory.presence.person_range(person, start, end)
+                if not info: return None
+                lines.append(f"**{person}** 在 {window} 期间共出现 {info['interval_count']} 次，"
+                             f"最早 {fmt(info['first_seen'])}，最晚 {fmt(info['last_seen'])}，累计约 {_fmt_duration(info['total_seconds'])}。")
+                lines += [f"- {fmt(iv['start_time'])} ~ {fmt(iv['end_time'])} ({iv['camera_id']})" for iv in info['intervals'][:10]]
+            return "\n".join(lines)
+        except Exception as e:
+            logger.warning(f"在场时间线查询失败，回退常规流程: {e}")
+            return None
+
     def _graph_reasoning_expert(self, query: str):
         """知识图谱专家"""
-        res = self.memory.query_knowledge_graph_by_nl(query)
+        res = self.memory.query_knowledge_graph_by_nl(query, time_range=infer_time_range(query))
         context_str = f"【知识图谱数据】:\n{res}"
         return context_str, None
 
@@ -86,8 +170,7 @@ class MasterAgent:
         context_str = "【今日活动流水】:\n"
         for e in events:
             t = datetime.fromtimestamp(e['start_time']).strftime('%H:%M')
-            summary_text = e['summary'].split("|||")[0]
-            context_str += f"- [{t}] {summary_text}\n"
+            context_str += f"- [{t}] {e['summary']}\n"
             
         return context_str, None
 
@@ -130,6 +213,13 @@ class MasterAgent:
             {'status': 'thinking', 'content': '...'}  -> 用于前端显示思考过程
             {'status': 'answer', 'content': '...'}    -> 用于前端显示最终回答
         """
+        # Step 0: 在场时间线可直接回答的问题
+        presence = self._presence_expert(query)
+        if presence:
+            yield {"status": "thinking", "content": "⏱️ 已从在场时间线中找到记录"}
+            yield {"status": "answer", "content": presence}
+            return
+
         # Step 1: 路由决策
         yield {"status": "thinking", "content": "🤔 正在分析您的问题意图..."}
         route = self._get_query_route(query)
@@ -2,7 +2,7 @@
 import logging
 import os
 import sys
-from openai import OpenAI
+from src.llm.client import create_chat_client
 from datetime import datetime, timedelta, date
 
 # --- 动态添加项目根目录到Python路径 ---
@@ -16,7 +16,7 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - [%
 class DailyScribeAgent:
     def __init__(self):
         self.memory = LongTermMemory(lancedb_path=config.LANCEDB_PATH, sqlite_path=config.SQLITE_DB_PATH)
-        self.llm_client = OpenAI(api_key=config.LLM_API_KEY, base_url=config.LLM_BASE_URL)
+        self.llm_client = create_chat_client(config.LLM_API_KEY, config.LLM_BASE_URL)
 
     def _summarize_context(self, context: str, title: str) -> str:
         """
@@ -43,7 +43,9 @@ class DailyScribeAgent:
             response = self.llm_client.chat.completions.create(
                 model=config.LLM_MODEL_NAME,
                 messages=[{"role": "user", "content": prompt}],
-                temperature=0.6
+                temperature=0.6,
+                request_timeout=config.LLM_REPORT_TIMEOUT,
+                deadline=config.LLM_REPORT_DEADLINE_SECONDS
             )
             return response.choices[0].message.content
         except Exception as e:
@@ -0,0 +1,67 @@
+# src/cognition/analysis_queue.py
+import itertools
+import logging
+import queue
+import threading
+import time
+import config
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AnalysisScheduler:
+    """
+    按优先级调度事件分析 (取代单线程 FIFO)。
+    - 常规线程按 (priority, 入队顺序) 从优先队列取事件
+    - 最高级 (priority=0) 事件另走专用线程，不必等待正在进行的常规分析完成，
+      远程调用无法中途打断，这是最接近“抢占”的做法
+    handler(event) 为实际的分析入库函数。
+    """
+    def __init__(self, handler, workers=None, urgent_workers=None):
+        self.handler = handler
+        self._seq = itertools.count()
+        self._normal = queue.PriorityQueue()
+        self._urgent = queue.Queue()
+        self._threads = []
+        for i in range(workers or config.ANALYSIS_WORKERS):
+            self._threads.append(self._spawn(self._normal, f"analysis-{i}"))
+        for i in range(urgent_workers if urgent_workers is not None else config.ANALYSIS_URGENT_WORKERS):
+            self._threads.append(self._spawn(self._urgent, f"analysis-urgent-{i}"))
+        self.has_urgent_lane = (urgent_workers if urgent_workers is not None else config.ANALYSIS_URGENT_WORKERS) > 0
+
+    def _spawn(self, q, name):
+        t = threading.Thread(target=self._worker, args=(q,), name=name, daemon=True)
+        t.start()
+        return t
+
+    def submit(self, event):
+        priority = event.get('priority', len(config.RISK_PRIORITY_THRESHOLDS))
+        event['queued_at'] = time.time()
+        if priority == 0 and self.has_urgent_lane:
+            self._urgent.put((priority, next(self._seq), event))
+        else:
+            self._normal.put((priority, next(self._seq), event))
+
+    def pending(self):
+        return self._normal.qsize() + self._urgent.qsize()
+
+    def _worker(self, q):
+        while True:
+            priority, _, event = q.get()
+            if event is _STOP: return
+            try:
+                self.handler(event)
+            except Exception as e:
+                logger.error(f"分析任务异常: {e}")
+            finally:
+                # 事件结束到入库完成的耗时 (time-to-insight)
+                delay = time.time() - event.get('end_time', event['queued_at'])
+                logger.info(f"[调度] 事件 {event.get('event_id')} (P{priority}) 完成，距事件结束 {delay:.1f}s，剩余 {self.pending()} 个")
+
+    def stop(self):
+        """通知所有线程退出 (不等待队列中剩余事件)"""
+        for t in self._threads:
+            target = self._urgent if t.name.startswith("analysis-urgent") else self._normal
+            target.put((float('inf'), next(self._seq), _STOP))
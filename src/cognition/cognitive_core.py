@@ -1,29 +1,71 @@
 # src/cognition/cognitive_core.py
 import base64
 import logging
-from openai import OpenAI
+from src.llm.client import create_chat_client
 import config
 import json
 from datetime import datetime
 import re
+from src.cognition.keyframe_selector import select_keyframes, frame_budget
+from src.cognition.event_dedup import EventDeduplicator
 
 logger = logging.getLogger(__name__)
 
+KG_ENTITY_TYPES = ["Person", "Object", "Location", "Activity"]
+
+# 单次调用模式下追加到视觉 Prompt 的知识图谱输出要求
+KG_SCHEMA_PROMPT = f"""
+        【知识图谱】
+        在同一个 JSON 中额外输出：
+        4. "entities": 列表，每项为 {{"name": 名称, "type": 取值于 {KG_ENTITY_TYPES}}}。已识别身份的人员使用其姓名。
+        5. "relationships": 列表，每项为 {{"source": 实体名, "relation": 关系, "target": 实体名}}，source/target 必须出现在 entities 中。
+
+        【完整 JSON 示例】
+        {{
+            "summary": "画面中出现两人。张三在沙发上，李四递给他一杯水...",
+            "scene_label": "多人社交",
+            "interaction_score": 5,
+            "entities": [{{"name": "张三", "type": "Person"}}, {{"name": "李四", "type": "Person"}}, {{"name": "水杯", "type": "Object"}}],
+            "relationships": [{{"source": "李四", "relation": "递给", "target": "张三"}}, {{"source": "张三", "relation": "拿着", "target": "水杯"}}]
+        }}
+        """
+
 class CognitiveCore:
     def __init__(self):
         print(f"  [Cognition] 初始化 LVM Client...")
         if not config.LVM_API_KEY:
             logger.error("❌ LVM_API_KEY 未设置")
-        self.lvm_client = OpenAI(api_key=config.LVM_API_KEY, base_url=config.LVM_BASE_URL)
+        self.lvm_client = create_chat_client(config.LVM_API_KEY, config.LVM_BASE_URL)
         
         print(f"  [Cognition] 初始化 LLM Client...")
         if not config.LLM_API_KEY:
             logger.error("❌ LLM_API_KEY 未设置")
-        self.llm_client = OpenAI(api_key=config.LLM_API_KEY, base_url=config.LLM_BASE_URL)
+        self.llm_client = create_chat_client(config.LLM_API_KEY, config.LLM_BASE_URL)
+        
+        self.dedup = EventDeduplicator() if config.DEDUP_ENABLED else None
         
-    def analyze_event(self, event_data):
+    def analyze_event(self, event_data, defer_kg=False):
+        """
+        分析一个事件片段。defer_kg=True 时，若视觉模型未给出合法图谱，
+        不在此处单独抽取，而是返回 kg_pending=True 交给批量抽取器处理。
+        """
         event_id = event_data['event_id']
         
+        # 0. 与同一摄像头上一个事件几乎相同 (长时间静坐等)，直接复用其结果
+        if self.dedup:
+            prev = self.dedup.match(event_data)
+            if prev:
+                prev_result = prev['result']
+                logger.info(f"[{event_id}] 与事件 {prev['event_id']} 重复，复用分析结果")
+                return {
+                    "summary": prev_result['summary'],
+                    "kg_data": None,
+                    "kg_pending": False,
+                    "scene_label": prev_result.get('scene_label'),
+                    "interaction_score": prev_result.get('interaction_score'),
+                    "reused_from": prev['event_id']
+                }
+        
         # 1. 视觉分析 (传入更多上下文)
         analysis_result = self._visual_analysis_json(event_data)
         
@@ -32,14 +74,24 @@ class CognitiveCore:
             return None
             
         summary = analysis_result.get('summary', '无有效描述')
-        kg_data = self._extract_kg(summary)
         
-        return {
+        # 2. 知识图谱：优先使用视觉模型一并返回的结果，校验失败再单独抽取
+        kg_data = self._validate_kg(analysis_result) if config.LVM_FUSED_KG else None
+        kg_pending = False
+        if kg_data is None:
+            if config.LVM_FUSED_KG: logger.warning(f"[{event_id}] 视觉模型返回的图谱结构不合法，回退单独抽取")
+            if defer_kg: kg_pending = True
+            else: kg_data = self._extract_kg(summary)
+        
+        result = {
             "summary": summary,
             "kg_data": kg_data,
+            "kg_pending": kg_pending,
             "scene_label": analysis_result.get('scene_label', '日常'),
             "interaction_score": analysis_result.get('interaction_score', 0)
         }
+        if self.dedup: self.dedup.remember(event_data, result)
+        return result
 
     def _visual_analysis_json(self, event_data):
         frames = event_data.get('frames', [])
@@ -93,16 +145,12 @@ class CognitiveCore:
             "interaction_score": 5
         }}
         """
+        if config.LVM_FUSED_KG:
+            prompt_text += KG_SCHEMA_PROMPT
         
-        # 采样逻辑 (均匀采样15张)
-        MAX_IMAGES = 15 
-        total_frames = len(frames)
-        if total_frames <= MAX_IMAGES:
-            indices = range(total_frames)
-        else:
-            step = (total_frames - 1) / (MAX_IMAGES - 1)
-            indices = [int(i * step) for i in range(MAX_IMAGES)]
-            
+        # 采样逻辑 (按检测变化与画面差异挑选关键帧，预算随事件时长自适应)
+        indices = select_keyframes(frames, frame_budget(event_data['end_time'] - event_data['start_time']))
+
         content = [{"type": "text", "text": prompt_text}]
         
         valid_images = 0
@@ -122,7 +170,7 @@ class CognitiveCore:
                 model=config.LVM_MODEL_NAME, 
                 messages=[{"role": "user", "content": content}],
                 temperature=0.2,
-                max_tokens=1000, 
+                max_tokens=2000 if config.LVM_FUSED_KG else 1000, 
                 response_format={"type": "json_object"}
             )
             return self._clean_and_parse_json(resp.choices[0].message.content)
@@ -130,6 +178,32 @@ class CognitiveCore:
             logger.error(f"视觉分析失败: {e}")
             return None
 
+    def confirm_alert(self, alert):
+        """请 LVM 对本地规则触发的告警快照做复核，返回 {"confirmed", "reason"}，失败返回 None"""
+        try:
+            with open(alert['snapshot_path'], "rb") as img:
+                b64 = base64.b64encode(img.read()).decode()
+        except Exception:
+            return None
+        prompt = f"""
+        你是家庭看护 AI。本地规则在 {alert['time']} 触发了告警：{alert['message']}。
+        请观察图片判断告警是否属实，严格以 JSON 输出：{{"confirmed": true/false, "reason": "简短理由"}}
+        """
+        try:
+            resp = self.lvm_client.chat.completions.create(
+                model=config.LVM_MODEL_NAME,
+                messages=[{"role": "user", "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64}"}}
+                ]}],
+                temperature=0.0,
+                response_format={"type": "json_object"}
+            )
+            return self._clean_and_parse_json(resp.choices[0].message.content)
+        except Exception as e:
+            logger.error(f"告警复核失败: {e}")
+            return None
+
     def _extract_kg(self, text):
         prompt = f"提取实体和关系(JSON): {text}"
         try:
@@ -142,6 +216,68 @@ class CognitiveCore:
             return self._clean_and_parse_json(resp.choices[0].message.content)
         except: return {"entities": [], "relationships": []}
 
+    def _extract_kg_batch(self, items):
+        """
+        一次调用为多个事件摘要抽取知识图谱。
+        items: [{"event_id", "summary"}]，返回 {event_id: 原始图谱数据}，解析失败返回空字典。
+        """
+        payload = json.dumps([{"event_id": it['event_id'], "summary": it['summary']} for it in items], ensure_ascii=False)
+        prompt = f"""批量提取实体和关系(JSON)。
+        下面是多个监控事件的摘要列表，请分别为每个事件提取实体和关系。
+        实体类型取值于 {KG_ENTITY_TYPES}，关系的 source/target 必须出现在该事件的 entities 中。
+        严格按如下结构输出，results 的键为输入中的 event_id：
+        {{"results": {{"<event_id>": {{"entities": [{{"name": "", "type": ""}}], "relationships": [{{"source": "", "relation": "", "target": ""}}]}}}}}}
+
+        【事件列表】
+        {payload}
+        """
+        try:
+            resp = self.llm_client.chat.completions.create(
+                model=config.LLM_MODEL_NAME,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.1,
+                response_format={"type": "json_object"}
+            )
+            data = self._clean_and_parse_json(resp.choices[0].message.content)
+            results = data.get('results') if isinstance(data, dict) else None
+            return results if isinstance(results, dict) else {}
+        except Exception as e:
+            logger.error(f"批量图谱抽取失败: {e}")
+            return {}
+
+    def _validate_kg(self, data):
+        """
+        校验视觉模型返回的知识图谱结构，合法时返回规范化后的 {"entities", "relationships"}，否则返回 None。
+        实体类型不在约定范围内时归为 Object；引用了未声明实体的关系视为不合法。
+        """
+        if not isinstance(data, dict): return None
+        entities = data.get('entities')
+        relationships = data.get('relationships', [])
+        if not isinstance(entities, list) or not isinstance(relationships, list):
+            return None
+        
+        clean_entities = []
+        names = set()
+        for ent in entities:
+            if not isinstance(ent, dict): return None
+            name = ent.get('name')
+            if not isinstance(name, str) or not name.strip(): return None
+            etype = ent.get('type')
+            if etype not in KG_ENTITY_TYPES: etype = 'Object'
+            clean_entities.append({"name": name.strip(), "type": etype})
+            names.add(name.strip())
+        
+        clean_rels = []
+        for rel in relationships:
+            if not isinstance(rel, dict): return None
+            src, tgt = rel.get('source'), rel.get('target')
+            if not isinstance(src, str) or not isinstance(tgt, str): return None
+            if src.strip() not in names or tgt.strip() not in names: return None
+            relation = rel.get('relation') or rel.get('type') or 'related_to'
+            clean_rels.append({"source": src.strip(), "target": tgt.strip(), "relation": str(relation)})
+        
+        return {"entities": clean_entities, "relationships": clean_rels}
+
     def _clean_and_parse_json(self, raw_text):
         try: return json.loads(raw_text)
         except:
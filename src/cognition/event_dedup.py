@@ -0,0 +1,84 @@
+# src/cognition/event_dedup.py
+import threading
+from collections import Counter
+import config
+from src.cognition.keyframe_selector import hash_distance, UNKNOWN_NAMES
+from src.perception.tracker import box_iou
+
+# 这些场景即使画面相似也必须重新分析
+NO_REUSE_LABELS = ('跌倒风险', '异常入侵')
+
+
+def event_signature(event_data):
+    """
+    提取用于判断“重复事件”的轻量特征：
+    已识别身份集合、典型人数 (众数)、典型人数下各人体框的平均位置 (按 x 排序)、首/中/尾帧画面哈希。
+    """
+    frames = event_data.get('frames', [])
+    names = set()
+    counts = Counter()
+    for f in frames:
+        dets = f.get('detections', [])
+        counts[len(dets)] += 1
+        names |= {d.get('name') for d in dets if d.get('name') and d.get('name') not in UNKNOWN_NAMES}
+    person_count = counts.most_common(1)[0][0] if counts else 0
+
+    sums = [[0.0] * 4 for _ in range(person_count)]
+    n = 0
+    for f in frames:
+        dets = f.get('detections', [])
+        if len(dets) != person_count: continue
+        for i, d in enumerate(sorted(dets, key=lambda d: d['box'][0])):
+            for k in range(4): sums[i][k] += d['box'][k]
+        n += 1
+    boxes = [[v / n for v in s] for s in sums] if n else []
+
+    hashes = [f.get('frame_hash') for f in (frames[0], frames[len(frames) // 2], frames[-1])] if frames else []
+    return {"names": names, "person_count": person_count, "boxes": boxes, "hashes": hashes,
+            "start_time": event_data.get('start_time', 0), "end_time": event_data.get('end_time', 0)}
+
+
+def signatures_match(prev, cur):
+    if prev['names'] != cur['names'] or prev['person_count'] != cur['person_count']:
+        return False
+    if cur['start_time'] - prev['end_time'] > config.DEDUP_MAX_GAP_SECONDS:
+        return False
+    if any(box_iou(a, b) < config.DEDUP_MIN_BOX_IOU for a, b in zip(prev['boxes'], cur['boxes'])):
+        return False
+    dists = [hash_distance(a, b) for a, b in zip(prev['hashes'], cur['hashes']) if a and b]
+    if dists and sum(dists) / len(dists) > config.DEDUP_MAX_HASH_DISTANCE:
+        return False
+    return True
+
+
+class EventDeduplicator:
+    """
+    记录每个摄像头最近一次真正送入 LVM 分析的事件特征与结果。
+    新事件与之高度相似时直接复用结果，跳过视觉分析与图谱抽取。
+    """
+    def __init__(self):
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def match(self, event_data):
+        """返回可复用的上一事件记录 {"event_id", "result", ...}，不可复用时返回 None"""
+        camera_id = event_data.get('camera_id', config.CAMERA_ID)
+        cur = event_signature(event_data)
+        with self._lock:
+            prev = self._last.get(camera_id)
+            if not prev: return None
+            result = prev['result']
+            if result.get('scene_label') in NO_REUSE_LABELS: return None
+            if cur['end_time'] - prev['chain_start'] > config.DEDUP_MAX_CHAIN_SECONDS: return None
+            if not signatures_match(prev['signature'], cur): return None
+            # 链条延续：以最新事件作为下一次比较的基准，但保留链条起点
+            prev['signature'] = cur
+            return prev
+
+    def remember(self, event_data, result):
+        camera_id = event_data.get('camera_id', config.CAMERA_ID)
+        with self._lock:
+            self._last[camera_id] = {
+                "event_id": event_data['event_id'], "result": result,
+                "signature": event_signature(event_data), "chain_start": event_data.get('start_time', 0)
+            }
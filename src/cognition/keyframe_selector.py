@@ -0,0 +1,121 @@
+# src/cognition/keyframe_selector.py
+import math
+import config
+
+# 各类变化的权重 (人数变化 > 身份变化 > 动作幅度 > 画面差异)
+W_COUNT = 1.0
+W_NAME = 0.8
+W_MOTION = 0.6
+W_VISUAL = 0.5
+
+UNKNOWN_NAMES = ('Unknown', 'Unknown_Body')
+
+
+def frame_budget(duration_seconds):
+    """按事件时长计算本次可发送的图片数量"""
+    budget = config.LVM_MIN_IMAGES + int(math.ceil(max(duration_seconds, 0) / 60 * config.LVM_IMAGES_PER_MINUTE))
+    return max(1, min(config.LVM_MAX_IMAGES, budget))
+
+
+def hash_distance(h1, h2):
+    """两个 64bit 画面哈希 (hex) 的归一化汉明距离，缺失时返回 0"""
+    if not h1 or not h2: return 0.0
+    try:
+        return bin(int(h1, 16) ^ int(h2, 16)).count("1") / 64
+    except ValueError:
+        return 0.0
+
+
+def _known_names(detections):
+    return {d.get('name') for d in detections if d.get('name') and d.get('name') not in UNKNOWN_NAMES}
+
+
+def _box_motion(prev_dets, cur_dets):
+    """
+    两帧之间最大的人体框运动幅度 (0~1)。
+    每个当前框与上一帧中心最近的框配对，位移按框对角线归一化，再叠加宽高比变化 (站立 <-> 躺倒)。
+    """
+    if not prev_dets or not cur_dets: return 0.0
+    motion = 0.0
+    for d in cur_dets:
+        x1, y1, x2, y2 = d['box']
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        diag = math.hypot(x2 - x1, y2 - y1) or 1.0
+        best = None
+        for p in prev_dets:
+            px1, py1, px2, py2 = p['box']
+            dist = math.hypot((px1 + px2) / 2 - cx, (py1 + py2) / 2 - cy)
+            if best is None or dist < best[0]:
+                best = (dist, p['box'])
+        dist, (px1, py1, px2, py2) = best
+        ratio = (x2 - x1) / max(y2 - y1, 1)
+        prev_ratio = (px2 - px1) / max(py2 - py1, 1)
+        m = dist / diag + abs(math.log(max(ratio, 1e-3) / max(prev_ratio, 1e-3)))
+        motion = max(motion, min(m, 1.0))
+    return motion
+
+
+def score_frames(frames):
+    """
+    为每一帧计算信息量分数：与上一帧相比的人数变化、身份变化、人体框运动和画面差异。
+    首帧没有参照，固定给满分，保证事件开头一定有画面。
+    """
+    scores = []
+    seen_names = set()
+    prev = None
+    for f in frames:
+        dets = f.get('detections', [])
+        names = _known_names(dets)
+        if prev is None:
+            scores.append(W_COUNT + W_NAME)
+        else:
+            prev_dets = prev.get('detections', [])
+            s = W_COUNT * min(abs(len(dets) - len(prev_dets)), 2) / 2
+            s += W_NAME * min(len(names ^ _known_names(prev_dets)), 2) / 2
+            # 本事件中首次出现的身份额外加分
+            if names - seen_names: s += W_NAME * 0.5
+            s += W_MOTION * _box_motion(prev_dets, dets)
+            s += W_VISUAL * hash_distance(prev.get('frame_hash'), f.get('frame_hash'))
+            scores.append(s)
+        seen_names |= names
+        prev = f
+    return scores
+
+
+def select_keyframes(frames, budget=None):
+    """
+    在帧预算内挑选信息量最高的帧，返回按时间排序的下标列表。
+    - 首尾帧始终保留，提供时间上下文
+    - 按分数从高到低挑选，同时要求与已选帧保持最小间隔，避免集中在同一时刻
+    - 分数过低 (画面几乎静止) 的帧不参与挑选，不足最低预算时按时间均匀补齐
+    """
+    total = len(frames)
+    if total == 0: return []
+    if budget is None:
+        duration = frames[-1].get('timestamp', 0) - frames[0].get('timestamp', 0)
+        budget = frame_budget(duration)
+    if total <= min(budget, config.LVM_MIN_IMAGES):
+        return list(range(total))
+
+    scores = score_frames(frames)
+    chosen = {0, total - 1} if budget > 1 else {0}
+    min_gap = max(1, total // (budget * 2))
+
+    ranked = sorted(range(total), key=lambda i: scores[i], reverse=True)
+    for i in ranked:
+        if len(chosen) >= budget: break
+        if i in chosen: continue
+        if scores[i] < config.KEYFRAME_MIN_SCORE: break
+        if all(abs(i - c) >= min_gap for c in chosen):
+            chosen.add(i)
+
+    # 不足最低预算时，在最大的时间空档中补帧
+    while len(chosen) < min(config.LVM_MIN_IMAGES, total):
+        ordered = sorted(chosen)
+        gaps = [(ordered[k + 1] - ordered[k], k) for k in range(len(ordered) - 1)]
+        if not gaps: break
+        gap, k = max(gaps)
+        if gap < 2: break
+        chosen.add(ordered[k] + gap // 2)
+
+    return sorted(chosen)
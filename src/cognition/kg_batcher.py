@@ -0,0 +1,74 @@
+# src/cognition/kg_batcher.py
+import logging
+import queue
+import threading
+import time
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class KGBatchExtractor:
+    """
+    知识图谱批量抽取器。
+    收集需要单独抽取图谱的事件摘要，攒够 KG_BATCH_MAX_EVENTS 个或等待 KG_BATCH_WINDOW_SECONDS 后，
+    合并成一次 LLM 调用，结果按 event_id 拆分后经 LongTermMemory.save_kg 写入。
+    批量结果中缺失或校验不通过的事件，回退到单条抽取。
+    """
+    def __init__(self, cognition, ltm, max_events=None, window_seconds=None):
+        self.cognition = cognition
+        self.ltm = ltm
+        self.max_events = max_events or config.KG_BATCH_MAX_EVENTS
+        self.window_seconds = window_seconds if window_seconds is not None else config.KG_BATCH_WINDOW_SECONDS
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="kg-batcher", daemon=True)
+        self._thread.start()
+        self.batches = 0
+        self.fallbacks = 0
+
+    def submit(self, event_id, summary):
+        self._queue.put({"event_id": event_id, "summary": summary})
+
+    def stop(self, timeout=None):
+        """停止并处理完剩余事件 (用于程序退出)"""
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        pending = []
+        first_at = None
+        while True:
+            wait = None
+            if pending:
+                wait = max(0.0, first_at + self.window_seconds - time.monotonic())
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = False  # 窗口到期
+
+            if item:
+                if not pending: first_at = time.monotonic()
+                pending.append(item)
+
+            window_due = pending and (item is False or time.monotonic() - first_at >= self.window_seconds)
+            if pending and (len(pending) >= self.max_events or window_due or item is None):
+                self._process(pending)
+                pending = []
+            if item is None and self._stopped.is_set():
+                return
+
+    def _process(self, items):
+        self.batches += 1
+        results = {}
+        if len(items) > 1:
+            results = self.cognition._extract_kg_batch(items)
+        for it in items:
+            kg_data = self.cognition._validate_kg(results.get(it['event_id']))
+            if kg_data is None:
+                # 批量结果缺失或不合法，回退单条抽取
+                if len(items) > 1: self.fallbacks += 1
+                kg_data = self.cognition._extract_kg(it['summary'])
+            self.ltm.save_kg(it['event_id'], kg_data)
+        logger.info(f"[KG] 批量抽取完成: {len(items)} 个事件，累计回退 {self.fallbacks} 次")
@@ -0,0 +1,11 @@
+# src/llm/client.py
+from src.llm.gateway import SyncChatClient, get_gateway
+from src.llm.response_cache import CachedChatClient, get_response_cache
+
+
+def create_chat_client(api_key, base_url):
+    """
+    创建 OpenAI 兼容的同步客户端，所有 LVM/LLM 调用统一从这里获取：
+    响应缓存 -> 共享异步网关 (并发上限、限流、超时、重试) -> AsyncOpenAI
+    """
+    return CachedChatClient(SyncChatClient(get_gateway(), api_key, base_url), get_response_cache())
@@ -0,0 +1,193 @@
+# src/llm/gateway.py
+import asyncio
+import logging
+import random
+import threading
+import time
+from types import SimpleNamespace
+import openai
+from openai import AsyncOpenAI
+import config
+
+logger = logging.getLogger(__name__)
+
+# 可重试的错误：限流、超时、连接失败与服务端 5xx
+RETRYABLE_ERRORS = (
+    openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+    openai.InternalServerError, asyncio.TimeoutError
+)
+
+
+class TokenBucket:
+    """异步令牌桶，平滑同一服务地址的请求速率，避免突发流量触发 429"""
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class ModelGateway:
+    """
+    共享的异步模型调用层。
+    在独立线程中运行事件循环，所有请求经由 AsyncOpenAI 发出：
+    - 按模型的并发信号量
+    - 按服务地址的令牌桶限流
+    - 单次超时 + 整体截止时间
+    - 指数退避 + 随机抖动重试
+    同步调用方通过 create() / SyncChatClient 使用，异步调用方可直接 await acreate()。
+    """
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="model-gateway", daemon=True)
+        self._thread.start()
+        self._clients = {}
+        self._semaphores = {}
+        self._buckets = {}
+
+    # --- 以下资源只在网关事件循环内创建和使用 ---
+    def _client(self, api_key, base_url):
+        key = (api_key, base_url)
+        if key not in self._clients:
+            # 重试由网关统一负责，关闭 SDK 自带重试
+            self._clients[key] = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=config.LLM_REQUEST_TIMEOUT)
+        return self._clients[key]
+
+    def _semaphore(self, model):
+        if model not in self._semaphores:
+            limits = config.LLM_MAX_CONCURRENCY
+            self._semaphores[model] = asyncio.Semaphore(limits.get(model, limits.get("default", 4)))
+        return self._semaphores[model]
+
+    def _bucket(self, base_url):
+        if base_url not in self._buckets:
+            self._buckets[base_url] = TokenBucket(config.LLM_RATE_LIMIT_RPS, config.LLM_RATE_LIMIT_BURST)
+        return self._buckets[base_url]
+
+    @staticmethod
+    def _retry_delay(attempt, error):
+        retry_after = None
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try: retry_after = float(response.headers.get('retry-after'))
+            except (TypeError, ValueError): pass
+        if retry_after is not None:
+            return min(retry_after, config.LLM_RETRY_MAX_DELAY)
+        # Full jitter：在 [0, base * 2^attempt] 中随机取值
+        return random.uniform(0, min(config.LLM_RETRY_MAX_DELAY, config.LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+
+    async def acreate(self, api_key, base_url, deadline=None, request_timeout=None, **params):
+        """
+        异步发起 chat.completions 请求。deadline 为整体截止秒数 (含排队与重试)，request_timeout 为单次请求超时。
+        stream=True 时返回异步迭代器，信号量在流结束前一直占用。
+        """
+        deadline_at = time.monotonic() + (deadline or config.LLM_DEADLINE_SECONDS)
+        request_timeout = request_timeout or config.LLM_REQUEST_TIMEOUT
+        model = params.get('model')
+        client = self._client(api_key, base_url)
+        sem = self._semaphore(model)
+        bucket = self._bucket(base_url)
+
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"{model} 调用超过截止时间")
+            try:
+                await asyncio.wait_for(bucket.acquire(), timeout=remaining)
+                await asyncio.wait_for(sem.acquire(), timeout=deadline_at - time.monotonic())
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"{model} 排队超过截止时间")
+            try:
+                timeout = min(request_timeout, max(deadline_at - time.monotonic(), 0.01))
+                resp = await asyncio.wait_for(client.chat.completions.create(**params), timeout=timeout)
+            except RETRYABLE_ERRORS as e:
+                sem.release()
+                attempt += 1
+                delay = self._retry_delay(attempt, e)
+                if attempt > config.LLM_MAX_RETRIES or time.monotonic() + delay >= deadline_at:
+                    raise
+                logger.warning(f"{model} 调用失败 ({type(e).__name__})，{delay:.1f}s 后第 {attempt} 次重试")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                sem.release()
+                raise
+
+            if params.get('stream'):
+                return self._guarded_stream(resp, sem, deadline_at, request_timeout)
+            sem.release()
+            return resp
+
+    async def _guarded_stream(self, stream, sem, deadline_at, request_timeout):
+        try:
+            while True:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded("流式响应超过截止时间")
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=min(request_timeout, remaining))
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            sem.release()
+
+    # --- 同步适配 ---
+    def create(self, api_key, base_url, **params):
+        future = asyncio.run_coroutine_threadsafe(self.acreate(api_key, base_url, **params), self._loop)
+        resp = future.result()
+        if params.get('stream'):
+            return self._sync_stream(resp)
+        return resp
+
+    def _sync_stream(self, agen):
+        try:
+            while True:
+                try:
+                    yield asyncio.run_coroutine_threadsafe(agen.__anext__(), self._loop).result()
+                except StopAsyncIteration:
+                    return
+        finally:
+            # 调用方提前放弃迭代时也要释放并发名额
+            asyncio.run_coroutine_threadsafe(agen.aclose(), self._loop)
+
+
+class SyncChatClient:
+    """基于共享网关的同步 OpenAI 兼容客户端：client.chat.completions.create(...)，可额外传入 deadline / request_timeout"""
+    def __init__(self, gateway, api_key, base_url):
+        self._gateway = gateway
+        self._api_key = api_key
+        self._base_url = base_url
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **params):
+        return self._gateway.create(self._api_key, self._base_url, **params)
+
+
+# --- 进程内共享的网关实例 ---
+_gateway_instance = None
+_gateway_lock = threading.Lock()
+
+def get_gateway():
+    global _gateway_instance
+    with _gateway_lock:
+        if _gateway_instance is None:
+            _gateway_instance = ModelGateway()
+    return _gateway_instance
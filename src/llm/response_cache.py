@@ -0,0 +1,198 @@
+# src/llm/response_cache.py
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+import config
+
+logger = logging.getLogger(__name__)
+
+# 每写入多少条检查一次容量，避免每次 put 都做全表统计
+EVICT_CHECK_INTERVAL = 50
+
+
+def _hash_image_url(url):
+    """data URL 图片只保留内容哈希，避免把 base64 原文写进缓存键"""
+    if isinstance(url, str) and url.startswith("data:"):
+        return "sha256:" + hashlib.sha256(url.encode()).hexdigest()
+    return url
+
+
+def _normalize_messages(messages):
+    normalized = []
+    for msg in messages or []:
+        content = msg.get('content')
+        if isinstance(content, list):
+            items = []
+            for item in content:
+                if isinstance(item, dict) and item.get('type') == 'image_url':
+                    url = (item.get('image_url') or {}).get('url')
+                    items.append({"type": "image_url", "image": _hash_image_url(url)})
+                else:
+                    items.append(item)
+            content = items
+        normalized.append({**msg, "content": content})
+    return normalized
+
+
+# 只影响调用方式、不影响结果的参数不参与缓存键
+NON_KEY_PARAMS = ('messages', 'deadline', 'request_timeout')
+
+
+def make_cache_key(params):
+    """按模型、调用参数、Prompt 与图片哈希生成内容寻址的缓存键"""
+    payload = {k: v for k, v in params.items() if k not in NON_KEY_PARAMS}
+    payload['messages'] = _normalize_messages(params.get('messages'))
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    磁盘上的模型响应缓存 (SQLite)。
+    - 条目超过 TTL 视为失效
+    - 总体积超过上限时按最近访问时间淘汰
+    - bypass=True 时不读缓存，但仍写入最新结果
+    """
+    def __init__(self, path, ttl_seconds, max_bytes, bypass=False):
+        Path(path).parent.mkdir(exist_ok=True, parents=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, model TEXT, payload TEXT, size INTEGER, created_at REAL, last_access REAL)''')
+            self._conn.execute('''CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)''')
+            self._conn.commit()
+
+    def get(self, key):
+        if self.bypass:
+            self.misses += 1
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT payload, created_at FROM responses WHERE key=?", (key,)).fetchone()
+            if row and now - row[1] <= self.ttl_seconds:
+                self._conn.execute("UPDATE responses SET last_access=? WHERE key=?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+                return json.loads(row[0])
+        self.misses += 1
+        return None
+
+    def put(self, key, model, payload):
+        raw = json.dumps(payload, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?,?,?,?,?,?)",
+                               (key, model, raw, len(raw.encode('utf-8')), now, now))
+            self._conn.commit()
+            self._puts += 1
+            if self._puts % EVICT_CHECK_INTERVAL == 0:
+                self._evict_locked()
+
+    def evict(self):
+        with self._lock:
+            return self._evict_locked()
+
+    def _evict_locked(self):
+        """删除过期条目，再按最近访问时间淘汰到容量上限以内，返回删除条数"""
+        c = self._conn.cursor()
+        c.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        removed = c.rowcount
+        total = c.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            freed = 0
+            victims = []
+            for key, size in c.execute("SELECT key, size FROM responses ORDER BY last_access"):
+                if total - freed <= self.max_bytes: break
+                victims.append((key,))
+                freed += size
+            c.executemany("DELETE FROM responses WHERE key=?", victims)
+            removed += len(victims)
+        self._conn.commit()
+        return removed
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries, "bytes": size, "bypass": self.bypass
+        }
+
+
+class CachedChatClient:
+    """
+    与 OpenAI 客户端接口兼容的缓存包装，调用方式不变：client.chat.completions.create(...)。
+    额外支持 cache_bypass=True 参数跳过单次读取；流式响应在命中时按原分片回放。
+    """
+    def __init__(self, client, cache):
+        self._client = client
+        self.cache = cache
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _create(self, cache_bypass=False, **params):
+        key = make_cache_key(params)
+        model = params.get('model')
+        cached = None if cache_bypass else self.cache.get(key)
+
+        if params.get('stream'):
+            if cached is not None:
+                return self._replay_stream(model, cached.get('chunks', []))
+            return self._record_stream(key, model, self._client.chat.completions.create(**params))
+
+        if cached is not None:
+            return ChatCompletion.model_validate(cached)
+        resp = self._client.chat.completions.create(**params)
+        try: self.cache.put(key, model, resp.model_dump(mode='json'))
+        except Exception as e: logger.warning(f"响应缓存写入失败: {e}")
+        return resp
+
+    def _record_stream(self, key, model, stream):
+        """透传流式分片，完整结束后再写入缓存 (中途异常不缓存)"""
+        pieces = []
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+            yield chunk
+        try: self.cache.put(key, model, {"chunks": pieces})
+        except Exception as e: logger.warning(f"响应缓存写入失败: {e}")
+
+    def _replay_stream(self, model, pieces):
+        for i, piece in enumerate(pieces):
+            yield ChatCompletionChunk.model_validate({
+                "id": f"cache-{i}", "object": "chat.completion.chunk", "created": 0, "model": model or "",
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}]
+            })
+
+
+# --- 进程内共享的缓存实例 ---
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+def get_response_cache():
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = ResponseCache(
+                config.LLM_CACHE_PATH,
+                ttl_seconds=config.LLM_CACHE_TTL_SECONDS,
+                max_bytes=config.LLM_CACHE_MAX_MB * 1024 * 1024,
+                bypass=config.LLM_CACHE_BYPASS
+            )
+    return _cache_instance
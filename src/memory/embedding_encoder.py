@@ -0,0 +1,101 @@
+# src/memory/embedding_encoder.py
+import logging
+import queue
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text):
+    """缓存键归一化：全角转半角、去首尾空白、合并连续空白、英文小写"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return " ".join(text.split()).lower()
+
+
+class EmbeddingEncoder:
+    """
+    SentenceTransformer 的统一入口，模型只在一个专用线程中运行：
+    - encode_query: 查询向量带 LRU 缓存 (键为模型 ID + 归一化文本)，命中时不占用 CPU；
+      未命中的查询在 EMBED_MAX_WAIT_MS 内攒批，一次 encode，单条查询的额外等待有上界
+    - encode_many: 整批编码 (入库摘要)，不进缓存
+    """
+    def __init__(self, model, model_id, cache_size=None, max_batch=None, max_wait_ms=None):
+        self.model = model
+        self.model_id = model_id
+        self.cache_size = cache_size or config.EMBED_CACHE_SIZE
+        self.max_batch = max_batch or config.EMBED_BATCH_MAX
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else config.EMBED_MAX_WAIT_MS) / 1000
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self.hits = self.misses = 0
+        self.encode_calls = self.encoded_texts = 0
+        self.encode_seconds = 0.0
+        threading.Thread(target=self._run, name="embedding-encoder", daemon=True).start()
+
+    def encode_query(self, text):
+        key = (self.model_id, normalize_query(text))
+        with self._cache_lock:
+            vec = self._cache.get(key)
+            if vec is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return vec
+            self.misses += 1
+        vec = self._submit([text], query=True).result()[0]
+        with self._cache_lock:
+            self._cache[key] = vec
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return vec
+
+    def encode_many(self, texts):
+        if not texts: return []
+        return self._submit(list(texts), query=False).result()
+
+    def _submit(self, texts, query):
+        fut = Future()
+        self._queue.put((texts, query, fut))
+        return fut
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            # 查询请求短暂等待，与同时到达的其他查询合并编码
+            if jobs[0][1]:
+                deadline = time.monotonic() + self.max_wait
+                while len(jobs) < self.max_batch:
+                    try:
+                        job = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    jobs.append(job)
+            texts = [t for job in jobs for t in job[0]]
+            try:
+                t0 = time.perf_counter()
+                vecs = self.model.encode(texts, batch_size=min(len(texts), self.max_batch))
+                self.encode_seconds += time.perf_counter() - t0
+                self.encode_calls += 1
+                self.encoded_texts += len(texts)
+                vecs = [v.tolist() if hasattr(v, "tolist") else v for v in vecs]
+            except Exception as e:
+                for job in jobs: job[2].set_exception(e)
+                continue
+            i = 0
+            for texts_, _, fut in jobs:
+                fut.set_result(vecs[i:i + len(texts_)])
+                i += len(texts_)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "cache_size": len(self._cache), "hits": self.hits, "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "encode_calls": self.encode_calls, "encoded_texts": self.encoded_texts,
+            "avg_encode_ms": round(self.encode_seconds / self.encode_calls * 1000, 2) if self.encode_calls else 0.0
+        }
@@ -0,0 +1,159 @@
+# src/memory/heatmap.py
+import logging
+import threading
+import zlib
+import numpy as np
+import config
+from src.memory.rollups import bucket_starts
+
+logger = logging.getLogger(__name__)
+
+ALL_PERSONS = ""   # person 列为空串的行统计所有检测 (含 Unknown)
+
+
+def _encode(grid):
+    return zlib.compress(grid.astype(np.uint32).tobytes())
+
+
+def _decode(blob, rows, cols):
+    return np.frombuffer(zlib.decompress(blob), dtype=np.uint32).reshape(rows, cols)
+
+
+class OccupancyHeatmap:
+    """
+    活动热力图：把人体框的落脚点 (底边中点) 按摄像头画面划分的网格计数，按小时累加后存入 heatmap_hourly。
+    - observe() 逐帧在内存中累加，每隔 flush_seconds 把增量合并进数据库 (zlib 压缩的 uint32 数组)
+    - ingest() 对一整段检测日志 (DetectionLog.read 的 Arrow 表) 用 numpy 一次性分箱，用于回填
+    - query() 只读取时间范围内的小时网格求和，一周 168 行，毫秒级
+    每个 (摄像头, 小时) 另有 person='' 的总计行，frames 列记录该小时处理的帧数，用于换算停留时长。
+    """
+    def __init__(self, db, grid_size=None, flush_seconds=None):
+        self.db = db
+        self.rows, self.cols = grid_size or config.HEATMAP_GRID
+        self.flush_seconds = flush_seconds or config.HEATMAP_FLUSH_SECONDS
+        self._grids = {}    # (camera_id, bucket_start, person) -> 增量网格
+        self._frames = {}   # (camera_id, bucket_start) -> 增量帧数
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0
+
+    def _cells(self, x1, y1, x2, y2, frame_w, frame_h):
+        """落脚点 -> (行, 列) 网格下标，输入均为 numpy 数组"""
+        col = np.clip(((x1 + x2) / 2 / frame_w * self.cols).astype(np.int64), 0, self.cols - 1)
+        row = np.clip((y2 / frame_h * self.rows).astype(np.int64), 0, self.rows - 1)
+        return row, col
+
+    def _grid(self, key):
+        grid = self._grids.get(key)
+        if grid is None: grid = self._grids[key] = np.zeros((self.rows, self.cols), dtype=np.uint32)
+        return grid
+
+    # --- 写入 ---
+    def observe(self, camera_id, ts, detections, frame_size):
+        bucket = bucket_starts(ts)[0]
+        with self._lock:
+            self._frames[(camera_id, bucket)] = self._frames.get((camera_id, bucket), 0) + 1
+            if detections and frame_size:
+                boxes = np.array([d['box'] for d in detections], dtype=np.float64)
+                row, col = self._cells(boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3], *frame_size)
+                np.add.at(self._grid((camera_id, bucket, ALL_PERSONS)), (row, col), 1)
+                for i, det in enumerate(detections):
+                    name = det.get('name')
+                    if name and 'Unknown' not in name:
+                        self._grid((camera_id, bucket, name))[row[i], col[i]] += 1
+        if ts - self._last_flush >= self.flush_seconds:
+            self.flush()
+            self._last_flush = ts
+
+    def ingest(self, table, replace=False):
+        """
+        向量化回填：table 为 DetectionLog.read() 返回的 Arrow 表。
+        replace=True 时先清空表中涉及的 (摄像头, 小时)，可重复执行。返回写入的小时网格数。
+        """
+        if table.num_rows == 0: return 0
+        ts = table["timestamp"].to_numpy()
+        cam_names, cam_idx = np.unique(np.array(table["camera_id"].to_pylist(), dtype=object), return_inverse=True)
+        # 小时起点按本地时间计算 (按整点去重后查表，避免逐行转换)
+        hours, hour_idx = np.unique(np.floor(ts / 3600), return_inverse=True)
+        hour_starts = [bucket_starts(h * 3600 + 1800)[0] for h in hours]
+        # (摄像头, 小时) 编码为一个整数分组号
+        gid = cam_idx * len(hours) + hour_idx
+        key_of = lambda g: (cam_names[g // len(hours)], hour_starts[g % len(hours)])
+
+        # 帧数：同一帧的各行 timestamp 相同
+        frame_gid = np.unique(np.stack([gid.astype(np.float64), ts]), axis=1)[0].astype(np.int64)
+        frames = {key_of(g): int(n) for g, n in zip(*np.unique(frame_gid, return_counts=True))}
+
+        grids = {}
+        cells = self.rows * self.cols
+        cols = [table[k].to_numpy(zero_copy_only=False).astype(np.float64) for k in ("x1", "y1", "x2", "y2", "frame_w", "frame_h")]
+        valid = (table["n_detections"].to_numpy(zero_copy_only=False) > 0) & ~np.isnan(cols[0]) & ~np.isnan(cols[4]) & ~np.isnan(cols[5])
+        if valid.any():
+            row, col = self._cells(*[c[valid] for c in cols])
+            cell, gid_v = row * self.cols + col, gid[valid]
+            names = np.array(table["name"].to_pylist(), dtype=object)[valid]
+            persons = [(ALL_PERSONS, np.ones(len(cell), dtype=bool))] + \
+                      [(n, names == n) for n in set(names) if n and 'Unknown' not in n]
+            for person, mask in persons:
+                groups, local = np.unique(gid_v[mask], return_inverse=True)
+                counts = np.bincount(local * cells + cell[mask], minlength=len(groups) * cells)
+                for g, grid in zip(groups, counts.reshape(len(groups), self.rows, self.cols)):
+                    grids[key_of(g) + (person,)] = grid.astype(np.uint32)
+
+        with self.db.write() as c:
+            if replace:
+                c.executemany("DELETE FROM heatmap_hourly WHERE camera_id=? AND bucket_start=?", list(frames))
+            self._merge(c, grids, frames)
+        return len(grids)
+
+    def _merge(self, c, grids, frames):
+        for (camera_id, bucket), n in frames.items():
+            grids.setdefault((camera_id, bucket, ALL_PERSONS), np.zeros((self.rows, self.cols), dtype=np.uint32))
+        for (camera_id, bucket, person), delta in grids.items():
+            r = c.execute("SELECT rows, cols, frames, grid FROM heatmap_hourly WHERE camera_id=? AND person=? AND bucket_start=?",
+                          (camera_id, person, bucket)).fetchone()
+            grid, n = delta, frames.get((camera_id, bucket), 0) if person == ALL_PERSONS else 0
+            if r and (r['rows'], r['cols']) == (self.rows, self.cols):
+                grid = grid + _decode(r['grid'], self.rows, self.cols)
+                n += r['frames'] or 0
+            c.execute("""INSERT OR REPLACE INTO heatmap_hourly (camera_id, person, bucket_start, rows, cols, frames, grid)
+                         VALUES (?,?,?,?,?,?,?)""", (camera_id, person, bucket, self.rows, self.cols, n, _encode(grid)))
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                grids, self._grids = self._grids, {}
+                frames, self._frames = self._frames, {}
+            if not grids and not frames: return
+            try:
+                with self.db.write() as c:
+                    self._merge(c, grids, frames)
+            except Exception as e:
+                logger.error(f"[Heatmap] 写入失败，下次重试: {e}")
+                with self._lock:
+                    for k, g in grids.items(): self._grid(k)[:] += g
+                    for k, n in frames.items(): self._frames[k] = self._frames.get(k, 0) + n
+
+    # --- 查询 ---
+    def query(self, start_ts, end_ts, camera_id=None, person=None):
+        """
+        [start_ts, end_ts) 内按小时网格求和，返回 (grid, frames)：grid 为落脚点计数 (rows x cols)，
+        frames 为同期处理的帧数 (乘以处理间隔即为覆盖时长)。
+        """
+        camera_id = camera_id or config.CAMERA_ID
+        total = np.zeros((self.rows, self.cols), dtype=np.uint64)
+        with self.db.read() as c:
+            rows = c.execute("""SELECT rows, cols, grid FROM heatmap_hourly
+                                WHERE camera_id=? AND person=? AND bucket_start >= ? AND bucket_start < ?""",
+                             (camera_id, person or ALL_PERSONS, start_ts, end_ts)).fetchall()
+            frames = c.execute("""SELECT COALESCE(SUM(frames), 0) FROM heatmap_hourly
+                                  WHERE camera_id=? AND person=? AND bucket_start >= ? AND bucket_start < ?""",
+                               (camera_id, ALL_PERSONS, start_ts, end_ts)).fetchone()[0]
+        skipped = 0
+        for r in rows:
+            if (r['rows'], r['cols']) != (self.rows, self.cols):
+                skipped += 1
+                continue
+            total += _decode(r['grid'], self.rows, self.cols)
+        if skipped: logger.warning(f"[Heatmap] 跳过 {skipped} 个网格尺寸不同的小时")
+        return total, frames
@@ -0,0 +1,171 @@
+# src/memory/kg_query.py
+import logging
+import re
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_LIKE = '%Unknown%'
+
+
+def _fmt_time(ts):
+    return datetime.fromtimestamp(ts).strftime('%m-%d %H:%M') if ts else "--"
+
+
+class KGQueryEngine:
+    """
+    基于预聚合表的知识图谱查询 (表由 KGWriter 在写入关系时同步维护)：
+    - entity_events: 实体出现在哪些事件 (带事件开始时间，按 (entity_id, start_time) 索引)
+    - entity_stats:  实体的度数、出现事件数、首次/最近出现时间
+    - entity_pairs:  无向邻接表 (a_id < b_id)，weight 为两者之间的关系条数
+    所有查询都走索引，不扫描 relationships 全表。
+    """
+    def __init__(self, db):
+        self.db = db
+
+    # --- 基础查询 ---
+    def _entity_ids(self, c, name):
+        return [r[0] for r in c.execute("SELECT id FROM entities WHERE name=?", (name,))]
+
+    def neighbors(self, name, limit=20):
+        """与实体直接相连的实体，按关系条数排序"""
+        with self.db.read() as c:
+            ids = self._entity_ids(c, name)
+            if not ids: return []
+            ph = ",".join("?" * len(ids))
+            rows = c.execute(f"""
+                SELECT e.name, e.type, SUM(p.weight) AS weight, MAX(p.last_seen) AS last_seen FROM (
+                    SELECT b_id AS other, weight, last_seen FROM entity_pairs WHERE a_id IN ({ph})
+                    UNION ALL SELECT a_id, weight, last_seen FROM entity_pairs WHERE b_id IN ({ph})) p
+                JOIN entities e ON e.id = p.other
+                GROUP BY e.id ORDER BY weight DESC LIMIT ?""", ids + ids + [limit]).fetchall()
+            return [dict(r) for r in rows]
+
+    def top_partners(self, name, k=5, entity_type='Person'):
+        """互动最多的对象 (默认只看人物)"""
+        return [n for n in self.neighbors(name, limit=200)
+                if (entity_type is None or n['type'] == entity_type) and 'Unknown' not in n['name']][:k]
+
+    def top_entities(self, entity_type='Person', k=5, start_time=None, end_time=None):
+        """出现事件数最多的实体；指定时间范围时按 entity_events 统计，否则直接读 entity_stats"""
+        with self.db.read() as c:
+            if start_time is None and end_time is None:
+                rows = c.execute("""
+                    SELECT e.name, e.type, s.event_count, s.degree, s.last_seen FROM entity_stats s
+                    JOIN entities e ON e.id = s.entity_id
+                    WHERE e.type = ? AND e.name NOT LIKE ? ORDER BY s.event_count DESC LIMIT ?""",
+                    (entity_type, UNKNOWN_LIKE, k)).fetchall()
+            else:
+                rows = c.execute("""
+                    SELECT e.name, e.type, COUNT(*) AS event_count, MAX(ee.start_time) AS last_seen FROM entity_events ee
+                    JOIN entities e ON e.id = ee.entity_id
+                    WHERE e.type = ? AND e.name NOT LIKE ? AND ee.start_time BETWEEN ? AND ?
+                    GROUP BY e.id ORDER BY event_count DESC LIMIT ?""",
+                    (entity_type, UNKNOWN_LIKE, start_time or 0, end_time or 1e18, k)).fetchall()
+            return [dict(r) for r in rows]
+
+    def co_occurrence(self, name_a, name_b, start_time=None, end_time=None):
+        """两个实体在同一事件中共同出现的次数与最近一次时间"""
+        with self.db.read() as c:
+            ids_a, ids_b = self._entity_ids(c, name_a), self._entity_ids(c, name_b)
+            if not ids_a or not ids_b: return {"count": 0, "last_seen": None}
+            row = c.execute(f"""
+                SELECT COUNT(DISTINCT a.event_id), MAX(a.start_time) FROM entity_events a
+                JOIN entity_events b ON b.event_id = a.event_id
+                WHERE a.entity_id IN ({",".join("?" * len(ids_a))}) AND b.entity_id IN ({",".join("?" * len(ids_b))})
+                  AND a.start_time BETWEEN ? AND ?""",
+                ids_a + ids_b + [start_time or 0, end_time or 1e18]).fetchone()
+            return {"count": row[0], "last_seen": row[1]}
+
+    def co_occurring(self, name, k=10, start_time=None, end_time=None, entity_type=None):
+        """时间窗口内与某实体同一事件出现最多的其他实体"""
+        with self.db.read() as c:
+            ids = self._entity_ids(c, name)
+            if not ids: return []
+            params = ids + [start_time or 0, end_time or 1e18] + ids
+            type_cond = ""
+            if entity_type:
+                type_cond = "AND e.type = ?"
+                params.append(entity_type)
+            rows = c.execute(f"""
+                SELECT e.name, e.type, COUNT(DISTINCT b.event_id) AS count FROM entity_events a
+                JOIN entity_events b ON b.event_id = a.event_id
+                JOIN entities e ON e.id = b.entity_id
+                WHERE a.entity_id IN ({",".join("?" * len(ids))}) AND a.start_time BETWEEN ? AND ?
+                  AND b.entity_id NOT IN ({",".join("?" * len(ids))}) {type_cond}
+                GROUP BY e.id ORDER BY count DESC LIMIT ?""", params + [k]).fetchall()
+            return [dict(r) for r in rows]
+
+    def paths(self, src, dst, max_depth=3, limit=3):
+        """两实体之间的最短关联路径 (递归 CTE 在无向邻接表上做有界广度搜索)"""
+        with self.db.read() as c:
+            ids_src, ids_dst = self._entity_ids(c, src), self._entity_ids(c, dst)
+            if not ids_src or not ids_dst: return []
+            rows = c.execute(f"""
+                WITH RECURSIVE adj(x, y) AS (
+                    SELECT a_id, b_id FROM entity_pairs UNION ALL SELECT b_id, a_id FROM entity_pairs
+                ), walk(node, path, depth) AS (
+                    SELECT id, ',' || id || ',', 0 FROM entities WHERE id IN ({",".join("?" * len(ids_src))})
+                    UNION ALL
+                    SELECT adj.y, walk.path || adj.y || ',', walk.depth + 1 FROM walk JOIN adj ON adj.x = walk.node
+                    WHERE walk.depth < ? AND instr(walk.path, ',' || adj.y || ',') = 0
+                )
+                SELECT path, depth FROM walk WHERE node IN ({",".join("?" * len(ids_dst))})
+                ORDER BY depth LIMIT ?""", ids_src + [max_depth] + ids_dst + [limit]).fetchall()
+            names = {}
+            result = []
+            for path, _ in rows:
+                node_ids = [int(i) for i in path.strip(",").split(",")]
+                missing = [i for i in node_ids if i not in names]
+                if missing:
+                    for r in c.execute(f"SELECT id, name FROM entities WHERE id IN ({','.join('?' * len(missing))})", missing):
+                        names[r[0]] = r[1]
+                result.append([names.get(i, str(i)) for i in node_ids])
+            return result
+
+    # --- 问题模板 ---
+    def known_names(self, text):
+        """问题中出现的已知实体名 (长名优先，去掉被包含的短名)"""
+        with self.db.read() as c:
+            names = [r[0] for r in c.execute("SELECT DISTINCT e.name FROM entity_stats s JOIN entities e ON e.id = s.entity_id")]
+        found = sorted({n for n in names if n and len(n) >= 2 and n in text}, key=len, reverse=True)
+        result = []
+        for n in found:
+            if not any(n in longer for longer in result): result.append(n)
+        # 按在问题中出现的先后排序
+        return sorted(result, key=text.find)
+
+    def answer(self, query, time_range=None):
+        """把常见问题映射到上述查询，返回给 LLM 的文本上下文"""
+        start, end = time_range or (None, None)
+        window = f" ({_fmt_time(start)} ~ {_fmt_time(end)})" if time_range else ""
+        names = self.known_names(query)
+        lines = []
+
+        if len(names) >= 2 and re.search(r"关系|联系|认识|怎么.*(连|关)", query):
+            paths = self.paths(names[0], names[1])
+            lines.append(f"【{names[0]} 与 {names[1]} 的关联路径】")
+            lines += [" -> ".join(p) for p in paths] or ["未找到 3 跳以内的关联"]
+        elif len(names) >= 2:
+            co = self.co_occurrence(names[0], names[1], start, end)
+            lines.append(f"【{names[0]} 与 {names[1]} 共同出现{window}】{co['count']} 次，最近一次 {_fmt_time(co['last_seen'])}")
+        elif len(names) == 1:
+            name = names[0]
+            if time_range:
+                rows = self.co_occurring(name, k=10, start_time=start, end_time=end)
+                lines.append(f"【与 {name} 同时出现最多的对象{window}】")
+                lines += [f"- {r['name']} ({r['type']}): {r['count']} 次" for r in rows]
+            partners = self.top_partners(name, k=5)
+            if partners:
+                lines.append(f"【与 {name} 互动最多的人】")
+                lines += [f"- {r['name']}: {r['weight']} 条关系，最近 {_fmt_time(r['last_seen'])}" for r in partners]
+            lines.append(f"【{name} 的关联实体】")
+            lines += [f"- {r['name']} ({r['type']}): {r['weight']} 条关系" for r in self.neighbors(name, limit=10)]
+        else:
+            # 无具体实体：谁最常出现 / 常用物品 / 常去位置
+            for etype, title in (("Person", "出现最频繁的人"), ("Object", "最常涉及的物品"), ("Location", "最常出现的位置"), ("Activity", "最常见的活动")):
+                rows = self.top_entities(etype, k=5, start_time=start, end_time=end)
+                if rows:
+                    lines.append(f"【{title}{window}】")
+                    lines += [f"- {r['name']}: {r['event_count']} 个事件，最近 {_fmt_time(r['last_seen'])}" for r in rows]
+        return "\n".join(lines) if lines else "知识图谱中暂无相关数据"
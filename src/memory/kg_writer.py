@@ -0,0 +1,158 @@
+# src/memory/kg_writer.py
+import threading
+from collections import OrderedDict
+import config
+
+# 单条 SQL 的参数数量上限内，每批处理的实体数
+_CHUNK = 400
+
+
+class KGWriter:
+    """
+    知识图谱批量写入：
+    - (name, type) -> id 的有界 LRU 缓存，命中的实体不再访问数据库
+    - 未命中的实体先一次 SELECT 批量查询，仍不存在的用一条多行 INSERT ... RETURNING 插入
+    - 关系用 executemany 一次写入，并在同一事务中更新图谱预聚合表
+    write() 在调用方的写事务中执行；新 id 只有在事务提交后才能通过 remember() 放入缓存，避免回滚后缓存脏数据。
+    """
+    def __init__(self, cache_size=None):
+        self.cache_size = cache_size or config.KG_ENTITY_CACHE_SIZE
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def write(self, c, event_id, kg_data):
+        """写入一个事件的实体与关系，返回本次新解析到的 {(name, type): id}，提交后交给 remember()"""
+        if not kg_data or 'entities' not in kg_data: return {}
+
+        keys = []
+        names = {}
+        for ent in kg_data['entities']:
+            # 使用 .get() 提供默认值，防止报错
+            name = (ent.get('name') or 'Unknown').strip()
+            etype = (ent.get('type') or 'Object').strip()
+            if not name: continue
+            keys.append((name, etype))
+            names[name] = (name, etype)  # 同名不同类型时以最后一个为准 (与关系按名称匹配的规则一致)
+        if not keys: return {}
+
+        ids = {}
+        with self._lock:
+            for k in keys:
+                if k in self._cache:
+                    self._cache.move_to_end(k)
+                    ids[k] = self._cache[k]
+        missing = list(dict.fromkeys(k for k in keys if k not in ids))
+        resolved = {}
+        if missing:
+            resolved.update(self._select_ids(c, missing))
+            new = [k for k in missing if k not in resolved]
+            if new: resolved.update(self._insert_ids(c, new))
+            ids.update(resolved)
+
+        rels = []
+        for rel in kg_data.get('relationships', []):
+            src, tgt = names.get(rel.get('source')), names.get(rel.get('target'))
+            if src in ids and tgt in ids:
+                rels.append((ids[src], ids[tgt], rel.get('relation', rel.get('type', 'related_to')), event_id))
+        if rels:
+            c.executemany("INSERT INTO relationships (source_id, target_id, relation, event_id) VALUES (?,?,?,?)", rels)
+        self._update_aggregates(c, event_id, set(ids.values()), rels)
+        return resolved
+
+    @staticmethod
+    def _update_aggregates(c, event_id, entity_ids, rels):
+        """同一事务内维护 entity_events / entity_stats / entity_pairs (见 KGQueryEngine)"""
+        row = c.execute("SELECT start_time FROM events WHERE event_id=?", (event_id,)).fetchone()
+        ts = row[0] if row else None
+        seen = {r[0] for r in c.execute("SELECT entity_id FROM entity_events WHERE event_id=?", (event_id,))}
+        new = [i for i in entity_ids if i not in seen]
+        c.executemany("INSERT OR IGNORE INTO entity_events (entity_id, event_id, start_time) VALUES (?,?,?)",
+                      [(i, event_id, ts) for i in new])
+
+        degree = {}
+        pairs = {}
+        for src, tgt, _, _ in rels:
+            degree[src] = degree.get(src, 0) + 1
+            if tgt != src:
+                degree[tgt] = degree.get(tgt, 0) + 1
+                key = (min(src, tgt), max(src, tgt))
+                pairs[key] = pairs.get(key, 0) + 1
+        stats = [(i, degree.get(i, 0), 1 if i in new else 0, ts, ts) for i in entity_ids]
+        c.executemany("""INSERT INTO entity_stats (entity_id, degree, event_count, first_seen, last_seen) VALUES (?,?,?,?,?)
+                         ON CONFLICT(entity_id) DO UPDATE SET degree = degree + excluded.degree,
+                         event_count = event_count + excluded.event_count,
+                         first_seen = MIN(COALESCE(first_seen, excluded.first_seen), COALESCE(excluded.first_seen, first_seen)),
+                         last_seen = MAX(COALESCE(last_seen, excluded.last_seen), COALESCE(excluded.last_seen, last_seen))""", stats)
+        c.executemany("""INSERT INTO entity_pairs (a_id, b_id, weight, last_seen) VALUES (?,?,?,?)
+                         ON CONFLICT(a_id, b_id) DO UPDATE SET weight = weight + excluded.weight,
+                         last_seen = MAX(COALESCE(last_seen, excluded.last_seen), COALESCE(excluded.last_seen, last_seen))""",
+                      [(a, b, w, ts) for (a, b), w in pairs.items()])
+
+    @staticmethod
+    def remove(c, event_ids):
+        """
+        在调用方的写事务中删除一批事件的关系并扣减图谱预聚合 (数据清理用)，不再被任何事件引用的实体一并删除。
+        返回删除的实体数；大于 0 时调用方应在提交后 clear() 缓存。
+        """
+        ph = ",".join(["?"] * len(event_ids))
+        degree, pairs, counts = {}, {}, {}
+        for src, tgt in c.execute(f"SELECT source_id, target_id FROM relationships WHERE event_id IN ({ph})", event_ids).fetchall():
+            degree[src] = degree.get(src, 0) + 1
+            if tgt != src:
+                degree[tgt] = degree.get(tgt, 0) + 1
+                key = (min(src, tgt), max(src, tgt))
+                pairs[key] = pairs.get(key, 0) + 1
+        for (entity_id,) in c.execute(f"SELECT entity_id FROM entity_events WHERE event_id IN ({ph})", event_ids).fetchall():
+            counts[entity_id] = counts.get(entity_id, 0) + 1
+        c.execute(f"DELETE FROM relationships WHERE event_id IN ({ph})", event_ids)
+        c.execute(f"DELETE FROM entity_events WHERE event_id IN ({ph})", event_ids)
+
+        affected = set(degree) | set(counts)
+        c.executemany("""UPDATE entity_stats SET degree = MAX(0, degree - ?), event_count = MAX(0, event_count - ?),
+                         first_seen = (SELECT MIN(start_time) FROM entity_events WHERE entity_id = entity_stats.entity_id),
+                         last_seen = (SELECT MAX(start_time) FROM entity_events WHERE entity_id = entity_stats.entity_id)
+                         WHERE entity_id = ?""", [(degree.get(i, 0), counts.get(i, 0), i) for i in affected])
+        c.executemany("UPDATE entity_pairs SET weight = weight - ? WHERE a_id = ? AND b_id = ?", [(w, a, b) for (a, b), w in pairs.items()])
+        c.executemany("DELETE FROM entity_pairs WHERE a_id = ? AND b_id = ? AND weight <= 0", list(pairs))
+
+        orphans = [(i,) for i in affected
+                   if not c.execute("SELECT 1 FROM entity_events WHERE entity_id=? LIMIT 1", (i,)).fetchone()
+                   and not c.execute("SELECT 1 FROM relationships WHERE source_id=? OR target_id=? LIMIT 1", (i, i)).fetchone()]
+        for table, col in (("entity_pairs", "a_id"), ("entity_pairs", "b_id"), ("entity_stats", "entity_id"), ("entities", "id")):
+            c.executemany(f"DELETE FROM {table} WHERE {col}=?", orphans)
+        return len(orphans)
+
+    @staticmethod
+    def _select_ids(c, keys):
+        found = {}
+        for i in range(0, len(keys), _CHUNK):
+            chunk = keys[i:i + _CHUNK]
+            values = ",".join(["(?,?)"] * len(chunk))
+            params = [v for k in chunk for v in k]
+            for row in c.execute(f"SELECT id, name, type FROM entities WHERE (name, type) IN (VALUES {values})", params):
+                found[(row[1], row[2])] = row[0]
+        return found
+
+    @staticmethod
+    def _insert_ids(c, keys):
+        found = {}
+        for i in range(0, len(keys), _CHUNK):
+            chunk = keys[i:i + _CHUNK]
+            values = ",".join(["(?,?)"] * len(chunk))
+            params = [v for k in chunk for v in k]
+            for row in c.execute(f"INSERT INTO entities (name, type) VALUES {values} ON CONFLICT(name, type) DO NOTHING RETURNING id, name, type", params).fetchall():
+                found[(row[1], row[2])] = row[0]
+        return found
+
+    def remember(self, resolved):
+        if not resolved: return
+        with self._lock:
+            for k, v in resolved.items():
+                self._cache[k] = v
+                self._cache.move_to_end(k)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        """实体被删除 (如数据清理) 后调用"""
+        with self._lock: self._cache.clear()
@@ -1,143 +1,420 @@
 # src/memory/long_term_memory.py
 import lancedb
-import sqlite3
 import pyarrow as pa
 from pathlib import Path
 import json
 from sentence_transformers import SentenceTransformer
 import logging
-from openai import OpenAI
+from src.llm.client import create_chat_client
+from src.memory.embedding_encoder import EmbeddingEncoder
+from src.memory.sqlite_store import SQLiteStore
+from src.memory.migrations import MIGRATIONS
+from src.memory.kg_writer import KGWriter
+from src.memory.kg_query import KGQueryEngine
+from src.memory.presence import PresenceIndex
+from src.memory.heatmap import OccupancyHeatmap
+from src.memory.partitions import PartitionManager, VectorPartitions, month_key
+from src.memory.text_search import to_fts_document, to_fts_query
+from src.memory import rollups
 import config
 import threading
 
 logger = logging.getLogger(__name__)
 
+UNKNOWN_NAMES = ('Unknown', 'Unknown_Body')
+
+# 分区前的单一向量表，启动时拆分为按月的表
+LEGACY_VECTOR_TABLE = "semantic_memory"
+
+# 向量表结构：timestamp 为事件开始时间，其余结构化列用于检索时的预过滤
+VECTOR_SCHEMA = pa.schema([
+    pa.field("vector", pa.list_(pa.float32(), list_size=384)),
+    pa.field("event_id", pa.string()),
+    pa.field("summary", pa.string()),
+    pa.field("timestamp", pa.float64()),
+    pa.field("end_time", pa.float64()),
+    pa.field("scene_label", pa.string()),
+    pa.field("interaction_score", pa.float64()),
+    pa.field("camera_id", pa.string()),
+    pa.field("person_names", pa.list_(pa.string()))
+])
+
+
+# 列表页所需的列 (不含 image_paths 等大字段)
+LIST_COLUMNS = ("event_id", "start_time", "end_time", "summary", "preview_image_path", "scene_label", "interaction_score", "camera_id")
+
+
+def _sql_str(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _dedupe(rows):
+    """合并多个分区的结果时按 event_id 去重 (封存过程中同一事件可能短暂同时存在于热库和分片，热库优先)"""
+    seen = {}
+    for row in rows: seen.setdefault(row['event_id'], row)
+    return list(seen.values())
+
+
 class LongTermMemory:
     def __init__(self, lancedb_path: str, sqlite_path: str):
-        # 1. LanceDB
+        # 1. SQLite (WAL，多读单写，结构由迁移管理)
+        self.db = SQLiteStore(sqlite_path)
+        self.db.migrate(MIGRATIONS)
+        self.kg_writer = KGWriter()
+        self.kg_query = KGQueryEngine(self.db)
+        self.presence = PresenceIndex(self.db)
+        self.heatmap = OccupancyHeatmap(self.db)
+        self.partitions = PartitionManager(self.db)
+        
+        # 2. LanceDB (按月分表)
         ldb_path_obj = Path(lancedb_path)
         ldb_path_obj.mkdir(exist_ok=True, parents=True)
         self.vector_db = lancedb.connect(ldb_path_obj)
-        schema = pa.schema([
-            pa.field("vector", pa.list_(pa.float32(), list_size=384)),
-            pa.field("event_id", pa.string()),
-            pa.field("summary", pa.string()),
-            pa.field("timestamp", pa.float64())
-        ])
-        self.vector_table = self.vector_db.create_table("semantic_memory", schema=schema, exist_ok=True)
-        
-        # 2. SQLite
-        self.db_lock = threading.Lock()
-        Path(sqlite_path).parent.mkdir(exist_ok=True, parents=True)
-        self.sqlite_conn = sqlite3.connect(sqlite_path, check_same_thread=False)
-        self.sqlite_conn.row_factory = sqlite3.Row
-        self._init_sqlite_tables()
+        self.vectors = VectorPartitions(self.vector_db, VECTOR_SCHEMA)
+        if LEGACY_VECTOR_TABLE in self.vector_db.table_names():
+            self._migrate_vector_table()
         
         # 3. Model
         try:
             self.embedding_model = SentenceTransformer(config.EMBEDDING_MODEL_PATH, device='cpu')
+            model_id = config.EMBEDDING_MODEL_PATH
         except:
             self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+            model_id = 'all-MiniLM-L6-v2'
+        self.encoder = EmbeddingEncoder(self.embedding_model, model_id)
             
         # 使用 LLM 配置
-        self.llm_client = OpenAI(api_key=config.LLM_API_KEY, base_url=config.LLM_BASE_URL)
-
-    def _init_sqlite_tables(self):
-        with self.db_lock:
-            c = self.sqlite_conn.cursor()
-            c.execute('''CREATE TABLE IF NOT EXISTS events (event_id TEXT PRIMARY KEY, start_time REAL, end_time REAL, summary TEXT, image_paths TEXT, preview_image_path TEXT)''')
-            c.execute('''CREATE TABLE IF NOT EXISTS entities (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, type TEXT NOT NULL, UNIQUE(name, type))''')
-            c.execute('''CREATE TABLE IF NOT EXISTS relationships (id INTEGER PRIMARY KEY AUTOINCREMENT, source_id INTEGER, target_id INTEGER, relation TEXT, event_id TEXT, FOREIGN KEY(source_id) REFERENCES entities(id), FOREIGN KEY(target_id) REFERENCES entities(id), FOREIGN KEY(event_id) REFERENCES events(event_id))''')
-            self.sqlite_conn.commit()
+        self.llm_client = create_chat_client(config.LLM_API_KEY, config.LLM_BASE_URL)
+        
+        # 4. 向量写入缓冲 (首次写入事件时再启动后台线程)
+        self._vector_writer = None
+        self._vector_writer_lock = threading.Lock()
 
     def save_event(self, event_data, summary, kg_data, scene_label=None, interaction_score=None):
         event_id = event_data['event_id']
-        ext_summary = summary
-        if scene_label: ext_summary += f"|||LABEL:{scene_label}"
-        if interaction_score is not None: ext_summary += f"|||SCORE:{interaction_score}"
+        meta = self._vector_metadata(event_data, scene_label, interaction_score)
         
         try:
-            with self.db_lock:
-                c = self.sqlite_conn.cursor()
+            with self.db.write() as c:
+                # 覆盖写入同一事件时，先从统计汇总中减去旧记录
+                old = c.execute("SELECT * FROM events WHERE event_id=?", (event_id,)).fetchone()
+                if old: rollups.apply_event(c, dict(old), sign=-1)
                 paths = json.dumps([f['image_path'] for f in event_data['frames']])
-                c.execute("INSERT OR REPLACE INTO events VALUES (?,?,?,?,?,?)", 
-                          (event_id, event_data['start_time'], event_data['end_time'], ext_summary, paths, event_data.get('preview_image_path')))
+                c.execute("""INSERT OR REPLACE INTO events (event_id, start_time, end_time, summary, image_paths, preview_image_path,
+                             scene_label, interaction_score, camera_id, person_names) VALUES (?,?,?,?,?,?,?,?,?,?)""",
+                          (event_id, event_data['start_time'], event_data['end_time'], summary, paths, event_data.get('preview_image_path'),
+                           meta['scene_label'], meta['interaction_score'], meta['camera_id'], json.dumps(meta['person_names'], ensure_ascii=False)))
+                rollups.apply_event(c, {"start_time": event_data['start_time'], "end_time": event_data['end_time'], "summary": summary, **meta})
                 
-                # --- 关键修复：KG 存储鲁棒性 ---
-                if kg_data and 'entities' in kg_data:
-                    ent_map = {}
-                    for ent in kg_data['entities']:
-                        # 使用 .get() 提供默认值，防止报错
-                        name = ent.get('name', 'Unknown').strip()
-                        etype = ent.get('type', 'Object').strip()
-                        
-                        if not name: continue
-                        
-                        c.execute("INSERT OR IGNORE INTO entities (name, type) VALUES (?,?)", (name, etype))
-                        c.execute("SELECT id FROM entities WHERE name=? AND type=?", (name, etype))
-                        row = c.fetchone()
-                        if row: ent_map[name] = row[0]
-                        
-                    for rel in kg_data.get('relationships', []):
-                        src = rel.get('source')
-                        tgt = rel.get('target')
-                        relation = rel.get('relation', rel.get('type', 'related_to'))
-                        
-                        if src in ent_map and tgt in ent_map:
-                            c.execute("INSERT INTO relationships (source_id, target_id, relation, event_id) VALUES (?,?,?,?)",
-                                      (ent_map[src], ent_map[tgt], relation, event_id))
-                                      
-                self.sqlite_conn.commit()
+                new_entities = self._write_kg(c, event_id, kg_data)
+                c.execute("INSERT OR REPLACE INTO pending_vectors VALUES (?,?,?,?)",
+                          (event_id, summary, event_data['start_time'], json.dumps(meta, ensure_ascii=False)))
+            self.kg_writer.remember(new_entities)
             
-            vec = self.embedding_model.encode(summary)
-            if hasattr(vec, "tolist"): vec = vec.tolist()
-            self.vector_table.add([{"vector": vec, "event_id": event_id, "summary": summary, "timestamp": event_data['start_time']}])
+            self._get_vector_writer().submit({"event_id": event_id, "summary": summary, "timestamp": event_data['start_time'], **meta})
             return True
         except Exception as e:
             logger.error(f"Save failed: {e}")
-            try: self.sqlite_conn.rollback()
-            except: pass
             return False
 
+    def _write_kg(self, c, event_id, kg_data):
+        """在调用方的写事务中写入一个事件的知识图谱 (并刷新全文索引)，返回待提交后放入缓存的实体 id"""
+        new_entities = self.kg_writer.write(c, event_id, kg_data)
+        self._index_text(c, event_id)
+        return new_entities
+
+    @staticmethod
+    def _index_text(c, event_id):
+        """用事件摘要和关联实体名重建该事件的全文索引行"""
+        row = c.execute("SELECT summary FROM events WHERE event_id=?", (event_id,)).fetchone()
+        if not row: return
+        names = [r[0] for r in c.execute("""SELECT e.name FROM entity_events ee JOIN entities e ON e.id = ee.entity_id
+                                            WHERE ee.event_id=?""", (event_id,))]
+        c.execute("DELETE FROM events_fts WHERE event_id=?", (event_id,))
+        c.execute("INSERT INTO events_fts (content, event_id) VALUES (?,?)", (to_fts_document(row[0], " ".join(names)), event_id))
+
+    def save_kg(self, event_id, kg_data):
+        """单独写入 (延迟抽取得到的) 事件知识图谱"""
+        try:
+            with self.db.write() as c:
+                new_entities = self._write_kg(c, event_id, kg_data)
+            self.kg_writer.remember(new_entities)
+            return True
+        except Exception as e:
+            logger.error(f"Save KG failed: {e}")
+            return False
+
+    @staticmethod
+    def _vector_metadata(event_data, scene_label=None, interaction_score=None):
+        """向量表中除 vector/event_id/summary/timestamp 以外的结构化列"""
+        names = set()
+        for f in event_data.get('frames', []):
+            names |= {d.get('name') for d in f.get('detections', []) if d.get('name') and d.get('name') not in UNKNOWN_NAMES}
+        return {
+            "end_time": event_data.get('end_time', event_data['start_time']),
+            "scene_label": scene_label,
+            "interaction_score": float(interaction_score) if interaction_score is not None else None,
+            "camera_id": event_data.get('camera_id', config.CAMERA_ID),
+            "person_names": sorted(names)
+        }
+
+    def _migrate_vector_table(self):
+        """
+        把分区前的单表 semantic_memory 拆分为按月的表后删除 (索引由后台维护任务重建)。
+        更早版本的表只有 vector/event_id/summary/timestamp，拆分时从 events 表补齐结构化列。
+        """
+        legacy = self.vector_db.open_table(LEGACY_VECTOR_TABLE)
+        old = legacy.to_arrow().to_pylist()
+        logger.info(f"[向量] 按月拆分 {LEGACY_VECTOR_TABLE} 表 ({len(old)} 行)...")
+        with self.db.read() as c:
+            events = {r['event_id']: dict(r) for r in c.execute(
+                "SELECT event_id, end_time, scene_label, interaction_score, camera_id, person_names FROM events")}
+        rows = []
+        for row in old:
+            ev = events.get(row['event_id'], {})
+            rows.append({
+                "vector": row['vector'], "event_id": row['event_id'], "summary": row['summary'], "timestamp": row['timestamp'],
+                "end_time": row.get('end_time') or ev.get('end_time', row['timestamp']),
+                "scene_label": row.get('scene_label') or ev.get('scene_label'),
+                "interaction_score": row.get('interaction_score') if row.get('interaction_score') is not None else ev.get('interaction_score'),
+                "camera_id": row.get('camera_id') or ev.get('camera_id') or config.CAMERA_ID,
+                "person_names": row.get('person_names') or json.loads(ev.get('person_names') or "[]")
+            })
+        # 上次拆分中途退出时月份表里可能已有部分行
+        self.vectors.delete([(r['event_id'], r['timestamp']) for r in rows])
+        if rows: self.vectors.add(rows)
+        self.vector_db.drop_table(LEGACY_VECTOR_TABLE)
+
+    def _get_vector_writer(self):
+        with self._vector_writer_lock:
+            if self._vector_writer is None:
+                from src.memory.vector_writer import VectorWriteBuffer
+                self._vector_writer = VectorWriteBuffer(self)
+            return self._vector_writer
+
+    def _clear_pending_vectors(self, event_ids):
+        with self.db.write() as c:
+            c.executemany("DELETE FROM pending_vectors WHERE event_id=?", [(i,) for i in event_ids])
+
+    def repair_pending_vectors(self):
+        """补写上次退出前未写入向量表的事件，返回补写条数"""
+        with self.db.read() as c:
+            rows = [dict(r) for r in c.execute("SELECT * FROM pending_vectors ORDER BY timestamp")]
+        if not rows: return 0
+        # 向量已写入但未来得及清除记录的，先删掉避免重复
+        try: self.vectors.delete([(r['event_id'], r['timestamp']) for r in rows])
+        except Exception as e: logger.warning(f"清理残留向量失败: {e}")
+        writer = self._get_vector_writer()
+        for r in rows:
+            meta = json.loads(r['meta']) if r.get('meta') else {"end_time": r['timestamp'], "camera_id": config.CAMERA_ID, "person_names": []}
+            writer.submit({"event_id": r['event_id'], "summary": r['summary'], "timestamp": r['timestamp'], **meta})
+        logger.info(f"[向量] 补写 {len(rows)} 条未完成的向量")
+        return len(rows)
+
+    def flush_vectors(self, timeout=None):
+        """等待缓冲中的向量全部写入 (写入后才能被 semantic_search 检索到)"""
+        if self._vector_writer: return self._vector_writer.flush(timeout)
+        return True
+
+    def embedding_stats(self):
+        """查询向量缓存命中率与编码耗时"""
+        return self.encoder.stats()
+
+    def close(self, timeout=None):
+        """程序退出前调用：写入剩余向量、在场区间与热力图增量并关闭数据库连接"""
+        if self._vector_writer: self._vector_writer.stop(timeout)
+        self.presence.flush(close_all=True)
+        self.heatmap.flush()
+        self.partitions.close()
+        self.db.close()
+
     def get_events_for_period(self, start_ts, end_ts):
-        with self.db_lock:
-            c = self.sqlite_conn.cursor()
-            c.execute("SELECT * FROM events WHERE start_time >= ? AND start_time <= ? ORDER BY start_time", (start_ts, end_ts))
-            return [dict(row) for row in c.fetchall()]
+        rows = self.partitions.query("SELECT * FROM events WHERE start_time >= ? AND start_time <= ?",
+                                     (start_ts, end_ts), start_ts, end_ts)
+        return sorted(_dedupe(rows), key=lambda e: e['start_time'])
 
-    def semantic_search(self, query, top_k=5):
+    def _vector_query(self, vec, table):
+        """单个月份表的向量检索入口；建立 IVF-PQ 索引后按配置的 nprobes / refine_factor 搜索 (无索引时这两个参数不生效)"""
+        return table.search(vec).nprobes(config.LANCE_SEARCH_NPROBES).refine_factor(config.LANCE_SEARCH_REFINE_FACTOR)
+
+    @staticmethod
+    def _build_vector_filter(start_time=None, end_time=None, scene_labels=None, min_interaction_score=None,
+                             camera_id=None, person_names=None):
+        """把检索条件拼成 LanceDB 过滤表达式；时间范围按与事件区间有交集判断"""
+        conds = []
+        if start_time is not None: conds.append(f"end_time >= {float(start_time)}")
+        if end_time is not None: conds.append(f"timestamp <= {float(end_time)}")
+        if scene_labels:
+            if isinstance(scene_labels, str): scene_labels = [scene_labels]
+            conds.append(f"scene_label IN ({', '.join(_sql_str(l) for l in scene_labels)})")
+        if min_interaction_score is not None: conds.append(f"interaction_score >= {float(min_interaction_score)}")
+        if camera_id: conds.append(f"camera_id = {_sql_str(camera_id)}")
+        if person_names:
+            if isinstance(person_names, str): person_names = [person_names]
+            conds.append(f"array_has_any(person_names, [{', '.join(_sql_str(n) for n in person_names)}])")
+        return " AND ".join(conds) or None
+
+    @staticmethod
+    def _build_sql_filter(start_time=None, end_time=None, scene_labels=None, min_interaction_score=None,
+                          camera_id=None, person_names=None):
+        """与 _build_vector_filter 相同的检索条件，作用于 SQLite events 表 (别名 ev)"""
+        conds, params = [], []
+        if start_time is not None: conds.append("ev.end_time >= ?"); params.append(float(start_time))
+        if end_time is not None: conds.append("ev.start_time <= ?"); params.append(float(end_time))
+        if scene_labels:
+            if isinstance(scene_labels, str): scene_labels = [scene_labels]
+            conds.append(f"ev.scene_label IN ({','.join('?' * len(scene_labels))})"); params += list(scene_labels)
+        if min_interaction_score is not None: conds.append("ev.interaction_score >= ?"); params.append(float(min_interaction_score))
+        if camera_id: conds.append("ev.camera_id = ?"); params.append(camera_id)
+        if person_names:
+            if isinstance(person_names, str): person_names = [person_names]
+            conds.append("(" + " OR ".join(["ev.person_names LIKE ?"] * len(person_names)) + ")")
+            params += ['%' + json.dumps(n, ensure_ascii=False) + '%' for n in person_names]
+        return conds, params
+
+    def keyword_search(self, query, top_k=5, **filters):
+        """FTS5 全文检索 (bm25 排序)，过滤条件同 semantic_search，结果附带 _bm25 (越小越相关)"""
+        fts_query = to_fts_query(query)
+        if not fts_query: return []
+        conds, params = self._build_sql_filter(**filters)
+        where = "".join(" AND " + cond for cond in conds)
         try:
-            vec = self.embedding_model.encode(query)
-            if hasattr(vec, "tolist"): vec = vec.tolist()
-            res = self.vector_table.search(vec).limit(top_k).to_list()
-            ids = [r['event_id'] for r in res]
-            return self.get_rich_event_details(event_ids=ids)
-        except: return []
-
-    def get_rich_event_details(self, event_ids=None, limit=20):
-        with self.db_lock:
-            c = self.sqlite_conn.cursor()
-            if event_ids:
-                if not event_ids: return []
-                ph = ','.join(['?']*len(event_ids))
-                c.execute(f"SELECT * FROM events WHERE event_id IN ({ph}) ORDER BY start_time DESC", event_ids)
-            else:
-                c.execute("SELECT * FROM events ORDER BY start_time DESC LIMIT ?", (limit,))
-            return [dict(row) for row in c.fetchall()]
+            # 各分区分别取 top_k 再按 bm25 合并 (各分区的词频统计独立，分数近似可比)
+            rows = self.partitions.query(f"""SELECT ev.*, bm25(events_fts) AS _bm25 FROM events_fts
+                                             JOIN events ev ON ev.event_id = events_fts.event_id
+                                             WHERE events_fts MATCH ?{where} ORDER BY _bm25 LIMIT ?""",
+                                         [fts_query] + params + [top_k], filters.get('start_time'), filters.get('end_time'))
+            return sorted(_dedupe(rows), key=lambda e: e['_bm25'])[:top_k]
+        except Exception as e:
+            logger.error(f"Keyword search failed: {e}")
+            return []
 
-    def query_knowledge_graph_by_nl(self, query):
-        return "KG Query Placeholder" 
+    def search(self, query, top_k=5, **filters):
+        """
+        混合检索：向量检索与全文检索各取候选，按倒数排名融合 (RRF) 排序。
+        人名、物品等精确关键词由全文检索命中，语义相近的描述由向量检索补充。
+        结果附带 _score (融合分) 与 _sources (命中的检索方式)。
+        """
+        n = max(top_k * config.HYBRID_CANDIDATE_FACTOR, top_k)
+        k = config.HYBRID_RRF_K
+        fused = {}
+        for source, results in (("vector", self.semantic_search(query, top_k=n, **filters)),
+                                ("keyword", self.keyword_search(query, top_k=n, **filters))):
+            for rank, event in enumerate(results):
+                item = fused.setdefault(event['event_id'], {**event, "_score": 0.0, "_sources": []})
+                item.update({key: v for key, v in event.items() if key.startswith("_") and key not in ("_score", "_sources")})
+                item['_score'] += 1.0 / (k + rank + 1)
+                item['_sources'].append(source)
+        return sorted(fused.values(), key=lambda e: e['_score'], reverse=True)[:top_k]
+
+    def semantic_search(self, query, top_k=5, **filters):
+        """
+        语义检索，可选过滤条件 (作为 LanceDB 预过滤下推)：
+        start_time / end_time (时间戳), scene_labels, min_interaction_score, camera_id, person_names。
+        结果保持相关度顺序，并附带向量距离 _distance。
+        """
+        try:
+            vec = self.encoder.encode_query(query)
+            where = self._build_vector_filter(**filters)
+            # 只检索与时间范围相关的月份表，各取 top_k 后按距离合并
+            res = []
+            for _, table in self.vectors.tables(filters.get('start_time'), filters.get('end_time')):
+                q = self._vector_query(vec, table)
+                if where: q = q.where(where, prefilter=True)
+                res += q.limit(top_k).to_list()
+            res = sorted(res, key=lambda r: r.get('_distance', 0))[:top_k]
+            details = {e['event_id']: e for e in self.get_rich_event_details(
+                event_ids=[r['event_id'] for r in res], months={month_key(r['timestamp']) for r in res})}
+            results = []
+            for r in res:
+                event = details.get(r['event_id'])
+                if event: results.append({**event, "_distance": r.get('_distance')})
+            return results
+        except Exception as e:
+            logger.error(f"Semantic search failed: {e}")
+            return []
+
+    def list_events(self, limit=24, cursor=None, columns=LIST_COLUMNS, **filters):
+        """
+        按时间倒序分页浏览事件 (键集分页，任意深度的翻页代价相同)。
+        cursor 为上一页返回的 next_cursor；过滤条件同 semantic_search。
+        返回 (events, next_cursor)，没有更多数据时 next_cursor 为 None。
+        """
+        conds, params = self._build_sql_filter(**filters)
+        cursor_ts = None
+        if cursor:
+            ts, event_id = cursor.split(":", 1)
+            cursor_ts = float(ts)
+            conds.append("(ev.start_time, ev.event_id) < (?, ?)")
+            params += [cursor_ts, event_id]
+        where = (" WHERE " + " AND ".join(conds)) if conds else ""
+        cols = ", ".join(f"ev.{col}" for col in columns)
+        sql = f"SELECT {cols} FROM events ev{where} ORDER BY ev.start_time DESC, ev.event_id DESC LIMIT ?"
+        end_ts = min(x for x in (filters.get('end_time'), cursor_ts) if x is not None) if (filters.get('end_time') or cursor_ts) else None
+
+        # 热库在前，分片从新到旧；已取够一页且剩余分片都更早时停止，不再打开更早的分片
+        rows = []
+        for part, c in self.partitions.sources(filters.get('start_time'), end_ts):
+            if part and len(rows) > limit and rows[limit]['start_time'] >= part['end_ts']: break
+            rows = _dedupe(rows + [dict(row) for row in c.execute(sql, params + [limit + 1]).fetchall()])
+            rows.sort(key=lambda e: (e['start_time'], e['event_id']), reverse=True)
+            rows = rows[:limit + 1]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{rows[-1]['start_time']!r}:{rows[-1]['event_id']}"
+        return rows, next_cursor
+
+    def get_rollups(self, start_ts, end_ts, granularity="hour", camera_id=None):
+        """读取 [start_ts, end_ts) 内的小时 (hour) 或天 (day) 级统计汇总"""
+        table = "rollup_hourly" if granularity == "hour" else "rollup_daily"
+        with self.db.read() as c:
+            return rollups.query(c, table, start_ts, end_ts, camera_id)
+
+    def rebuild_rollups(self):
+        """按全部历史事件 (含已封存分片) 重算统计汇总，返回事件数"""
+        archived = self.partitions.query(rollups.REBUILD_SQL, include_hot=False)
+        with self.db.write() as c:
+            return rollups.rebuild(c, archived)
+
+    def get_rich_event_details(self, event_ids=None, limit=20, months=None):
+        """
+        按 event_id 读取事件 (先查热库，未命中的再按时间倒序查分片；months 可限定只查哪些月份的分片)，
+        不传 event_ids 时返回最近 limit 个事件。
+        """
+        if not event_ids:
+            return self.list_events(limit=limit, columns=("*",))[0]
+        found = {}
+        for part, c in self.partitions.sources(months=months):
+            missing = [i for i in event_ids if i not in found]
+            if not missing: break
+            ph = ','.join(['?'] * len(missing))
+            for row in c.execute(f"SELECT * FROM events WHERE event_id IN ({ph})", missing).fetchall():
+                found[row['event_id']] = dict(row)
+        return sorted(found.values(), key=lambda e: e['start_time'], reverse=True)
+
+    def query_knowledge_graph_by_nl(self, query, time_range=None):
+        """按问题模板查询知识图谱预聚合表，返回文本上下文 (见 KGQueryEngine.answer)"""
+        try:
+            return self.kg_query.answer(query, time_range)
+        except Exception as e:
+            logger.error(f"KG query failed: {e}")
+            return "知识图谱查询失败"
 
     def get_all_kg_data(self, limit=300):
-        with self.db_lock:
-            c = self.sqlite_conn.cursor()
+        with self.db.read() as c:
             c.execute(f"""SELECT e1.name as source, e1.type as source_type, r.relation, e2.name as target, e2.type as target_type, r.event_id 
                          FROM relationships r JOIN entities e1 ON r.source_id=e1.id JOIN entities e2 ON r.target_id=e2.id LIMIT ?""", (limit,))
             return [dict(row) for row in c.fetchall()]
     
+    def get_known_person_names(self):
+        """知识图谱中出现过的人名"""
+        with self.db.read() as c:
+            c.execute("SELECT DISTINCT name FROM entities WHERE type='Person'")
+            return [row['name'] for row in c.fetchall() if row['name'] not in UNKNOWN_NAMES]
+
     def get_kg_for_event(self, event_id):
-        with self.db_lock:
-            c = self.sqlite_conn.cursor()
+        with self.db.read() as c:
             c.execute("""SELECT e1.name as source, r.relation, e2.name as target FROM relationships r 
                          JOIN entities e1 ON r.source_id=e1.id JOIN entities e2 ON r.target_id=e2.id WHERE r.event_id=?""", (event_id,))
             return [dict(row) for row in c.fetchall()]
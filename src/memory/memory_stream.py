@@ -7,6 +7,7 @@ from datetime import datetime
 import logging
 import config
 import json
+from src.perception.risk_signals import score_event_risk, priority_for_score
 
 logger = logging.getLogger(__name__)
 
@@ -51,9 +52,23 @@ def draw_debug_info_for_event_frame(frame, detections):
             
     return debug_frame
 
+def compute_frame_hash(frame):
+    """
+    计算 64bit 画面差异哈希 (dHash)，用于关键帧挑选时衡量画面变化。
+    使用原始帧而不是绘制了检测框的调试帧，避免框线本身造成差异。
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    diff = small[:, 1:] > small[:, :-1]
+    value = 0
+    for bit in diff.flatten():
+        value = (value << 1) | int(bit)
+    return f"{value:016x}"
+
 class MemoryStream:
-    def __init__(self, storage_path: str):
+    def __init__(self, storage_path: str, camera_id: str = None):
         self.storage_path = Path(storage_path)
+        self.camera_id = camera_id or config.CAMERA_ID
         self.storage_path.mkdir(exist_ok=True, parents=True)
         self.is_capturing = False
         self.last_person_seen_time = 0
@@ -100,8 +115,9 @@ class MemoryStream:
         if not self.buffer: return None
         
         evt_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-        evt_dir = self.storage_path / evt_id
-        evt_dir.mkdir(exist_ok=True)
+        # 按月分目录，与数据库分区一致，便于按月归档 / 清理
+        evt_dir = self.storage_path / evt_id[:6] / evt_id
+        evt_dir.mkdir(exist_ok=True, parents=True)
 
         frames_info = []
         preview_path = None
@@ -119,7 +135,8 @@ class MemoryStream:
             frames_info.append({
                 "image_path": str(path.resolve()), 
                 "detections": data["detections"],
-                "timestamp": data["timestamp"]
+                "timestamp": data["timestamp"],
+                "frame_hash": compute_frame_hash(data["frame"])
             })
             
             # 评分
@@ -132,10 +149,19 @@ class MemoryStream:
         if frames_info:
             preview_path = frames_info[best_idx]['image_path']
 
+        # 本地风险评分，决定分析队列中的优先级
+        h, w = self.buffer[0]["frame"].shape[:2]
+        risk_score, risk_reasons = score_event_risk(frames_info, (w, h))
+
         return {
             "event_id": evt_id,
+            "camera_id": self.camera_id,
             "frames": frames_info,
             "start_time": self.buffer[0]["timestamp"],
             "end_time": self.buffer[-1]["timestamp"],
-            "preview_image_path": preview_path
+            "preview_image_path": preview_path,
+            "frame_size": [w, h],
+            "risk_score": risk_score,
+            "risk_reasons": risk_reasons,
+            "priority": priority_for_score(risk_score)
         }
\ No newline at end of file
@@ -0,0 +1,153 @@
+# src/memory/migrations.py
+"""
+SQLite 结构迁移，按 PRAGMA user_version 顺序执行 (见 SQLiteStore.migrate)。
+新增表、列或索引时在末尾追加一个版本，已发布的迁移不要修改。
+"""
+import json
+import config
+from src.memory.text_search import to_fts_document
+from src.memory import rollups
+
+
+def _columns(c, table):
+    return [r[1] for r in c.execute(f"PRAGMA table_info({table})")]
+
+
+def m001_base_tables(c):
+    """基础表 (兼容迁移框架引入前创建的库)"""
+    c.execute('''CREATE TABLE IF NOT EXISTS events (event_id TEXT PRIMARY KEY, start_time REAL, end_time REAL, summary TEXT, image_paths TEXT, preview_image_path TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS entities (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, type TEXT NOT NULL, UNIQUE(name, type))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS relationships (id INTEGER PRIMARY KEY AUTOINCREMENT, source_id INTEGER, target_id INTEGER, relation TEXT, event_id TEXT, FOREIGN KEY(source_id) REFERENCES entities(id), FOREIGN KEY(target_id) REFERENCES entities(id), FOREIGN KEY(event_id) REFERENCES events(event_id))''')
+    # 已入库但向量尚未写入 LanceDB 的事件
+    c.execute('''CREATE TABLE IF NOT EXISTS pending_vectors (event_id TEXT PRIMARY KEY, summary TEXT, timestamp REAL, meta TEXT)''')
+    if 'meta' not in _columns(c, 'pending_vectors'):
+        c.execute("ALTER TABLE pending_vectors ADD COLUMN meta TEXT")
+
+
+def m002_query_indexes(c):
+    """时间范围与图谱 JOIN 查询所需索引"""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_events_start_time ON events(start_time)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_relationships_event_id ON relationships(event_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_relationships_source_id ON relationships(source_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_relationships_target_id ON relationships(target_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_entities_type ON entities(type)")
+
+
+def _parse_ext_summary(ext_summary):
+    """拆分旧版 summary 中追加的 |||LABEL: / |||SCORE: 标记，返回 (summary, label, score)"""
+    parts = (ext_summary or "").split("|||")
+    label, score = None, None
+    for p in parts[1:]:
+        if p.startswith("LABEL:"): label = p[6:]
+        elif p.startswith("SCORE:"):
+            try: score = float(p[6:])
+            except ValueError: pass
+    return parts[0], label, score
+
+
+def m003_event_metadata_columns(c):
+    """events 增加 scene_label / interaction_score / camera_id / person_names 列，并从旧摘要中解析回填"""
+    existing = _columns(c, 'events')
+    for col, ctype in (("scene_label", "TEXT"), ("interaction_score", "REAL"), ("camera_id", "TEXT"), ("person_names", "TEXT")):
+        if col not in existing: c.execute(f"ALTER TABLE events ADD COLUMN {col} {ctype}")
+
+    persons = {}
+    for event_id, name in c.execute("""SELECT DISTINCT r.event_id, e.name FROM relationships r JOIN entities e
+                                       ON e.id IN (r.source_id, r.target_id) WHERE e.type='Person'""").fetchall():
+        persons.setdefault(event_id, []).append(name)
+
+    updates = []
+    for event_id, summary in c.execute("SELECT event_id, summary FROM events").fetchall():
+        text, label, score = _parse_ext_summary(summary)
+        updates.append((text, label, score, config.CAMERA_ID, json.dumps(sorted(persons.get(event_id, [])), ensure_ascii=False), event_id))
+    c.executemany("UPDATE events SET summary=?, scene_label=?, interaction_score=?, camera_id=?, person_names=? WHERE event_id=?", updates)
+
+    c.execute("CREATE INDEX IF NOT EXISTS idx_events_scene_label ON events(scene_label, start_time)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_events_camera_id ON events(camera_id, start_time)")
+
+
+def m004_kg_aggregates(c):
+    """知识图谱预聚合：实体出现的事件、实体度数统计、实体对邻接计数，并从已有关系回填"""
+    c.execute("""CREATE TABLE IF NOT EXISTS entity_events (entity_id INTEGER NOT NULL, event_id TEXT NOT NULL, start_time REAL,
+                 PRIMARY KEY (entity_id, event_id))""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_entity_events_entity_time ON entity_events(entity_id, start_time)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_entity_events_event ON entity_events(event_id)")
+    c.execute("""CREATE TABLE IF NOT EXISTS entity_stats (entity_id INTEGER PRIMARY KEY, degree INTEGER DEFAULT 0,
+                 event_count INTEGER DEFAULT 0, first_seen REAL, last_seen REAL)""")
+    # 无向邻接：a_id < b_id
+    c.execute("""CREATE TABLE IF NOT EXISTS entity_pairs (a_id INTEGER NOT NULL, b_id INTEGER NOT NULL, weight INTEGER DEFAULT 0,
+                 last_seen REAL, PRIMARY KEY (a_id, b_id))""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_entity_pairs_b ON entity_pairs(b_id, a_id)")
+
+    c.execute("""INSERT OR IGNORE INTO entity_events (entity_id, event_id, start_time)
+                 SELECT x.entity_id, x.event_id, ev.start_time FROM (
+                     SELECT source_id AS entity_id, event_id FROM relationships
+                     UNION SELECT target_id, event_id FROM relationships) x
+                 LEFT JOIN events ev ON ev.event_id = x.event_id""")
+    c.execute("""INSERT OR REPLACE INTO entity_pairs (a_id, b_id, weight, last_seen)
+                 SELECT MIN(r.source_id, r.target_id), MAX(r.source_id, r.target_id), COUNT(*), MAX(ev.start_time)
+                 FROM relationships r LEFT JOIN events ev ON ev.event_id = r.event_id
+                 WHERE r.source_id != r.target_id GROUP BY 1, 2""")
+    c.execute("""INSERT OR REPLACE INTO entity_stats (entity_id, degree, event_count, first_seen, last_seen)
+                 SELECT ee.entity_id,
+                        (SELECT COUNT(*) FROM relationships r WHERE r.source_id = ee.entity_id OR r.target_id = ee.entity_id),
+                        COUNT(*), MIN(ee.start_time), MAX(ee.start_time)
+                 FROM entity_events ee GROUP BY ee.entity_id""")
+
+
+def m005_events_fts(c):
+    """事件摘要 + 图谱实体名的 FTS5 全文索引 (中文预分词，见 text_search)，并回填已有事件"""
+    c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(content, event_id UNINDEXED, tokenize='unicode61')")
+    names = {}
+    for event_id, name in c.execute("""SELECT ee.event_id, e.name FROM entity_events ee
+                                       JOIN entities e ON e.id = ee.entity_id""").fetchall():
+        names.setdefault(event_id, []).append(name)
+    rows = [(to_fts_document(summary, " ".join(names.get(event_id, []))), event_id)
+            for event_id, summary in c.execute("SELECT event_id, summary FROM events").fetchall()]
+    c.executemany("INSERT INTO events_fts (content, event_id) VALUES (?,?)", rows)
+
+
+def m006_event_listing_index(c):
+    """事件列表按 (start_time, event_id) 键集分页"""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_events_start_event ON events(start_time, event_id)")
+
+
+def m007_rollups(c):
+    """按摄像头的小时 / 天级统计汇总表，并按历史事件重算"""
+    rollups.create_tables(c)
+    rollups.rebuild(c)
+
+
+def m008_presence_intervals(c):
+    """人员在场区间 (见 PresenceIndex)"""
+    c.execute("""CREATE TABLE IF NOT EXISTS presence_intervals (id INTEGER PRIMARY KEY AUTOINCREMENT, person TEXT NOT NULL,
+                 camera_id TEXT NOT NULL, start_time REAL NOT NULL, end_time REAL NOT NULL, frame_count INTEGER DEFAULT 0)""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_presence_person_end ON presence_intervals(person, end_time)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_presence_end ON presence_intervals(end_time)")
+
+
+
+def m009_heatmap_hourly(c):
+    """按摄像头 / 人物 / 小时的落脚点热力网格 (见 OccupancyHeatmap)"""
+    c.execute("""CREATE TABLE IF NOT EXISTS heatmap_hourly (camera_id TEXT NOT NULL, person TEXT NOT NULL, bucket_start REAL NOT NULL,
+                 rows INTEGER, cols INTEGER, frames INTEGER DEFAULT 0, grid BLOB, PRIMARY KEY (camera_id, person, bucket_start))""")
+
+
+def m010_partition_catalog(c):
+    """按月封存的事件分片目录 (见 PartitionManager)"""
+    c.execute("""CREATE TABLE IF NOT EXISTS partitions (month TEXT PRIMARY KEY, start_ts REAL NOT NULL, end_ts REAL NOT NULL,
+                 shard_path TEXT, event_count INTEGER DEFAULT 0, sealed_at REAL, compacted_at REAL, vector_compacted_at REAL)""")
+
+
+MIGRATIONS = [
+    (1, m001_base_tables),
+    (2, m002_query_indexes),
+    (3, m003_event_metadata_columns),
+    (4, m004_kg_aggregates),
+    (5, m005_events_fts),
+    (6, m006_event_listing_index),
+    (7, m007_rollups),
+    (8, m008_presence_intervals),
+    (9, m009_heatmap_hourly),
+    (10, m010_partition_catalog),
+]
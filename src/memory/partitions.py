@@ -0,0 +1,316 @@
+# src/memory/partitions.py
+"""
+事件数据的按月分区。
+- 热库 knowledge.db 保存最近 PARTITION_HOT_MONTHS 个月的 events / events_fts，以及全部时间的图谱、统计汇总等紧凑表
+- 更早的月份封存为 <PARTITION_ARCHIVE_PATH>/events_YYYYMM.db (只含 events / events_fts)，封存后 VACUUM 一次，
+  此后只以只读方式打开；备份时已封存的分片无需重复复制
+- 分区目录 partitions 表 (在热库中) 记录每个封存月份的时间范围、路径和事件数，查询按时间范围只打开相关分片
+封存晚到的旧月份事件 (如分析队列积压) 会再次合并进对应分片。
+向量同样按事件开始时间的月份分表 (semantic_memory_YYYYMM，见 VectorPartitions)。
+"""
+import logging
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import config
+
+logger = logging.getLogger(__name__)
+
+VECTOR_TABLE_PREFIX = "semantic_memory_"
+
+
+def month_key(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y%m")
+
+
+def month_range(key):
+    """'YYYYMM' -> 当月 [1 日零点, 次月 1 日零点) 的本地时间戳"""
+    year, month = int(key[:4]), int(key[4:])
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return start.timestamp(), end.timestamp()
+
+
+def months_between(start_ts, end_ts):
+    """[start_ts, end_ts] 覆盖的月份 (升序)"""
+    keys, key = [], month_key(start_ts)
+    while key <= month_key(end_ts):
+        keys.append(key)
+        key = month_key(month_range(key)[1])
+    return keys
+
+
+class PartitionManager:
+    def __init__(self, db, root=None, hot_months=None):
+        self.db = db
+        self.root = Path(root or config.PARTITION_ARCHIVE_PATH)
+        self.root.mkdir(exist_ok=True, parents=True)
+        self.hot_months = hot_months or config.PARTITION_HOT_MONTHS
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+
+    # --- 目录 ---
+    def sealed(self, start_ts=None, end_ts=None):
+        """与 [start_ts, end_ts] 有交集的已封存分区，按时间倒序"""
+        with self.db.read() as c:
+            rows = c.execute("""SELECT * FROM partitions WHERE sealed_at IS NOT NULL AND end_ts > ? AND start_ts <= ?
+                                ORDER BY start_ts DESC""",
+                             (start_ts if start_ts is not None else -1e18, end_ts if end_ts is not None else 1e18)).fetchall()
+        return [dict(r) for r in rows]
+
+    def catalog(self):
+        with self.db.read() as c:
+            return {r['month']: dict(r) for r in c.execute("SELECT * FROM partitions")}
+
+    # --- 读取 ---
+    @contextmanager
+    def read_shard(self, path):
+        """已封存分片的只读游标 (每个线程每个分片一个连接)"""
+        conns = getattr(self._local, "conns", None)
+        if conns is None: conns = self._local.conns = {}
+        conn = conns.get(path)
+        if conn is None:
+            conn = conns[path] = sqlite3.connect(f"file:{Path(path).resolve()}?mode=ro", uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            with self._readers_lock: self._readers.append(conn)
+        c = conn.cursor()
+        try:
+            yield c
+        finally:
+            c.close()
+
+    def sources(self, start_ts=None, end_ts=None, months=None, include_hot=True):
+        """
+        按时间从新到旧依次产出 (分区信息, 游标)：先热库 (分区信息为 None)，再与时间范围相关的已封存分片。
+        months 可进一步限定分片月份。调用方可以在结果足够时提前停止迭代，更早的分片不会被打开。
+        """
+        if include_hot:
+            with self.db.read() as c:
+                yield None, c
+        for part in self.sealed(start_ts, end_ts):
+            if months is not None and part['month'] not in months: continue
+            with self.read_shard(part['shard_path']) as c:
+                yield part, c
+
+    def query(self, sql, params=(), start_ts=None, end_ts=None, include_hot=True):
+        """在热库与相关分片上执行同一条只涉及 events / events_fts 的查询，合并结果 (dict 列表)"""
+        rows = []
+        for _, c in self.sources(start_ts, end_ts, include_hot=include_hot):
+            rows += [dict(r) for r in c.execute(sql, params).fetchall()]
+        return rows
+
+    # --- 封存 ---
+    def due_months(self, now=None):
+        """热库中早于保留窗口、应当封存的月份"""
+        key = month_key(now or time.time())
+        for _ in range(self.hot_months - 1):
+            key = month_key(month_range(key)[0] - 1)
+        cutoff = month_range(key)[0]
+        with self.db.read() as c:
+            rows = c.execute("""SELECT DISTINCT strftime('%Y%m', start_time, 'unixepoch', 'localtime') FROM events
+                                WHERE start_time < ?""", (cutoff,)).fetchall()
+        return sorted(r[0] for r in rows if r[0])
+
+    def seal_due(self, now=None):
+        """封存所有到期月份，返回 {month: 迁出的事件数}"""
+        return {key: self.seal_month(key) for key in self.due_months(now)}
+
+    def seal_month(self, key):
+        """
+        把热库中某月的 events / events_fts 迁入分片：
+        1. 在分片中 INSERT OR REPLACE 并提交 (WAL 模式下跨库事务不保证原子，所以分两步)
+        2. 在热库中删除这些行并登记分区目录 (同一事务，读者要么看到热库中的行，要么看到目录中的分片)
+        中途失败时两边可能暂时各有一份，重新封存是幂等的，读取方按 event_id 去重。
+        """
+        start, end = month_range(key)
+        path = str((self.root / f"events_{key}.db").resolve())
+        with self.db.write() as c:
+            c.execute("ATTACH DATABASE ? AS shard", (path,))
+        try:
+            with self.db.write() as c:
+                self._create_shard_schema(c)
+                cols = ", ".join(r[1] for r in c.execute("PRAGMA main.table_info(events)"))
+                moved = c.execute(f"""INSERT OR REPLACE INTO shard.events ({cols}) SELECT {cols} FROM main.events
+                                      WHERE start_time >= ? AND start_time < ?""", (start, end)).rowcount
+                ids = "SELECT event_id FROM main.events WHERE start_time >= ? AND start_time < ?"
+                c.execute(f"DELETE FROM shard.events_fts WHERE event_id IN ({ids})", (start, end))
+                c.execute(f"""INSERT INTO shard.events_fts (content, event_id) SELECT content, event_id FROM main.events_fts
+                              WHERE event_id IN ({ids})""", (start, end))
+            with self.db.write() as c:
+                c.execute(f"DELETE FROM main.events_fts WHERE event_id IN ({ids})", (start, end))
+                c.execute("DELETE FROM main.events WHERE start_time >= ? AND start_time < ?", (start, end))
+                total = c.execute("SELECT COUNT(*) FROM shard.events").fetchone()[0]
+                c.execute("""INSERT INTO partitions (month, start_ts, end_ts, shard_path, event_count, sealed_at) VALUES (?,?,?,?,?,?)
+                             ON CONFLICT(month) DO UPDATE SET shard_path=excluded.shard_path, event_count=excluded.event_count,
+                             sealed_at=excluded.sealed_at, compacted_at=NULL, vector_compacted_at=NULL""",
+                          (key, start, end, path, total, time.time()))
+        finally:
+            with self.db.write() as c:
+                c.execute("DETACH DATABASE shard")
+        self.compact(key)
+        logger.info(f"[分区] 封存 {key}: 迁出 {moved} 个事件 -> {path}")
+        return moved
+
+    @staticmethod
+    def _create_shard_schema(c):
+        """按热库中 events / events_fts 及其索引的建表语句在分片中建表"""
+        for name, ddl in c.execute("""SELECT name, sql FROM main.sqlite_master WHERE sql IS NOT NULL AND
+                                      (name IN ('events', 'events_fts') OR (type = 'index' AND tbl_name = 'events'))
+                                      ORDER BY type = 'index'""").fetchall():
+            ddl = re.sub(r"^CREATE (TABLE|VIRTUAL TABLE|INDEX|UNIQUE INDEX)\s+(IF NOT EXISTS\s+)?",
+                         lambda m: f"CREATE {m.group(1)} IF NOT EXISTS shard.", ddl, count=1)
+            c.execute(ddl)
+
+    def compact(self, key):
+        """单独整理一个分片：VACUUM + ANALYZE，并切换为非 WAL 日志模式以便只读打开"""
+        with self.db.read() as c:
+            row = c.execute("SELECT shard_path FROM partitions WHERE month=?", (key,)).fetchone()
+        if not row: return
+        self._close_readers(row[0])
+        conn = sqlite3.connect(row[0], isolation_level=None, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.execute("VACUUM")
+            conn.execute("ANALYZE")
+        finally:
+            conn.close()
+        with self.db.write() as c:
+            c.execute("UPDATE partitions SET compacted_at=? WHERE month=?", (time.time(), key))
+
+    @contextmanager
+    def maintain_shard(self, key):
+        """以读写方式打开已封存分片做维护 (如数据清理)，退出时提交；调用方之后应执行 compact()"""
+        with self.db.read() as c:
+            row = c.execute("SELECT shard_path FROM partitions WHERE month=?", (key,)).fetchone()
+        if not row: raise KeyError(key)
+        self._close_readers(row[0])
+        conn = sqlite3.connect(row[0], timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn.cursor()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def finish_maintenance(self, key, deleted):
+        """
+        维护结束后更新目录中的事件数；有行被删除时整理分片并让向量表重新整理一次。
+        分片已空时删除分片文件与目录行，返回剩余事件数。
+        """
+        with self.db.read() as c:
+            row = c.execute("SELECT shard_path FROM partitions WHERE month=?", (key,)).fetchone()
+        if not row: return 0
+        with self.read_shard(row[0]) as c:
+            total = c.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        if total == 0:
+            self._close_readers(row[0])
+            with self.db.write() as c:
+                c.execute("DELETE FROM partitions WHERE month=?", (key,))
+            Path(row[0]).unlink(missing_ok=True)
+            logger.info(f"[分区] {key} 已无事件，删除分片 {row[0]}")
+            return 0
+        with self.db.write() as c:
+            c.execute("UPDATE partitions SET event_count=? WHERE month=?", (total, key))
+            if deleted: c.execute("UPDATE partitions SET vector_compacted_at=NULL WHERE month=?", (key,))
+        if deleted: self.compact(key)
+        return total
+
+    def mark_vector_compacted(self, key):
+        with self.db.write() as c:
+            c.execute("UPDATE partitions SET vector_compacted_at=? WHERE month=?", (time.time(), key))
+
+    def _close_readers(self, path):
+        """关闭当前线程对该分片的只读连接 (其他线程的连接在下次查询时仍可用，只读连接不阻塞维护)"""
+        conns = getattr(self._local, "conns", None) or {}
+        conn = conns.pop(path, None)
+        if conn:
+            with self._readers_lock:
+                if conn in self._readers: self._readers.remove(conn)
+            conn.close()
+
+    def close(self):
+        with self._readers_lock:
+            for conn in self._readers:
+                try: conn.close()
+                except Exception: pass
+            self._readers.clear()
+
+
+class VectorPartitions:
+    """
+    按月分表的 LanceDB 向量存储：semantic_memory_YYYYMM。
+    写入按行的 timestamp (事件开始时间) 分组到对应月份的表；检索时按时间范围只打开相关月份的表。
+    已封存月份的表由维护任务整理一次后不再改动。
+    """
+    def __init__(self, vector_db, schema):
+        self.vector_db = vector_db
+        self.schema = schema
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def table_name(key):
+        return VECTOR_TABLE_PREFIX + key
+
+    def months(self):
+        """已存在的月份表 (升序)，每次从 LanceDB 目录读取，可见其他进程新建的表"""
+        return sorted(n[len(VECTOR_TABLE_PREFIX):] for n in self.vector_db.table_names()
+                      if n.startswith(VECTOR_TABLE_PREFIX) and n[len(VECTOR_TABLE_PREFIX):].isdigit())
+
+    def table(self, key, create=False):
+        with self._lock:
+            table = self._tables.get(key)
+            if table is None:
+                name = self.table_name(key)
+                if name in self.vector_db.table_names():
+                    table = self.vector_db.open_table(name)
+                elif create:
+                    table = self.vector_db.create_table(name, schema=self.schema)
+                else:
+                    return None
+                self._tables[key] = table
+            return table
+
+    def tables(self, start_ts=None, end_ts=None):
+        """
+        与 [start_ts, end_ts] 相关的 (月份, 表)，按时间倒序。
+        事件可能跨月 (开始于上月末)，所以起点多看一天。
+        """
+        keys = self.months()
+        if start_ts is not None or end_ts is not None:
+            lo = month_key(start_ts - 86400) if start_ts is not None else "000000"
+            hi = month_key(end_ts) if end_ts is not None else "999999"
+            keys = [k for k in keys if lo <= k <= hi]
+        return [(k, self.table(k)) for k in reversed(keys)]
+
+    def add(self, rows):
+        groups = {}
+        for row in rows: groups.setdefault(month_key(row['timestamp']), []).append(row)
+        for key, group in groups.items():
+            self.table(key, create=True).add(group)
+
+    def delete(self, event_ids_by_ts):
+        """event_ids_by_ts: [(event_id, timestamp)]"""
+        groups = {}
+        for event_id, ts in event_ids_by_ts: groups.setdefault(month_key(ts), []).append(event_id)
+        for key, ids in groups.items():
+            table = self.table(key)
+            if table is None: continue
+            table.delete("event_id IN (" + ", ".join("'" + i.replace("'", "''") + "'" for i in ids) + ")")
+
+    def drop(self, key):
+        with self._lock:
+            self._tables.pop(key, None)
+            if self.table_name(key) in self.vector_db.table_names():
+                self.vector_db.drop_table(self.table_name(key))
+
+    def count_rows(self):
+        return sum(table.count_rows() for _, table in self.tables())
@@ -0,0 +1,134 @@
+# src/memory/presence.py
+import logging
+import threading
+from datetime import datetime, timedelta
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def _day_range(day=None):
+    """day 为 datetime / date / None (今天)，返回当天 [零点, 次日零点) 的时间戳"""
+    day = day or datetime.now()
+    start = datetime(day.year, day.month, day.day)
+    return start.timestamp(), (start + timedelta(days=1)).timestamp()
+
+
+class PresenceIndex:
+    """
+    人员在场时间线 (presence_intervals 表)：
+    - observe() 逐帧接收识别结果，在内存中把同一人、同一摄像头的连续识别合并为区间
+      (两次识别间隔不超过 gap_tolerance 视为连续)，不访问数据库
+    - 每隔 flush_seconds 把新增 / 延长 / 结束的区间批量写入 SQLite；未结束的区间也会写入，查询可见当前在场的人
+    - 查询 (first_seen / last_seen / 累计时长 / 区间列表) 走 (person, end_time) 索引，毫秒级返回
+    """
+    def __init__(self, db, gap_tolerance=None, flush_seconds=None):
+        self.db = db
+        self.gap_tolerance = gap_tolerance if gap_tolerance is not None else config.PRESENCE_GAP_TOLERANCE
+        self.flush_seconds = flush_seconds if flush_seconds is not None else config.PRESENCE_FLUSH_SECONDS
+        self._open = {}      # (person, camera_id) -> 区间 dict
+        self._dirty = []     # 待写入的区间 (含已结束的)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0
+
+    # --- 写入 ---
+    def observe(self, camera_id, ts, detections):
+        """一帧的检测结果 (可为空列表)；Unknown 不计入"""
+        names = {d.get('name') for d in detections or [] if d.get('name') and 'Unknown' not in d.get('name')}
+        with self._lock:
+            for key, iv in list(self._open.items()):
+                if key[1] == camera_id and key[0] not in names and ts - iv['end_time'] > self.gap_tolerance:
+                    self._close(key)
+            for name in names:
+                key = (name, camera_id)
+                iv = self._open.get(key)
+                if iv and ts - iv['end_time'] > self.gap_tolerance:
+                    self._close(key)
+                    iv = None
+                if iv is None:
+                    iv = self._open[key] = {"id": None, "person": name, "camera_id": camera_id,
+                                            "start_time": ts, "end_time": ts, "frame_count": 0}
+                iv['end_time'] = max(iv['end_time'], ts)
+                iv['frame_count'] += 1
+                self._mark(iv)
+        if ts - self._last_flush >= self.flush_seconds:
+            self.flush()
+            self._last_flush = ts
+
+    def _mark(self, iv):
+        if not iv.get('_dirty'):
+            iv['_dirty'] = True
+            self._dirty.append(iv)
+
+    def _close(self, key):
+        self._mark(self._open.pop(key))
+
+    def flush(self, close_all=False):
+        """把变化的区间写入数据库；close_all=True 时 (程序退出) 结束所有未结束的区间"""
+        with self._flush_lock:
+            with self._lock:
+                if close_all:
+                    for key in list(self._open): self._close(key)
+                batch, self._dirty = self._dirty, []
+                rows = [(iv, (iv['person'], iv['camera_id'], iv['start_time'], iv['end_time'], iv['frame_count'])) for iv in batch]
+                for iv in batch: iv['_dirty'] = False
+            if not rows: return 0
+            try:
+                new_ids = []
+                with self.db.write() as c:
+                    for iv, values in rows:
+                        if iv['id'] is None:
+                            new_ids.append((iv, c.execute("""INSERT INTO presence_intervals (person, camera_id, start_time, end_time, frame_count)
+                                                             VALUES (?,?,?,?,?) RETURNING id""", values).fetchone()[0]))
+                    c.executemany("UPDATE presence_intervals SET end_time=?, frame_count=? WHERE id=?",
+                                  [(iv['end_time'], iv['frame_count'], iv['id']) for iv, _ in rows if iv['id'] is not None])
+                for iv, new_id in new_ids: iv['id'] = new_id
+                return len(rows)
+            except Exception as e:
+                logger.error(f"[Presence] 写入失败，下次重试: {e}")
+                with self._lock:
+                    for iv, _ in rows: self._mark(iv)
+                return 0
+
+    # --- 查询 ---
+    def intervals(self, start_ts, end_ts, person=None, camera_id=None):
+        """与 [start_ts, end_ts) 有交集的区间，按开始时间排序"""
+        sql = "SELECT person, camera_id, start_time, end_time, frame_count FROM presence_intervals WHERE end_time >= ? AND start_time < ?"
+        params = [start_ts, end_ts]
+        if person:
+            sql += " AND person = ?"
+            params.append(person)
+        if camera_id:
+            sql += " AND camera_id = ?"
+            params.append(camera_id)
+        with self.db.read() as c:
+            return [dict(r) for r in c.execute(sql + " ORDER BY start_time", params).fetchall()]
+
+    def summary(self, start_ts, end_ts, person=None, camera_id=None):
+        """
+        每人在时间范围内的 first_seen / last_seen / total_seconds (区间截断到范围内) / 区间数。
+        同一人在多个摄像头重叠的时段分别计入。
+        """
+        sql = """SELECT person, MIN(MAX(start_time, :s)) AS first_seen, MAX(MIN(end_time, :e)) AS last_seen,
+                        SUM(MIN(end_time, :e) - MAX(start_time, :s)) AS total_seconds, COUNT(*) AS interval_count
+                 FROM presence_intervals WHERE end_time >= :s AND start_time < :e"""
+        params = {"s": start_ts, "e": end_ts, "p": person, "c": camera_id}
+        if person: sql += " AND person = :p"
+        if camera_id: sql += " AND camera_id = :c"
+        with self.db.read() as c:
+            return [dict(r) for r in c.execute(sql + " GROUP BY person ORDER BY first_seen", params).fetchall()]
+
+    def person_day(self, person, day=None, camera_id=None):
+        """某人某天 (默认今天) 的在场情况；当天未出现返回 None"""
+        start, end = _day_range(day)
+        return self.person_range(person, start, end, camera_id)
+
+    def person_range(self, person, start_ts, end_ts, camera_id=None):
+        rows = self.summary(start_ts, end_ts, person=person, camera_id=camera_id)
+        if not rows: return None
+        return {**rows[0], "intervals": self.intervals(start_ts, end_ts, person=person, camera_id=camera_id)}
+
+    def known_persons(self):
+        with self.db.read() as c:
+            return [r[0] for r in c.execute("SELECT DISTINCT person FROM presence_intervals")]
@@ -0,0 +1,231 @@
+# src/memory/retention.py
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+import config
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+_CANDIDATE_SQL = """SELECT event_id, start_time, image_paths, preview_image_path FROM events
+                    WHERE start_time < ? AND {where} AND (start_time, event_id) > (?, ?)
+                    ORDER BY start_time, event_id LIMIT ?"""
+
+# 各级清理：候选条件、要删除的文件、数据库更新 (None 表示删除整条事件)
+_TIERS = {
+    "frames": ("image_paths IS NOT NULL AND image_paths != '[]'",
+               lambda ev: [p for p in _paths(ev) if p != ev['preview_image_path']],
+               "UPDATE events SET image_paths='[]' WHERE event_id IN ({ph})"),
+    "preview": ("preview_image_path IS NOT NULL",
+                lambda ev: _paths(ev) + [ev['preview_image_path']],
+                "UPDATE events SET image_paths='[]', preview_image_path=NULL WHERE event_id IN ({ph})"),
+    "summary": ("1", lambda ev: _paths(ev) + [ev['preview_image_path']], None),
+}
+
+
+def _paths(ev):
+    try: return list(json.loads(ev['image_paths'] or "[]"))
+    except ValueError: return []
+
+
+def _size(path):
+    try: return os.path.getsize(path)
+    except OSError: return 0
+
+
+class RetentionEngine:
+    """
+    数据保留与清理 (后台低优先级任务，每 RETENTION_INTERVAL 秒一轮)。按事件年龄分级：
+    - 超过 RETENTION_FULL_FRAMES_DAYS：删除除预览图外的帧，image_paths 置空
+    - 超过 RETENTION_PREVIEW_DAYS：删除预览图，只保留摘要 (仍可检索)
+    - 超过 RETENTION_SUMMARY_DAYS：删除事件本身，连同全文索引、关系与图谱聚合、向量；分片删空后整体删除
+    另外按天删除过期的检测日志和告警快照。图片所在磁盘超过高水位时，不论年龄按时间从旧到新提前清理
+    (检测日志 -> 完整帧 -> 预览图)，直到低于低水位。
+    每批 RETENTION_BATCH_SIZE 个事件：先删文件、再在一个事务中更新数据库 (中途退出时下一轮会重新选中这些事件，
+    不会留下指向已删文件的记录)。统计汇总 (rollup_*) 作为长期趋势保留，不随事件删除扣减。
+    dry_run=True 时只统计将要清理的事件数、文件数和字节数，不做任何修改。
+    """
+    def __init__(self, ltm, interval=None, dry_run=None):
+        self.ltm = ltm
+        self.interval = interval if interval is not None else config.RETENTION_INTERVAL
+        self.dry_run = dry_run if dry_run is not None else config.RETENTION_DRY_RUN
+        self.image_root = Path(config.IMAGE_STORAGE_PATH)
+        self.last_report = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        if self._thread: self._thread.join(timeout)
+
+    def _run(self):
+        # 只降低本线程的调度优先级 (Linux 上 setpriority 对线程 id 生效)
+        try: os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError): pass
+        while not self._stopped.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"数据清理失败: {e}")
+
+    # --- 磁盘水位 ---
+    def _disk_usage(self):
+        """图片所在磁盘的使用率；dry_run 时扣除本轮预计释放的字节数"""
+        usage = shutil.disk_usage(self.image_root)
+        return (usage.used - self._freed) / usage.total
+
+    def _over_low_water(self):
+        return self._disk_usage() > config.RETENTION_DISK_LOW_WATER
+
+    # --- 主流程 ---
+    def run_once(self, dry_run=None, now=None):
+        """执行一轮清理，返回报告；dry_run 为 None 时使用构造时的设置"""
+        dry_run = self.dry_run if dry_run is None else dry_run
+        now = now or time.time()
+        with self._lock:
+            self._dry_run, self._freed, self._entities_removed, self._planned = dry_run, 0, 0, set()
+            report = {"dry_run": dry_run, "time": now, "disk_before": round(self._disk_usage(), 4), "pressure": False}
+            days = lambda n: now - n * DAY if n is not None else None
+            report["detection_log"] = self._expire_dirs(Path(config.DETECTION_LOG_PATH), days(config.RETENTION_DETECTION_LOG_DAYS))
+            report["snapshots"] = self._expire_snapshots(days(config.RETENTION_SNAPSHOT_DAYS))
+            for tier, n in (("frames", config.RETENTION_FULL_FRAMES_DAYS), ("preview", config.RETENTION_PREVIEW_DAYS),
+                            ("summary", config.RETENTION_SUMMARY_DAYS)):
+                report[tier] = self._run_tier(tier, days(n)) if n is not None else self._empty_stats()
+
+            if self._disk_usage() > config.RETENTION_DISK_HIGH_WATER:
+                report["pressure"] = True
+                logger.warning(f"[清理] 磁盘使用率 {self._disk_usage():.0%} 超过高水位，提前清理最旧的数据")
+                self._merge(report["detection_log"], self._expire_dirs(Path(config.DETECTION_LOG_PATH), now - DAY, self._over_low_water))
+                for tier in ("frames", "preview"):
+                    if not self._over_low_water(): break
+                    self._merge(report[tier], self._run_tier(tier, now, self._over_low_water))
+
+            if self._entities_removed and not dry_run: self.ltm.kg_writer.clear()
+            report["entities_removed"] = self._entities_removed
+            report["disk_after"] = round(self._disk_usage(), 4)
+            self.last_report = report
+            logger.info(f"[清理]{' (dry-run)' if dry_run else ''} " + ", ".join(
+                f"{k}: {report[k]['events']} 个事件 / {report[k]['files']} 个文件 / {report[k]['bytes'] / 1e6:.1f}MB"
+                for k in ("frames", "preview", "summary")) +
+                f", 检测日志 {report['detection_log']['files']} 个文件, 磁盘 {report['disk_before']:.0%}->{report['disk_after']:.0%}")
+            return report
+
+    @staticmethod
+    def _empty_stats():
+        return {"events": 0, "files": 0, "bytes": 0}
+
+    @staticmethod
+    def _merge(total, stats):
+        for k, v in stats.items(): total[k] = total.get(k, 0) + v
+
+    # --- 事件分级清理 ---
+    def _sources(self, cutoff):
+        """与 [.., cutoff) 相关的数据源，从旧到新：已封存分片 (分区信息) 在前，热库 (None) 最后"""
+        return list(reversed(self.ltm.partitions.sealed(None, cutoff))) + [None]
+
+    def _reader(self, part):
+        return self.ltm.db.read() if part is None else self.ltm.partitions.read_shard(part['shard_path'])
+
+    def _writer(self, part):
+        return self.ltm.db.write() if part is None else self.ltm.partitions.maintain_shard(part['month'])
+
+    def _run_tier(self, tier, cutoff, keep_going=None):
+        """对 cutoff 之前的事件执行某一级清理，keep_going 返回 False 时提前结束 (磁盘水位已恢复)"""
+        where, files_of, update = _TIERS[tier]
+        stats = self._empty_stats()
+        for part in self._sources(cutoff):
+            touched, deleted, cursor = 0, 0, (-1e18, "")
+            while not self._stopped.is_set() and (keep_going is None or keep_going()):
+                with self._reader(part) as c:
+                    rows = [dict(r) for r in c.execute(_CANDIDATE_SQL.format(where=where),
+                                                       (cutoff, *cursor, config.RETENTION_BATCH_SIZE)).fetchall()]
+                if not rows: break
+                cursor = (rows[-1]['start_time'], rows[-1]['event_id'])
+                files = [p for ev in rows for p in files_of(ev) if p]
+                n, size = self._remove_files(files)
+                if not self._dry_run:
+                    self._apply(part, rows, update)
+                    time.sleep(config.RETENTION_BATCH_PAUSE)
+                self._merge(stats, {"events": len(rows), "files": n, "bytes": size})
+                touched += len(rows)
+                if update is None: deleted += len(rows)
+            if part is not None and not self._dry_run and touched:
+                if self.ltm.partitions.finish_maintenance(part['month'], deleted) == 0:
+                    self.ltm.vectors.drop(part['month'])
+            if keep_going is not None and not keep_going(): break
+        return stats
+
+    def _apply(self, part, rows, update):
+        ids = [ev['event_id'] for ev in rows]
+        ph = ",".join(["?"] * len(ids))
+        if update:
+            with self._writer(part) as c:
+                c.execute(update.format(ph=ph), ids)
+            return
+        # 删除事件：先删关系、图谱聚合和向量，最后删 events 行 (events 行仍在时下一轮会重试)
+        with self.ltm.db.write() as c:
+            self._entities_removed += self.ltm.kg_writer.remove(c, ids)
+            c.execute(f"DELETE FROM pending_vectors WHERE event_id IN ({ph})", ids)
+        self.ltm.vectors.delete([(ev['event_id'], ev['start_time']) for ev in rows])
+        with self._writer(part) as c:
+            c.execute(f"DELETE FROM events_fts WHERE event_id IN ({ph})", ids)
+            c.execute(f"DELETE FROM events WHERE event_id IN ({ph})", ids)
+
+    # --- 文件 ---
+    def _remove_files(self, paths):
+        """删除文件并清理随之变空的事件目录 / 月份目录 (不越过图片根目录)，返回 (文件数, 字节数)"""
+        n, size = 0, 0
+        root = self.image_root.resolve()
+        for path in dict.fromkeys(paths):
+            path = Path(path)
+            if not path.exists() or path in self._planned: continue
+            n, size = n + 1, size + _size(path)
+            if self._dry_run:
+                # 同一文件在后续级别 / 磁盘水位清理中不重复计数
+                self._planned.add(path)
+                continue
+            path.unlink(missing_ok=True)
+            parent = path.parent
+            while parent != root and root in parent.parents:
+                try: parent.rmdir()
+                except OSError: break
+                parent = parent.parent
+        if self._dry_run: self._freed += size
+        return n, size
+
+    def _expire_dirs(self, root, cutoff, keep_going=None):
+        """删除检测日志中早于 cutoff 的整天目录 (YYYYMMDD)，从旧到新"""
+        stats = {"files": 0, "bytes": 0}
+        if cutoff is None or not root.exists(): return stats
+        limit = datetime.fromtimestamp(cutoff).strftime("%Y%m%d")
+        for day in sorted(d for d in root.iterdir() if d.is_dir() and d.name.isdigit() and d.name < limit):
+            if keep_going is not None and not keep_going(): break
+            files = list(day.iterdir())
+            size = sum(_size(f) for f in files)
+            self._merge(stats, {"files": len(files), "bytes": size})
+            if self._dry_run: self._freed += size
+            else: shutil.rmtree(day, ignore_errors=True)
+        return stats
+
+    def _expire_snapshots(self, cutoff):
+        stats = {"files": 0, "bytes": 0}
+        root = Path(config.ALERT_SNAPSHOT_DIR)
+        if cutoff is None or not root.exists(): return stats
+        old = [f for f in root.glob("*.jpg") if f.stat().st_mtime < cutoff]
+        n, size = len(old), sum(_size(f) for f in old)
+        if self._dry_run: self._freed += size
+        else:
+            for f in old: f.unlink(missing_ok=True)
+        return {"files": n, "bytes": size}
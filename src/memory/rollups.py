@@ -0,0 +1,144 @@
+# src/memory/rollups.py
+"""
+按摄像头的小时 / 天级统计汇总 (rollup_hourly / rollup_daily)。
+save_event 在同一事务中调用 apply_event 增量更新 (覆盖写入同一事件时先减去旧值)，
+看板与周/月趋势直接读汇总行，代价只与时间桶数量有关。历史数据可用 rebuild 重算。
+"""
+import itertools
+import json
+from datetime import datetime
+import config
+
+ROLLUP_TABLES = ("rollup_hourly", "rollup_daily")
+
+# 计数类字段 (可直接加减)
+_COUNTERS = ("event_count", "active_seconds", "rest_seconds", "risk_count", "social_count", "score_sum", "scored_count")
+# JSON 计数字典字段
+_HISTOGRAMS = ("score_hist", "label_counts", "person_counts")
+
+
+def is_risk(label, score):
+    return bool(label and ("风险" in label or "跌倒" in label)) or (score is not None and score >= 8)
+
+
+def is_rest(summary, label):
+    return bool(summary and ("躺" in summary or "睡" in summary)) or bool(label and "休息" in label)
+
+
+def bucket_starts(ts):
+    """事件开始时间所在的 (小时起点, 当天零点)，按本地时间"""
+    dt = datetime.fromtimestamp(ts)
+    return dt.replace(minute=0, second=0, microsecond=0).timestamp(), dt.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def event_contribution(event):
+    """单个事件对汇总行的贡献"""
+    score = event.get('interaction_score')
+    label = event.get('scene_label') or "日常"
+    duration = max(0.0, (event.get('end_time') or event['start_time']) - event['start_time'])
+    rest = is_rest(event.get('summary'), event.get('scene_label'))
+    persons = event.get('person_names') or []
+    if isinstance(persons, str): persons = json.loads(persons or "[]")
+    return {
+        "event_count": 1,
+        "active_seconds": 0.0 if rest else duration,
+        "rest_seconds": duration if rest else 0.0,
+        "risk_count": int(is_risk(event.get('scene_label'), score)),
+        "social_count": int(score is not None and score >= 4),
+        "score_sum": float(score or 0),
+        "scored_count": int(score is not None),
+        "score_hist": {str(min(10, max(0, int(round(score))))): 1} if score is not None else {},
+        "label_counts": {label: 1},
+        "person_counts": {p: 1 for p in persons},
+    }
+
+
+def _merge(row, contrib, sign):
+    for k in _COUNTERS:
+        row[k] = (row.get(k) or 0) + sign * contrib[k]
+    for k in _HISTOGRAMS:
+        hist = row.get(k) or {}
+        for key, n in contrib[k].items():
+            hist[key] = hist.get(key, 0) + sign * n
+            if hist[key] <= 0: del hist[key]
+        row[k] = hist
+    return row
+
+
+def _load(c, table, camera_id, bucket):
+    r = c.execute(f"SELECT * FROM {table} WHERE camera_id=? AND bucket_start=?", (camera_id, bucket)).fetchone()
+    if not r: return {}
+    row = {k: r[k] for k in _COUNTERS}
+    for k in _HISTOGRAMS: row[k] = json.loads(r[k] or "{}")
+    return row
+
+
+def _store(c, table, camera_id, bucket, row):
+    if row.get('event_count', 0) <= 0:
+        c.execute(f"DELETE FROM {table} WHERE camera_id=? AND bucket_start=?", (camera_id, bucket))
+        return
+    c.execute(f"""INSERT OR REPLACE INTO {table} (camera_id, bucket_start, {", ".join(_COUNTERS + _HISTOGRAMS)})
+                  VALUES (?, ?, {", ".join("?" * len(_COUNTERS + _HISTOGRAMS))})""",
+              [camera_id, bucket] + [row[k] for k in _COUNTERS] + [json.dumps(row[k], ensure_ascii=False) for k in _HISTOGRAMS])
+
+
+def apply_event(c, event, sign=1):
+    """把一个事件计入 (sign=1) 或移出 (sign=-1) 所在的小时与天汇总行，需在写事务中调用"""
+    contrib = event_contribution(event)
+    camera_id = event.get('camera_id') or config.CAMERA_ID
+    for table, bucket in zip(ROLLUP_TABLES, bucket_starts(event['start_time'])):
+        _store(c, table, camera_id, bucket, _merge(_load(c, table, camera_id, bucket), contrib, sign))
+
+
+def create_tables(c):
+    for table in ROLLUP_TABLES:
+        c.execute(f"""CREATE TABLE IF NOT EXISTS {table} (camera_id TEXT NOT NULL, bucket_start REAL NOT NULL,
+                      event_count INTEGER, active_seconds REAL, rest_seconds REAL, risk_count INTEGER, social_count INTEGER,
+                      score_sum REAL, scored_count INTEGER, score_hist TEXT, label_counts TEXT, person_counts TEXT,
+                      PRIMARY KEY (camera_id, bucket_start))""")
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_bucket ON {table}(bucket_start)")
+
+
+REBUILD_SQL = """SELECT start_time, end_time, summary, scene_label, interaction_score, camera_id, person_names
+                 FROM events ORDER BY start_time"""
+
+
+def rebuild(c, extra_events=()):
+    """按 events 表 (及 extra_events，如已封存分片中的事件) 全量重算汇总 (先在内存中累加，再整表写入)，返回事件数"""
+    rows = {table: {} for table in ROLLUP_TABLES}
+    n = 0
+    for r in itertools.chain(extra_events, c.execute(REBUILD_SQL).fetchall()):
+        event = dict(r)
+        contrib = event_contribution(event)
+        camera_id = event.get('camera_id') or config.CAMERA_ID
+        for table, bucket in zip(ROLLUP_TABLES, bucket_starts(event['start_time'])):
+            _merge(rows[table].setdefault((camera_id, bucket), {}), contrib, 1)
+        n += 1
+    for table in ROLLUP_TABLES:
+        c.execute(f"DELETE FROM {table}")
+        for (camera_id, bucket), row in rows[table].items():
+            _store(c, table, camera_id, bucket, row)
+    return n
+
+
+def query(c, table, start_ts, end_ts, camera_id=None):
+    """读取时间范围内的汇总行 (JSON 字段已解析)，按 bucket_start 排序"""
+    sql = f"SELECT * FROM {table} WHERE bucket_start >= ? AND bucket_start < ?"
+    params = [start_ts, end_ts]
+    if camera_id:
+        sql += " AND camera_id = ?"
+        params.append(camera_id)
+    result = []
+    for r in c.execute(sql + " ORDER BY bucket_start", params).fetchall():
+        row = dict(r)
+        for k in _HISTOGRAMS: row[k] = json.loads(row[k] or "{}")
+        result.append(row)
+    return result
+
+
+def combine(rows):
+    """合并多行汇总 (跨摄像头或跨时间桶)"""
+    total = {**{k: 0 for k in _COUNTERS}, **{k: {} for k in _HISTOGRAMS}}
+    for row in rows:
+        _merge(total, {**{k: row[k] for k in _COUNTERS}, **{k: row[k] for k in _HISTOGRAMS}}, 1)
+    return total
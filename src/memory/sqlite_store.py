@@ -0,0 +1,109 @@
+# src/memory/sqlite_store.py
+import logging
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteStore:
+    """
+    SQLite 连接管理 (WAL 模式)：
+    - 写：单一写连接，由 write() 串行化，退出时提交，异常时回滚
+    - 读：最多 max_readers 个只读连接组成的连接池，read() 借出、退出时归还 (同一线程嵌套调用复用同一连接)；
+      WAL 下读不阻塞写，写也不阻塞读。连接不随线程创建，Streamlit 等每次请求换线程的场景不会累积连接
+    """
+    def __init__(self, path, busy_timeout_ms=5000, max_readers=8):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(exist_ok=True, parents=True)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._idle = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(max_readers)
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+
+    def _connect(self, readonly=False):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=self.busy_timeout_ms / 1000)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if readonly: conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    @contextmanager
+    def write(self):
+        """串行化的写事务，yield 游标"""
+        with self._write_lock:
+            c = self._writer.cursor()
+            try:
+                yield c
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+
+    @contextmanager
+    def read(self):
+        """从连接池借出一个只读连接，yield 游标；池中连接都被占用时等待归还"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            # 同一线程嵌套调用：复用已借出的连接，避免占用多个名额而互相等待
+            c = conn.cursor()
+            try:
+                yield c
+            finally:
+                c.close()
+            return
+        self._reader_slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect(readonly=True)
+                with self._readers_lock: self._readers.append(conn)
+            self._local.conn = conn
+            c = conn.cursor()
+            try:
+                yield c
+            finally:
+                c.close()
+                self._local.conn = None
+                self._idle.put(conn)
+        finally:
+            self._reader_slots.release()
+
+    def user_version(self):
+        return self._writer.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self, migrations):
+        """
+        依次执行尚未应用的迁移。migrations 为 [(version, fn(cursor)), ...]，
+        每个迁移在独立事务中执行并同步更新 PRAGMA user_version。
+        """
+        with self._write_lock:
+            current = self.user_version()
+            for version, fn in sorted(migrations, key=lambda m: m[0]):
+                if version <= current: continue
+                logger.info(f"[SQLite] 执行迁移 v{version}: {fn.__doc__ or fn.__name__}")
+                with self.write() as c:
+                    c.execute("BEGIN")
+                    fn(c)
+                    c.execute(f"PRAGMA user_version={int(version)}")
+                current = version
+            return current
+
+    def close(self):
+        with self._readers_lock:
+            for conn in self._readers:
+                try: conn.close()
+                except Exception: pass
+            self._readers.clear()
+        with self._write_lock:
+            self._writer.close()
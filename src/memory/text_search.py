@@ -0,0 +1,37 @@
+# src/memory/text_search.py
+"""
+FTS5 全文检索的中文预分词。
+FTS5 自带的 unicode61 分词器会把连续汉字整体当作一个词，无法按子串命中；
+这里在入库和查询前把汉字切成单字 + 相邻二元组 (英文、数字按单词)，以空格分隔后交给 unicode61。
+"""
+import re
+
+_CJK = r"㐀-䶿一-鿿豈-﫿"
+_TOKEN_RE = re.compile(rf"[{_CJK}]+|[A-Za-z0-9_]+")
+_IS_CJK = re.compile(rf"[{_CJK}]")
+
+
+def cjk_tokens(text, unigrams=True):
+    tokens = []
+    for run in _TOKEN_RE.findall(text or ""):
+        if not _IS_CJK.match(run):
+            tokens.append(run.lower())
+            continue
+        if unigrams or len(run) == 1: tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def to_fts_document(*texts):
+    """入库：单字 + 二元组，保证任意长度的中文子串都能命中"""
+    return " ".join(t for text in texts for t in cjk_tokens(text))
+
+
+def to_fts_query(text):
+    """
+    查询：中文只用二元组 (单字过于宽泛，单字词除外)，各词 OR 连接，由 bm25 按命中数量与稀有度排序。
+    返回 None 表示没有可检索的词。
+    """
+    tokens = list(dict.fromkeys(cjk_tokens(text, unigrams=False)))
+    if not tokens: return None
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in tokens)
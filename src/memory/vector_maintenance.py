@@ -0,0 +1,119 @@
+# src/memory/vector_maintenance.py
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class VectorMaintenance:
+    """
+    按月分表的向量存储与事件分区的后台维护任务，每 LANCE_MAINTENANCE_INTERVAL 秒执行一次：
+    0. 把超出热库保留窗口的月份封存为只读分片 (PartitionManager.seal_due)
+    1. 对每个月份表 optimize：合并小 fragment、清理 LANCE_CLEANUP_OLDER_THAN_HOURS 之前的旧版本、把新写入的行并入已有索引
+    2. 行数超过 LANCE_INDEX_MIN_ROWS 且没有索引 (或索引覆盖率低于 LANCE_INDEX_MIN_COVERAGE) 时，重建 IVF-PQ 索引
+    已封存月份的表在清理掉封存前的旧版本后记入分区目录，此后跳过。
+    Lance 为多版本存储，维护期间的检索读取的是旧版本，不受影响。
+    每轮前后记录各表的 fragment 数、索引覆盖率与查询耗时。
+    """
+    def __init__(self, ltm, interval=None):
+        self.ltm = ltm
+        self.interval = interval if interval is not None else config.LANCE_MAINTENANCE_INTERVAL
+        self.last_report = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="vector-maintenance", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        if self._thread: self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"向量表维护失败: {e}")
+
+    @staticmethod
+    def _index_name(table):
+        for idx in table.list_indices():
+            if "vector" in idx.columns: return idx.name
+        return None
+
+    def stats(self, table):
+        """表的行数、fragment 数、索引覆盖率与探测查询耗时 (ms)"""
+        rows = table.count_rows()
+        try: fragments = table.stats()['fragment_stats']['num_fragments']
+        except Exception: fragments = None
+        coverage = 0.0
+        name = self._index_name(table)
+        if name:
+            s = table.index_stats(name)
+            if s:
+                total = s.num_indexed_rows + s.num_unindexed_rows
+                coverage = s.num_indexed_rows / total if total else 1.0
+        return {"rows": rows, "fragments": fragments, "index": name, "index_coverage": round(coverage, 3),
+                "query_ms": self._probe_latency(table, rows)}
+
+    def _probe_latency(self, table, rows, n=5):
+        if not rows: return None
+        dim = table.schema.field("vector").type.list_size
+        costs = []
+        for _ in range(n):
+            vec = [random.uniform(-1, 1) for _ in range(dim)]
+            t0 = time.perf_counter()
+            self.ltm._vector_query(vec, table).limit(5).to_list()
+            costs.append((time.perf_counter() - t0) * 1000)
+        return round(sorted(costs)[len(costs) // 2], 2)
+
+    def run_once(self):
+        with self._lock:
+            sealed = self.ltm.partitions.seal_due()
+            catalog = self.ltm.partitions.catalog()
+            report = {"sealed": sealed, "tables": {}, "time": time.time()}
+            for key, table in self.ltm.vectors.tables():
+                part = catalog.get(key)
+                frozen = bool(part and part['sealed_at'])
+                if frozen and part['vector_compacted_at']: continue
+                report["tables"][key] = self._maintain(key, table)
+                # 封存超过清理窗口后的一轮 optimize 已清掉封存前的全部旧版本，之后不再处理
+                if frozen and time.time() - part['sealed_at'] >= config.LANCE_CLEANUP_OLDER_THAN_HOURS * 3600:
+                    self.ltm.partitions.mark_vector_compacted(key)
+            self.last_report = report
+            return report
+
+    def _maintain(self, key, table):
+        before = self.stats(table)
+        table.optimize(cleanup_older_than=timedelta(hours=config.LANCE_CLEANUP_OLDER_THAN_HOURS))
+
+        rows = table.count_rows()
+        rebuilt = False
+        if rows >= config.LANCE_INDEX_MIN_ROWS:
+            name = self._index_name(table)
+            coverage = self.stats(table)['index_coverage'] if name else 0.0
+            if not name or coverage < config.LANCE_INDEX_MIN_COVERAGE:
+                self._build_index(table, rows)
+                rebuilt = True
+
+        after = self.stats(table)
+        logger.info(f"[向量维护] {key}: fragments {before['fragments']}->{after['fragments']}, "
+                    f"索引覆盖 {before['index_coverage']:.0%}->{after['index_coverage']:.0%}, "
+                    f"查询 {before['query_ms']}ms->{after['query_ms']}ms{' (重建索引)' if rebuilt else ''}")
+        return {"before": before, "after": after, "index_rebuilt": rebuilt}
+
+    @staticmethod
+    def _build_index(table, rows):
+        # 每个分区至少需要约 256 行训练数据
+        num_partitions = config.LANCE_INDEX_NUM_PARTITIONS or max(1, min(int(rows ** 0.5), rows // 256))
+        logger.info(f"[向量维护] 构建 IVF-PQ 索引: {rows} 行, {num_partitions} 个分区")
+        table.create_index(metric=config.LANCE_INDEX_METRIC, num_partitions=num_partitions,
+                           num_sub_vectors=config.LANCE_INDEX_NUM_SUB_VECTORS, index_type="IVF_PQ", replace=True)
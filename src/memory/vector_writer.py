@@ -0,0 +1,87 @@
+# src/memory/vector_writer.py
+import logging
+import queue
+import threading
+import time
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class VectorWriteBuffer:
+    """
+    LanceDB 向量写入缓冲 (write-behind)。
+    save_event 只把摘要放入队列，后台线程攒够 VECTOR_BATCH_SIZE 条或等待 VECTOR_FLUSH_SECONDS 后，
+    一次 encode 整批摘要并按月份一次 add 到向量表，避免每个事件单独生成一个 Lance fragment。
+    尚未写入的事件记录在 SQLite 的 pending_vectors 表中，写入成功后才删除，进程异常退出后可据此补写。
+    """
+    def __init__(self, ltm, batch_size=None, flush_seconds=None):
+        self.ltm = ltm
+        self.batch_size = batch_size or config.VECTOR_BATCH_SIZE
+        self.flush_seconds = flush_seconds if flush_seconds is not None else config.VECTOR_FLUSH_SECONDS
+        self._queue = queue.Queue()
+        self._flush_done = threading.Condition()
+        self._flush_seq = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="vector-writer", daemon=True)
+        self._thread.start()
+        self.batches = 0
+        self.rows = 0
+
+    def submit(self, row):
+        """row 为向量表中除 vector 以外的各列"""
+        self._queue.put(row)
+
+    def flush(self, timeout=None):
+        """立即写入缓冲中的全部向量并等待完成"""
+        with self._flush_done:
+            target = self._flush_seq + 1
+            self._queue.put("flush")
+            return self._flush_done.wait_for(lambda: self._flush_seq >= target, timeout)
+
+    def stop(self, timeout=None):
+        """写入剩余向量后停止 (用于程序退出)"""
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        pending = []
+        first_at = None
+        while True:
+            wait = None
+            if pending:
+                wait = max(0.0, first_at + self.flush_seconds - time.monotonic())
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = False  # 窗口到期
+
+            if isinstance(item, dict):
+                if not pending: first_at = time.monotonic()
+                pending.append(item)
+
+            window_due = pending and (item is False or time.monotonic() - first_at >= self.flush_seconds)
+            if pending and (len(pending) >= self.batch_size or window_due or item in ("flush", None)):
+                self._write(pending)
+                pending = []
+            if item == "flush":
+                with self._flush_done:
+                    self._flush_seq += 1
+                    self._flush_done.notify_all()
+            if item is None and self._stopped.is_set():
+                return
+
+    def _write(self, items):
+        try:
+            vecs = self.ltm.encoder.encode_many([it['summary'] for it in items])
+            rows = [{"vector": vec, **it} for it, vec in zip(items, vecs)]
+            self.ltm.vectors.add(rows)
+        except Exception as e:
+            # 记录仍保留在 pending_vectors 中，下次启动时补写
+            logger.error(f"向量批量写入失败 ({len(items)} 条): {e}")
+            return
+        self.ltm._clear_pending_vectors([it['event_id'] for it in items])
+        self.batches += 1
+        self.rows += len(items)
+        logger.info(f"[向量] 批量写入 {len(items)} 条，累计 {self.rows} 条 / {self.batches} 批")
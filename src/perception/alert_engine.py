@@ -0,0 +1,172 @@
+# src/perception/alert_engine.py
+import json
+import logging
+import queue
+import threading
+import urllib.request
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+import config
+from src.perception.risk_signals import box_ratio, box_center, box_diag, is_low_in_frame
+
+logger = logging.getLogger(__name__)
+
+
+def rules_for_camera(camera_id):
+    """默认规则叠加摄像头级覆盖配置"""
+    rules = dict(config.ALERT_RULES.get("default", {}))
+    rules.update(config.ALERT_RULES.get(camera_id, {}))
+    return rules
+
+
+class AlertEngine:
+    """
+    基于逐帧检测框的流式告警规则引擎，在主循环中同步调用，只做几何运算，耗时可忽略。
+    - fall: 同一轨迹在 fall_window 秒内由竖直变为横躺 (或骤降到画面下部)，并持续 fall_confirm 秒
+    - inactivity: 轨迹位移持续低于阈值超过 inactivity_seconds 秒 (横躺时使用更短的 lying_inactivity_seconds)
+    触发的告警经后台线程分发到各个 sink，并可交给 confirm_fn 异步请 LVM 复核。
+    """
+    def __init__(self, sinks=None, confirm_fn=None):
+        self.sinks = sinks or []
+        self.confirm_fn = confirm_fn
+        self._tracks = {}      # (camera_id, track_id) -> 状态
+        self._cooldowns = {}   # (camera_id, rule) -> 上次触发时间
+        self._outbox = queue.Queue()
+        threading.Thread(target=self._dispatch_loop, name="alert-dispatch", daemon=True).start()
+
+    def process(self, camera_id, timestamp, detections, frame_size=None, frame=None):
+        """处理一帧检测结果，返回本帧触发的告警列表"""
+        rules = rules_for_camera(camera_id)
+        frame_h = frame_size[1] if frame_size else 0
+        alerts = []
+        seen = set()
+
+        for det in detections:
+            key = (camera_id, det.get('track_id'))
+            seen.add(key)
+            st = self._tracks.setdefault(key, {"history": deque(), "still_since": timestamp, "lying_since": None, "anchor": det['box']})
+            box = det['box']
+            hist = st['history']
+            hist.append((timestamp, box))
+            while hist and timestamp - hist[0][0] > rules['fall_window']:
+                hist.popleft()
+
+            lying = box_ratio(box) > config.RISK_LYING_RATIO or (is_low_in_frame(box, frame_h) and self._dropped(hist, rules))
+            was_upright = any(box_ratio(b) < config.RISK_UPRIGHT_RATIO for _, b in hist)
+            if lying:
+                if st['lying_since'] is None and was_upright:
+                    st['lying_since'] = timestamp
+            else:
+                st['lying_since'] = None
+            if st['lying_since'] is not None and timestamp - st['lying_since'] >= rules['fall_confirm']:
+                alerts += self._fire(camera_id, "fall", timestamp, det, rules, "检测到疑似跌倒 (由竖直变为横躺)")
+                st['lying_since'] = None
+
+            # 静止判断：与静止起点的位移
+            ax, ay = box_center(st['anchor'])
+            cx, cy = box_center(box)
+            if ((cx - ax) ** 2 + (cy - ay) ** 2) ** 0.5 / box_diag(box) > rules['still_threshold']:
+                st['anchor'] = box
+                st['still_since'] = timestamp
+            limit = rules['lying_inactivity_seconds'] if box_ratio(box) > config.RISK_LYING_RATIO else rules['inactivity_seconds']
+            if timestamp - st['still_since'] >= limit:
+                alerts += self._fire(camera_id, "inactivity", timestamp, det, rules, f"已静止 {int(timestamp - st['still_since'])} 秒")
+
+        # 清理离开画面的轨迹
+        for key in [k for k in self._tracks if k[0] == camera_id and k not in seen]:
+            if timestamp - self._tracks[key]['history'][-1][0] > rules['track_timeout']:
+                del self._tracks[key]
+
+        for alert in alerts:
+            self._outbox.put((alert, frame))
+        return alerts
+
+    @staticmethod
+    def _dropped(hist, rules):
+        """窗口内人体中心下降超过一个框高度的 drop_ratio 倍"""
+        if len(hist) < 2: return False
+        (_, first), (_, last) = hist[0], hist[-1]
+        return box_center(last)[1] - box_center(first)[1] > (first[3] - first[1]) * rules['drop_ratio']
+
+    def _fire(self, camera_id, rule, timestamp, det, rules, message):
+        key = (camera_id, rule)
+        if key in self._cooldowns and timestamp - self._cooldowns[key] < rules['cooldown_seconds']:
+            return []
+        self._cooldowns[key] = timestamp
+        alert = {
+            "alert_id": f"{camera_id}_{rule}_{int(timestamp * 1000)}",
+            "type": rule, "camera_id": camera_id, "timestamp": timestamp,
+            "time": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+            "track_id": det.get('track_id'), "name": det.get('name'), "box": det['box'], "message": message
+        }
+        logger.warning(f"🚨 [告警] {alert['time']} {camera_id} {message} ({det.get('name')})")
+        return [alert]
+
+    def _dispatch_loop(self):
+        while True:
+            alert, frame = self._outbox.get()
+            if frame is not None:
+                alert['snapshot_path'] = self._save_snapshot(alert, frame)
+            self._emit(alert)
+            if self.confirm_fn and alert.get('snapshot_path'):
+                threading.Thread(target=self._confirm, args=(alert,), daemon=True).start()
+
+    def _save_snapshot(self, alert, frame):
+        try:
+            import cv2
+            path = Path(config.ALERT_SNAPSHOT_DIR)
+            path.mkdir(exist_ok=True, parents=True)
+            file = path / f"{alert['alert_id']}.jpg"
+            cv2.imwrite(str(file), frame)
+            return str(file.resolve())
+        except Exception as e:
+            logger.error(f"告警快照保存失败: {e}")
+            return None
+
+    def _confirm(self, alert):
+        """LVM 异步复核，结果作为一条新记录发往各 sink"""
+        try:
+            verdict = self.confirm_fn(alert)
+        except Exception as e:
+            logger.error(f"告警复核失败: {e}")
+            return
+        if verdict is None: return
+        self._emit({**alert, "type": f"{alert['type']}_confirmation", "confirmation": verdict})
+
+    def _emit(self, record):
+        for sink in self.sinks:
+            try: sink.send(record)
+            except Exception as e: logger.error(f"告警发送失败 ({type(sink).__name__}): {e}")
+
+
+class FileAlertSink:
+    """追加写入 JSON Lines 文件"""
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self._lock = threading.Lock()
+
+    def send(self, record):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class WebhookAlertSink:
+    """POST JSON 到本地 webhook (如家庭网关、Home Assistant)"""
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, record):
+        req = urllib.request.Request(self.url, data=json.dumps(record, ensure_ascii=False).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            resp.read()
+
+
+def build_alert_sinks():
+    sinks = []
+    if config.ALERT_LOG_PATH: sinks.append(FileAlertSink(config.ALERT_LOG_PATH))
+    if config.ALERT_WEBHOOK_URL: sinks.append(WebhookAlertSink(config.ALERT_WEBHOOK_URL))
+    return sinks
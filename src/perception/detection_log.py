@@ -0,0 +1,177 @@
+# src/perception/detection_log.py
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.compute as pc
+import config
+
+logger = logging.getLogger(__name__)
+
+# 每个检测框一行；无人的帧记一行 n_detections=0、其余列为空，保证每个处理过的帧都有记录
+SCHEMA = pa.schema([
+    ("timestamp", pa.float64()),
+    ("camera_id", pa.string()),
+    ("n_detections", pa.int16()),
+    ("track_id", pa.int64()),
+    ("name", pa.string()),
+    ("score", pa.float32()),
+    ("x1", pa.int32()), ("y1", pa.int32()), ("x2", pa.int32()), ("y2", pa.int32()),
+    ("face_box", pa.list_(pa.int32())),
+    ("frame_w", pa.int32()),
+    ("frame_h", pa.int32()),
+])
+
+_SUFFIX = ".arrows"
+
+
+def _hour_key(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y%m%d/%H")
+
+
+def _read_stream(path):
+    """读取一个 Arrow IPC 流文件；正在写入的文件只读到最后一个完整的 batch"""
+    batches = []
+    try:
+        with pa.OSFile(str(path), "rb") as f:
+            reader = pa.ipc.open_stream(f)
+            while True:
+                try: batches.append(reader.read_next_batch())
+                except StopIteration: break
+    except (pa.ArrowInvalid, OSError) as e:
+        if not batches: logger.warning(f"[DetectionLog] 跳过无法读取的文件 {path}: {e}")
+    return batches
+
+
+class DetectionLog:
+    """
+    逐帧检测日志 (Arrow IPC 流格式，zstd 压缩，按小时滚动)：
+    - append() 在主循环中调用，只把字段追加到内存列表
+    - 后台线程每 flush_rows 行或 flush_seconds 秒写一个 record batch
+    - 文件路径 <root>/<YYYYMMDD>/<HH>_<会话>.arrows，每次启动使用新的会话后缀，小时结束后关闭文件
+    读取见 read() / frames()，用于统计分析和离线回放事件切分。
+    """
+    def __init__(self, root=None, flush_rows=None, flush_seconds=None):
+        self.root = Path(root or config.DETECTION_LOG_PATH)
+        self.root.mkdir(exist_ok=True, parents=True)
+        self.flush_rows = flush_rows or config.DETECTION_LOG_FLUSH_ROWS
+        self.flush_seconds = flush_seconds or config.DETECTION_LOG_FLUSH_SECONDS
+        self._session = f"{int(time.time())}_{os.getpid()}"
+        self._rows = self._empty()
+        self._cond = threading.Condition()
+        self._writers = {}   # hour_key -> (sink, writer)
+        self._parts = {}     # hour_key -> 本次会话已打开的分片序号
+        self._options = pa.ipc.IpcWriteOptions(compression="zstd")
+        self._stopped = False
+        self._thread = threading.Thread(target=self._loop, name="detection-log", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _empty():
+        return {name: [] for name in SCHEMA.names}
+
+    def append(self, camera_id, timestamp, detections, frame_size=None):
+        w, h = frame_size or (None, None)
+        with self._cond:
+            rows = self._rows
+            for det in detections or [None]:
+                box = det['box'] if det else (None,) * 4
+                rows["timestamp"].append(timestamp)
+                rows["camera_id"].append(camera_id)
+                rows["n_detections"].append(len(detections or ()))
+                rows["track_id"].append(det.get('track_id') if det else None)
+                rows["name"].append(det.get('name') if det else None)
+                rows["score"].append(det.get('score') if det else None)
+                for k, v in zip(("x1", "y1", "x2", "y2"), box): rows[k].append(v)
+                rows["face_box"].append(det.get('face_box') if det else None)
+                rows["frame_w"].append(w)
+                rows["frame_h"].append(h)
+            if len(rows["timestamp"]) >= self.flush_rows: self._cond.notify()
+
+    # --- 后台写入 ---
+    def _loop(self):
+        while True:
+            with self._cond:
+                if not self._stopped and len(self._rows["timestamp"]) < self.flush_rows:
+                    self._cond.wait(self.flush_seconds)
+                rows, self._rows = self._rows, self._empty()
+                stopped = self._stopped
+            if rows["timestamp"]:
+                try:
+                    self._write(pa.RecordBatch.from_pydict(rows, schema=SCHEMA))
+                    self._roll(_hour_key(rows["timestamp"][-1]))
+                except Exception as e:
+                    logger.error(f"[DetectionLog] 写入失败，丢弃 {len(rows['timestamp'])} 行: {e}")
+            if stopped:
+                self._roll(None)
+                return
+
+    def _write(self, batch):
+        keys = [_hour_key(ts) for ts in batch.column("timestamp").to_pylist()]
+        start = 0
+        # 行按时间顺序追加，按小时切成连续片段分别写入对应文件
+        for i in range(1, len(keys) + 1):
+            if i == len(keys) or keys[i] != keys[start]:
+                self._writer(keys[start]).write_batch(batch.slice(start, i - start))
+                start = i
+
+    def _writer(self, key):
+        if key not in self._writers:
+            # 已关闭的小时又收到数据 (时钟回拨等) 时另起一个分片，不覆盖原文件
+            part = self._parts[key] = self._parts.get(key, -1) + 1
+            path = self.root / f"{key}_{self._session}{f'.{part}' if part else ''}{_SUFFIX}"
+            path.parent.mkdir(exist_ok=True, parents=True)
+            sink = pa.OSFile(str(path), "wb")
+            self._writers[key] = (sink, pa.ipc.new_stream(sink, SCHEMA, options=self._options))
+        return self._writers[key][1]
+
+    def _roll(self, current):
+        """关闭早于 current (最近写入的小时) 的文件，current=None 时全部关闭"""
+        for key in [k for k in self._writers if current is None or k < current]:
+            sink, writer = self._writers.pop(key)
+            writer.close()
+            sink.close()
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    # --- 读取 ---
+    def files(self, start_ts, end_ts):
+        """与 [start_ts, end_ts) 有交集的小时文件"""
+        result = []
+        hour = datetime.fromtimestamp(start_ts).replace(minute=0, second=0, microsecond=0)
+        while hour.timestamp() < end_ts:
+            result += sorted(self.root.glob(f"{hour.strftime('%Y%m%d/%H')}_*{_SUFFIX}"))
+            hour += timedelta(hours=1)
+        return result
+
+    def read(self, start_ts, end_ts, camera_id=None, columns=None):
+        """读取时间范围内的检测记录，返回按时间排序的 pyarrow.Table (过滤全部在 Arrow 中向量化完成)"""
+        batches = [b for path in self.files(start_ts, end_ts) for b in _read_stream(path)]
+        table = pa.Table.from_batches(batches, schema=SCHEMA) if batches else SCHEMA.empty_table()
+        mask = pc.and_(pc.greater_equal(table["timestamp"], start_ts), pc.less(table["timestamp"], end_ts))
+        if camera_id: mask = pc.and_(mask, pc.equal(table["camera_id"], camera_id))
+        table = table.filter(mask).sort_by("timestamp")
+        return table.select(columns) if columns else table
+
+    def frames(self, start_ts, end_ts, camera_id=None):
+        """
+        按帧回放：依次 yield (camera_id, timestamp, detections)，detections 与 PerceptionProcessor 的输出格式一致
+        (另含 track_id)，可直接驱动事件切分等逻辑而无需重新检测。
+        """
+        rows = self.read(start_ts, end_ts, camera_id).to_pylist()
+        i = 0
+        while i < len(rows):
+            head = rows[i]
+            n = max(1, head['n_detections'])
+            dets = [{"box": [r['x1'], r['y1'], r['x2'], r['y2']], "score": r['score'], "name": r['name'],
+                     "face_box": r['face_box'], "track_id": r['track_id']}
+                    for r in rows[i:i + n] if r['n_detections']]
+            yield head['camera_id'], head['timestamp'], dets
+            i += n
@@ -0,0 +1,93 @@
+# src/perception/risk_signals.py
+import math
+import config
+
+UNKNOWN_NAMES = ('Unknown', 'Unknown_Body')
+
+
+def box_ratio(box):
+    """宽高比：站立的人 < 1，躺倒的人 > 1"""
+    x1, y1, x2, y2 = box
+    return (x2 - x1) / max(y2 - y1, 1)
+
+
+def box_center(box):
+    return (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+
+
+def box_diag(box):
+    return math.hypot(box[2] - box[0], box[3] - box[1]) or 1.0
+
+
+def is_low_in_frame(box, frame_h):
+    """人体框整体位于画面下部 (顶部已低于画面 LOW_POSITION_RATIO 高度)，常见于跌倒或倒地"""
+    return frame_h > 0 and box[1] > frame_h * config.RISK_LOW_POSITION_RATIO
+
+
+def _nearest(box, candidates):
+    cx, cy = box_center(box)
+    return min(candidates, key=lambda b: math.hypot(box_center(b)[0] - cx, box_center(b)[1] - cy), default=None)
+
+
+def score_event_risk(frames, frame_size=None):
+    """
+    基于事件内检测框几何特征的本地风险评分 (0~1)，不调用任何模型：
+    - 宽高比突变：同一人从竖直 (站/坐) 变为横躺
+    - 人体位于画面下部
+    - 先有明显移动，随后长时间静止
+    - 未识别身份的人员
+    返回 (score, reasons)
+    """
+    frame_h = frame_size[1] if frame_size else 0
+    reasons = []
+    score = 0.0
+
+    flip = low = False
+    unknown = total = 0
+    moves = []  # (timestamp, 最大位移/对角线)
+    prev_boxes = None
+    for f in frames:
+        boxes = [d['box'] for d in f.get('detections', [])]
+        for d in f.get('detections', []):
+            total += 1
+            if d.get('name', 'Unknown_Body') in UNKNOWN_NAMES: unknown += 1
+        if any(is_low_in_frame(b, frame_h) for b in boxes): low = True
+        if prev_boxes:
+            step = 0.0
+            for b in boxes:
+                p = _nearest(b, prev_boxes)
+                if p is None: continue
+                if box_ratio(p) < config.RISK_UPRIGHT_RATIO and box_ratio(b) > config.RISK_LYING_RATIO:
+                    flip = True
+                step = max(step, math.hypot(box_center(b)[0] - box_center(p)[0], box_center(b)[1] - box_center(p)[1]) / box_diag(b))
+            moves.append((f.get('timestamp', 0), step))
+        prev_boxes = boxes
+
+    if flip:
+        score += 0.5
+        reasons.append("宽高比突变(疑似倒地)")
+    if low:
+        score += 0.25
+        reasons.append("人体位于画面下部")
+
+    # 最后一次明显移动之后的静止时长
+    last_motion = max((t for t, m in moves if m >= config.RISK_MOTION_THRESHOLD), default=None)
+    if last_motion is not None and moves:
+        still = moves[-1][0] - last_motion
+        if still >= config.RISK_STILLNESS_SECONDS:
+            score += 0.25
+            reasons.append(f"移动后静止 {int(still)}s")
+
+    if total and unknown / total > 0.8:
+        score += 0.15
+        reasons.append("存在未识别身份人员")
+
+    return min(score, 1.0), reasons
+
+
+def priority_for_score(score):
+    """风险分数映射为分析优先级：0 最高 (可抢占)，数字越大越靠后"""
+    for priority, threshold in enumerate(config.RISK_PRIORITY_THRESHOLDS):
+        if score >= threshold:
+            return priority
+    return len(config.RISK_PRIORITY_THRESHOLDS)
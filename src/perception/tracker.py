@@ -0,0 +1,74 @@
+# src/perception/tracker.py
+import itertools
+import math
+
+
+def box_iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _center_distance(a, b):
+    return math.hypot((a[0] + a[2]) / 2 - (b[0] + b[2]) / 2, (a[1] + a[3]) / 2 - (b[1] + b[3]) / 2)
+
+
+def _diag(box):
+    return math.hypot(box[2] - box[0], box[3] - box[1]) or 1.0
+
+
+class SimpleTracker:
+    """
+    轻量级 IoU 跟踪器：相邻处理帧之间按 IoU 贪心匹配人体框，为每个检测写入 track_id。
+    检测频率较低 (秒级)，人体移动幅度有限，贪心匹配已足够；IoU 匹配不上时再按中心距离兜底。
+    """
+    def __init__(self, iou_threshold=0.2, max_age_seconds=10, max_center_shift=1.0):
+        self.iou_threshold = iou_threshold
+        self.max_center_shift = max_center_shift
+        self.max_age_seconds = max_age_seconds
+        self._ids = itertools.count(1)
+        self._tracks = {}  # track_id -> {"box", "last_seen", "name"}
+
+    def update(self, detections, timestamp):
+        # 清理长时间未出现的轨迹
+        for tid in [t for t, tr in self._tracks.items() if timestamp - tr['last_seen'] > self.max_age_seconds]:
+            del self._tracks[tid]
+
+        pairs = []
+        for i, det in enumerate(detections):
+            for tid, tr in self._tracks.items():
+                iou = box_iou(det['box'], tr['box'])
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, i, tid))
+        pairs.sort(reverse=True)
+
+        used_dets, used_tracks = set(), set()
+        for iou, i, tid in pairs:
+            if i in used_dets or tid in used_tracks: continue
+            detections[i]['track_id'] = tid
+            used_dets.add(i)
+            used_tracks.add(tid)
+
+        # 第二轮：跌倒时框形状剧变、IoU 很低，按中心距离兜底匹配
+        for i, det in enumerate(detections):
+            if i in used_dets: continue
+            best = None
+            for tid, tr in self._tracks.items():
+                if tid in used_tracks: continue
+                dist = _center_distance(det['box'], tr['box']) / _diag(tr['box'])
+                if dist <= self.max_center_shift and (best is None or dist < best[0]):
+                    best = (dist, tid)
+            if best:
+                det['track_id'] = best[1]
+                used_dets.add(i)
+                used_tracks.add(best[1])
+
+        for i, det in enumerate(detections):
+            if i not in used_dets:
+                det['track_id'] = next(self._ids)
+            tr = self._tracks.setdefault(det['track_id'], {})
+            tr['box'] = det['box']
+            tr['last_seen'] = timestamp
+        return detections
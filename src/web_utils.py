@@ -2,6 +2,8 @@
 import logging
 import sqlite3
 import pandas as pd
+import numpy as np
+import cv2
 from datetime import datetime, timedelta
 import os
 import sys
@@ -15,6 +17,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 import config
 from src.memory.long_term_memory import LongTermMemory
+from src.memory import rollups
 from src.agent.master_agent import MasterAgent
 
 logger = logging.getLogger(__name__)
@@ -47,19 +50,11 @@ MEMORY = get_memory_instance()
 MASTER_AGENT = get_master_agent()
 
 # --- 辅助函数 ---
-def parse_summary(raw_summary):
-    """解析摘要字符串，提取 Label 和 Score"""
-    if not raw_summary: return "", "日常", 0
-    parts = raw_summary.split("|||")
-    text = parts[0]
-    label = "日常"
-    score = 0
-    for p in parts:
-        if p.startswith("LABEL:"): label = p.replace("LABEL:", "")
-        if p.startswith("SCORE:"): 
-            try: score = int(p.replace("SCORE:", ""))
-            except: pass
-    return text, label, score
+def event_fields(evt):
+    """事件的摘要、场景标签与评分 (标签缺省为“日常”，评分缺省为 0)"""
+    score = evt.get('interaction_score')
+    score = int(score) if score is not None and float(score).is_integer() else (score or 0)
+    return evt.get('summary') or "", evt.get('scene_label') or "日常", score
 
 # --- 核心数据统计 (Dashboard) ---
 def get_dashboard_stats():
@@ -75,48 +70,31 @@ def get_dashboard_stats():
     today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
     
     try:
-        with MEMORY.db_lock:
-            cursor = MEMORY.sqlite_conn.cursor()
-            
-            # 1. 事件统计
-            cursor.execute("SELECT start_time, end_time, summary FROM events WHERE start_time >= ? ORDER BY start_time", (today_start,))
-            rows = cursor.fetchall()
-            stats["event_count"] = len(rows)
-            
-            if rows:
-                max_gap = 0
-                last_end = rows[0][1]
-                for i, r in enumerate(rows):
-                    start, end, summary = r[0], r[1], r[2]
-                    text, label, score = parse_summary(summary)
-                    duration = end - start
-                    
-                    if "风险" in label or "跌倒" in label or score >= 8: stats["risk_count"] += 1
-                    if "躺" in text or "睡" in text or "休息" in label: stats["rest_hours"] += duration
-                    else: stats["active_hours"] += duration
-                    if score >= 4: stats["social_count"] += 1
-                        
-                    if i > 0:
-                        gap = start - last_end
-                        if gap > max_gap: max_gap = gap
-                    last_end = end
-                
-                curr_gap = datetime.now().timestamp() - rows[-1][1]
-                if curr_gap > max_gap: max_gap = curr_gap
+        # 1. 事件统计 (读当天的汇总行)
+        total = rollups.combine(MEMORY.get_rollups(today_start, today_start + 86400, granularity="day"))
+        stats["event_count"] = total["event_count"]
+        stats["risk_count"] = total["risk_count"]
+        stats["social_count"] = total["social_count"]
+        stats["rest_hours"] = round(total["rest_seconds"] / 3600, 1)
+        stats["active_hours"] = round(total["active_seconds"] / 3600, 1)
+        # 2. 家人统计 (非 Unknown)
+        stats["family_count"] = len([p for p in total["person_counts"] if "Unknown" not in p])
+
+        with MEMORY.db.read() as cursor:
+            if total["event_count"]:
+                # 相邻事件之间的最长间隔，以及最后一个事件到现在的间隔
+                cursor.execute("""
+                    SELECT MAX(start_time - prev_end) FROM (
+                        SELECT start_time, LAG(end_time) OVER (ORDER BY start_time) AS prev_end
+                        FROM events WHERE start_time >= ?)
+                """, (today_start,))
+                max_gap = cursor.fetchone()[0] or 0
+                cursor.execute("SELECT start_time, end_time FROM events WHERE start_time >= ? ORDER BY start_time DESC LIMIT 1", (today_start,))
+                last_start, last_end = cursor.fetchone()
+                max_gap = max(max_gap, datetime.now().timestamp() - last_end)
                 
                 stats["max_inactive_min"] = int(max_gap / 60)
-                stats["active_hours"] = round(stats["active_hours"] / 3600, 1)
-                stats["rest_hours"] = round(stats["rest_hours"] / 3600, 1)
-                stats["last_active"] = datetime.fromtimestamp(rows[-1][0]).strftime("%H:%M")
-
-            # 2. 家人统计 (非 Unknown)
-            cursor.execute("""
-                SELECT COUNT(DISTINCT e.name) FROM entities e
-                JOIN relationships r ON e.id = r.source_id OR e.id = r.target_id
-                JOIN events ev ON r.event_id = ev.event_id
-                WHERE ev.start_time >= ? AND e.type = 'Person' AND e.name NOT LIKE '%Unknown%'
-            """, (today_start,))
-            stats["family_count"] = cursor.fetchone()[0]
+                stats["last_active"] = datetime.fromtimestamp(last_start).strftime("%H:%M")
 
             # 3. 新知统计
             cursor.execute("""
@@ -151,34 +129,111 @@ def get_daily_insight_preview():
     return {"ready": True, "title": "✅ 今日日报已就绪", "content": summary}
 
 def get_interaction_trend():
-    """交互热度数据"""
+    """交互热度数据 (今日每小时平均评分)"""
     if not MEMORY: return pd.DataFrame()
-    today_start = datetime.now().replace(hour=0, minute=0, second=0).timestamp()
-    with MEMORY.db_lock:
-        cursor = MEMORY.sqlite_conn.cursor()
-        cursor.execute("SELECT start_time, summary FROM events WHERE start_time >= ? ORDER BY start_time", (today_start,))
-        rows = cursor.fetchall()
+    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    hours = {}
+    for row in MEMORY.get_rollups(today_start, today_start + 86400, granularity="hour"):
+        hours.setdefault(row['bucket_start'], []).append(row)
     data = []
-    for r in rows:
-        _, _, score = parse_summary(r[1])
-        data.append({"Time": datetime.fromtimestamp(r[0]).strftime("%H:%M"), "Score": score})
+    for bucket, rows in sorted(hours.items()):
+        total = rollups.combine(rows)
+        score = total["score_sum"] / total["scored_count"] if total["scored_count"] else 0
+        data.append({"Time": datetime.fromtimestamp(bucket).strftime("%H:%M"), "Score": round(score, 1)})
     return pd.DataFrame(data)
 
 def get_scene_distribution():
     """场景分布数据"""
     if not MEMORY: return pd.DataFrame()
-    today_start = datetime.now().replace(hour=0, minute=0, second=0).timestamp()
-    with MEMORY.db_lock:
-        cursor = MEMORY.sqlite_conn.cursor()
-        cursor.execute("SELECT summary FROM events WHERE start_time >= ?", (today_start,))
-        rows = cursor.fetchall()
-    labels = []
-    for r in rows:
-        _, label, _ = parse_summary(r[0])
-        labels.append(label)
+    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    labels = rollups.combine(MEMORY.get_rollups(today_start, today_start + 86400, granularity="day"))["label_counts"]
     if not labels: return pd.DataFrame()
-    from collections import Counter
-    return pd.DataFrame([{"Type": k, "Count": v} for k, v in Counter(labels).items()])
+    return pd.DataFrame([{"Type": k, "Count": v} for k, v in labels.items()])
+
+def get_rollup_trend(days=7):
+    """近 N 天的每日趋势：事件数、风险数、活跃/休息时长、平均评分"""
+    if not MEMORY: return pd.DataFrame()
+    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = (today_start - timedelta(days=days - 1)).timestamp()
+    by_day = {}
+    for row in MEMORY.get_rollups(start, today_start.timestamp() + 86400, granularity="day"):
+        by_day.setdefault(row['bucket_start'], []).append(row)
+    data = []
+    for bucket, rows in sorted(by_day.items()):
+        total = rollups.combine(rows)
+        data.append({
+            "Date": datetime.fromtimestamp(bucket).strftime("%m-%d"),
+            "Events": total["event_count"], "Risks": total["risk_count"],
+            "ActiveHours": round(total["active_seconds"] / 3600, 1), "RestHours": round(total["rest_seconds"] / 3600, 1),
+            "AvgScore": round(total["score_sum"] / total["scored_count"], 1) if total["scored_count"] else 0
+        })
+    return pd.DataFrame(data)
+
+def get_presence_today():
+    """今日在场时间线：(每人汇总, 区间列表) 两个 DataFrame"""
+    if not MEMORY: return pd.DataFrame(), pd.DataFrame()
+    now = datetime.now()
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    fmt = lambda ts: datetime.fromtimestamp(ts).strftime("%H:%M")
+    summary = [{"人物": r['person'], "首次出现": fmt(r['first_seen']), "最后出现": fmt(r['last_seen']),
+                "累计时长(分钟)": round(r['total_seconds'] / 60), "出现次数": r['interval_count']}
+               for r in MEMORY.presence.summary(start, now.timestamp())]
+    intervals = [{"Person": r['person'], "Camera": r['camera_id'],
+                  "Start": datetime.fromtimestamp(max(r['start_time'], start)),
+                  # 单帧区间补 1 分钟宽度，便于在图上显示
+                  "End": datetime.fromtimestamp(max(r['end_time'], r['start_time'] + 60))}
+                 for r in MEMORY.presence.intervals(start, now.timestamp())]
+    return pd.DataFrame(summary), pd.DataFrame(intervals)
+
+def get_occupancy_heatmap(days=1, person=None, camera_id=None):
+    """
+    近 N 天的活动热力图，叠加在该摄像头最近一张事件预览图上 (没有预览图时只画热力)。
+    返回 (RGB 图像, 覆盖时长小时数)；没有数据返回 (None, 0)。
+    """
+    if not MEMORY: return None, 0
+    camera_id = camera_id or config.CAMERA_ID
+    end = datetime.now().timestamp()
+    start = (datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)).timestamp()
+    grid, frames = MEMORY.heatmap.query(start, end, camera_id, person)
+    if not grid.any(): return None, 0
+
+    with MEMORY.db.read() as cursor:
+        cursor.execute("""SELECT preview_image_path FROM events WHERE camera_id = ? AND preview_image_path IS NOT NULL
+                          ORDER BY start_time DESC LIMIT 1""", (camera_id,))
+        row = cursor.fetchone()
+    background = cv2.imread(row[0]) if row and row[0] and os.path.exists(row[0]) else None
+    h, w = background.shape[:2] if background is not None else (grid.shape[0] * 10, grid.shape[1] * 10)
+
+    # 对数缩放，避免长时间停留的位置 (床、沙发) 把其他位置压成一片空白
+    heat = np.log1p(grid.astype(np.float32))
+    heat = cv2.GaussianBlur(cv2.resize(heat / heat.max(), (w, h), interpolation=cv2.INTER_LINEAR), (0, 0), max(w, h) / 100)
+    colored = cv2.applyColorMap((heat / (heat.max() or 1) * 255).astype(np.uint8), cv2.COLORMAP_JET)
+    if background is not None:
+        alpha = np.clip(heat / (heat.max() or 1) * 0.7, 0, 0.7)[..., None]
+        colored = (background * (1 - alpha) + colored * alpha).astype(np.uint8)
+    return cv2.cvtColor(colored, cv2.COLOR_BGR2RGB), round(frames * config.PROCESS_INTERVAL / 3600, 1)
+
+def get_heatmap_persons():
+    """热力图可选的人物 (在场时间线中出现过的已识别人员)"""
+    if not MEMORY: return []
+    return sorted(MEMORY.presence.known_persons())
+
+def list_archive_events(cursor=None, day=None, scene_label=None, person=None, page_size=24):
+    """影像回溯分页：返回 (events, next_cursor)"""
+    if not MEMORY: return [], None
+    filters = {}
+    if day:
+        filters['start_time'] = datetime.combine(day, datetime.min.time()).timestamp()
+        filters['end_time'] = datetime.combine(day, datetime.max.time()).timestamp()
+    if scene_label: filters['scene_labels'] = [scene_label]
+    if person: filters['person_names'] = [person]
+    return MEMORY.list_events(limit=page_size, cursor=cursor, **filters)
+
+def get_scene_labels():
+    """已出现过的场景标签 (用于筛选)"""
+    if not MEMORY: return []
+    rows = MEMORY.partitions.query("SELECT DISTINCT scene_label FROM events WHERE scene_label IS NOT NULL")
+    return sorted({r['scene_label'] for r in rows})
 
 def agent_answer_stream(query):
     """流式问答透传"""
@@ -207,7 +262,7 @@ def generate_daily_report_content(date_obj=None):
     context_lines = []
     for e in events:
         t = datetime.fromtimestamp(e['start_time']).strftime('%H:%M')
-        txt = e['summary'].split('|||')[0]
+        txt = e['summary']
         context_lines.append(f"- [{t}] {txt}")
     context_str = "\n".join(context_lines)
     
@@ -238,7 +293,9 @@ def generate_daily_report_content(date_obj=None):
             resp = MASTER_AGENT.llm_client.chat.completions.create(
                 model=config.LLM_MODEL_NAME, 
                 messages=[{"role": "user", "content": prompt}], 
-                temperature=0.6 # 稍微提高温度，让文笔更好
+                temperature=0.6, # 稍微提高温度，让文笔更好
+                request_timeout=config.LLM_REPORT_TIMEOUT,
+                deadline=config.LLM_REPORT_DEADLINE_SECONDS
             )
             return resp.choices[0].message.content
         return "Agent 未就绪。"
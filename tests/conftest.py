@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试直接 import config 和 src
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
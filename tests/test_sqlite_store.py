@@ -0,0 +1,81 @@
+import threading
+import pytest
+from src.memory.sqlite_store import SQLiteStore
+
+
+@pytest.fixture
+def db(tmp_path):
+    store = SQLiteStore(tmp_path / "t.db", max_readers=3)
+    with store.write() as c:
+        c.execute("CREATE TABLE t (x INTEGER)")
+    yield store
+    store.close()
+
+
+def test_write_commits_and_rolls_back(db):
+    with db.write() as c:
+        c.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(RuntimeError):
+        with db.write() as c:
+            c.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError
+    with db.read() as c:
+        assert [r[0] for r in c.execute("SELECT x FROM t")] == [1]
+
+
+def test_read_is_query_only(db):
+    with db.read() as c:
+        with pytest.raises(Exception):
+            c.execute("INSERT INTO t VALUES (1)")
+
+
+def test_readers_are_pooled_across_threads(db):
+    # 每次在新线程中读取 (类似 Streamlit 每次重跑换线程)，连接数不超过池大小
+    for _ in range(20):
+        t = threading.Thread(target=lambda: _read_once(db))
+        t.start()
+        t.join()
+    assert len(db._readers) == 1
+
+
+def test_pool_is_bounded_under_concurrency(db):
+    inside = threading.Barrier(3)
+    release = threading.Event()
+
+    def hold():
+        with db.read() as c:
+            c.execute("SELECT 1")
+            inside.wait()
+            release.wait()
+
+    threads = [threading.Thread(target=hold) for _ in range(3)]
+    for t in threads: t.start()
+    inside.wait(timeout=5)
+    # 池已满：第 4 个读者需等待归还
+    waiter = threading.Thread(target=lambda: _read_once(db))
+    waiter.start()
+    waiter.join(timeout=0.2)
+    assert waiter.is_alive()
+    release.set()
+    for t in threads + [waiter]: t.join(timeout=5)
+    assert len(db._readers) == 3
+
+
+def test_nested_read_reuses_connection(db):
+    with db.read() as outer:
+        with db.read() as inner:
+            assert outer.connection is inner.connection
+    assert len(db._readers) == 1
+
+
+def test_migrate_tracks_user_version(db):
+    calls = []
+    migrations = [(1, lambda c: calls.append(1)), (2, lambda c: c.execute("CREATE TABLE u (y)"))]
+    assert db.migrate(migrations) == 2
+    assert db.migrate(migrations) == 2
+    assert calls == [1]
+
+
+def _read_once(db):
+    with db.read() as c:
+        c.execute("SELECT 1").fetchone()
@@ -181,6 +181,52 @@ if nav == "📊 态势看板":
         else:
             st.caption("暂无数据")
 
+    st.divider()
+    st.subheader("📅 长期趋势")
+    period = st.radio("统计周期", ["近7天", "近30天"], horizontal=True, label_visibility="collapsed")
+    df_days = web_utils.get_rollup_trend(days=7 if period == "近7天" else 30)
+    if not df_days.empty:
+        hours = df_days.melt(id_vars="Date", value_vars=["ActiveHours", "RestHours"], var_name="Kind", value_name="Hours")
+        hours["Kind"] = hours["Kind"].map({"ActiveHours": "活跃", "RestHours": "休息"})
+        bars = alt.Chart(hours).mark_bar(opacity=0.7).encode(
+            x=alt.X('Date', title='日期'), y=alt.Y('Hours', title='时长 (小时)'),
+            color=alt.Color('Kind', title='', scale=alt.Scale(range=['#1a73e8', '#9aa0a6'])),
+            tooltip=['Date', 'Kind', 'Hours']
+        )
+        events = alt.Chart(df_days).mark_line(color='#e8710a', strokeWidth=2, point=True).encode(
+            x='Date', y=alt.Y('Events', title='事件数'), tooltip=['Date', 'Events', 'Risks', 'AvgScore']
+        )
+        st.altair_chart(alt.layer(bars, events).resolve_scale(y='independent'), use_container_width=True)
+    else:
+        st.caption("暂无数据")
+
+    st.divider()
+    st.subheader("👥 今日在场时间线")
+    df_who, df_intervals = web_utils.get_presence_today()
+    if not df_who.empty:
+        gantt = alt.Chart(df_intervals).mark_bar(cornerRadius=3, height=16).encode(
+            x=alt.X('Start', title='时间', axis=alt.Axis(format='%H:%M')), x2='End',
+            y=alt.Y('Person', title=''), color=alt.Color('Camera', title='摄像头', scale=alt.Scale(scheme='set2')),
+            tooltip=['Person', 'Camera', alt.Tooltip('Start', format='%H:%M'), alt.Tooltip('End', format='%H:%M')]
+        )
+        st.altair_chart(gantt, use_container_width=True)
+        st.dataframe(df_who, hide_index=True, use_container_width=True)
+    else:
+        st.caption("今日暂无已识别人员")
+
+    st.divider()
+    st.subheader("🗺️ 活动热力图")
+    h1, h2 = st.columns(2)
+    heat_period = h1.radio("热力图周期", ["今天", "近7天", "近30天"], horizontal=True, label_visibility="collapsed")
+    heat_person = h2.selectbox("人物", ["全部"] + web_utils.get_heatmap_persons(), label_visibility="collapsed")
+    heat_img, heat_hours = web_utils.get_occupancy_heatmap(
+        days={"今天": 1, "近7天": 7, "近30天": 30}[heat_period], person=None if heat_person == "全部" else heat_person
+    )
+    if heat_img is not None:
+        st.image(heat_img, caption=f"人体落脚点分布 (覆盖约 {heat_hours} 小时的画面，颜色越暖停留越久)", use_container_width=True)
+    else:
+        st.caption("暂无数据")
+
 # --- 2. 影像回溯 ---
 elif nav == "🎞️ 影像回溯":
     st.subheader("🎞️ 历史影像归档")
@@ -190,7 +236,7 @@ elif nav == "🎞️ 影像回溯":
             st.rerun()
         
         evt = web_utils.MEMORY.get_rich_event_details([st.session_state.selected_event_id])[0]
-        txt, lbl, score = web_utils.parse_summary(evt['summary'])
+        txt, lbl, score = web_utils.event_fields(evt)
         
         st.markdown(f"""
         <div style="background:white; padding:25px; border-radius:12px; box-shadow: 0 4px 12px rgba(0,0,0,0.05); margin-bottom:25px;">
@@ -211,7 +257,19 @@ elif nav == "🎞️ 影像回溯":
             for i, p in enumerate(paths):
                 if os.path.exists(p): cols[i%5].image(p, caption=f"Frame {i+1}", use_container_width=True)
     else:
-        events = web_utils.MEMORY.get_rich_event_details(limit=60)
+        # 筛选条件 (变化时重新从第一页加载)
+        f1, f2, f3 = st.columns(3)
+        day = f1.date_input("日期", value=None)
+        label = f2.selectbox("场景", ["全部"] + web_utils.get_scene_labels())
+        person = f3.text_input("人物", placeholder="姓名")
+        filters = (day, None if label == "全部" else label, person.strip() or None)
+        archive = st.session_state.get("archive")
+        if not archive or archive["filters"] != filters:
+            page, cursor = web_utils.list_archive_events(day=filters[0], scene_label=filters[1], person=filters[2])
+            archive = st.session_state.archive = {"filters": filters, "events": page, "cursor": cursor}
+        
+        events = archive["events"]
+        if not events: st.caption("暂无记录")
         cols_count = 4
         for i in range(0, len(events), cols_count):
             cols = st.columns(cols_count)
@@ -220,14 +278,20 @@ elif nav == "🎞️ 影像回溯":
                     evt = events[i+j]
                     with cols[j], st.container(border=True):
                         if evt['preview_image_path']: st.image(evt['preview_image_path'])
-                        t_str = datetime.fromtimestamp(evt['start_time']).strftime('%H:%M')
-                        txt, label, score = web_utils.parse_summary(evt['summary'])
+                        t_str = datetime.fromtimestamp(evt['start_time']).strftime('%m-%d %H:%M')
+                        txt, label, score = web_utils.event_fields(evt)
                         st.markdown(f"**{t_str}** <span style='float:right; font-size:12px; background:#f0f0f0; padding:2px 6px; border-radius:4px;'>⭐ {score}</span>", unsafe_allow_html=True)
                         st.caption(f"{label} | {txt[:12]}...")
                         if st.button("查看", key=evt['event_id'], use_container_width=True):
                             st.session_state.selected_event_id = evt['event_id']
                             st.session_state.view_mode = "detail"
                             st.rerun()
+        
+        if archive["cursor"] and st.button("⬇️ 加载更多", use_container_width=True):
+            page, cursor = web_utils.list_archive_events(archive["cursor"], *archive["filters"])
+            archive["events"] += page
+            archive["cursor"] = cursor
+            st.rerun()
 
 # --- 3. 报告生成 ---
 elif nav == "📝 报告生成":
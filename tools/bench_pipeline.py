@@ -0,0 +1,133 @@
+# tools/bench_pipeline.py
+"""
+离线端到端压测：在本地启动模型替身服务，驱动 CognitiveCore.analyze_event 与 MasterAgent 的回答生成，
+用客户端耗时减去服务端注入的延迟，得到我们自身的排队、解析与网关开销。
+
+用法:
+    python tools/bench_pipeline.py --events 50 --concurrency 4 --latency-median 0.5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from tools.mock_llm_server import MockConfig, start_server
+
+
+def _percentile(values, p):
+    if not values: return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def _summary(name, values):
+    return f"{name:<14} n={len(values):<4} p50={_percentile(values, 50)*1000:8.1f}ms  p95={_percentile(values, 95)*1000:8.1f}ms  mean={statistics.mean(values)*1000 if values else 0:8.1f}ms"
+
+
+def make_synthetic_event(tmp_dir, idx, n_frames=30):
+    """构造一个合成事件：图片内容对替身服务无意义，只需要存在"""
+    evt_dir = os.path.join(tmp_dir, f"evt_{idx:04d}")
+    os.makedirs(evt_dir, exist_ok=True)
+    start = time.time() - 60
+    frames = []
+    for i in range(n_frames):
+        path = os.path.join(evt_dir, f"frame_{i:03d}.jpg")
+        with open(path, "wb") as f:
+            f.write(os.urandom(2048))
+        frames.append({
+            "image_path": path, "timestamp": start + i * 2, "frame_hash": f"{(i * 0x9e3779b97f4a7c15) & (2**64 - 1):016x}",
+            "detections": [{"box": [100, 100, 220, 400], "score": 0.9, "name": "Unknown_Body", "face_box": None}]
+        })
+    return {"event_id": f"bench_{idx:04d}", "frames": frames, "start_time": frames[0]["timestamp"],
+            "end_time": frames[-1]["timestamp"], "preview_image_path": frames[0]["image_path"]}
+
+
+def fetch_server_stats(base_url):
+    with urllib.request.urlopen(base_url + "/stats") as resp:
+        return json.loads(resp.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HearthScribe 离线端到端压测")
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-median", type=float, default=0.3)
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--tps", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    mock_cfg = MockConfig(args.latency_median, args.latency_sigma, args.tps, args.error_rate)
+    server, base_url = start_server(mock_cfg)
+    tmp_dir = tempfile.mkdtemp(prefix="hearthscribe_bench_")
+
+    # 必须在创建任何客户端之前改写配置
+    config.LVM_BASE_URL = config.LLM_BASE_URL = base_url
+    config.LVM_API_KEY = config.LLM_API_KEY = "mock"
+    config.LLM_CACHE_PATH = os.path.join(tmp_dir, "llm_cache.db")
+    config.LLM_CACHE_BYPASS = True
+    config.LLM_RATE_LIMIT_RPS = 1000.0
+    config.LLM_RATE_LIMIT_BURST = 1000
+
+    from src.cognition.cognitive_core import CognitiveCore
+    cognition = CognitiveCore()
+    events = [make_synthetic_event(tmp_dir, i) for i in range(args.events)]
+
+    print(f"\n🧪 替身服务: {base_url} | 事件 {args.events} 个 | 并发 {args.concurrency}")
+
+    analyze_times, failures = [], 0
+    def run_one(evt):
+        t0 = time.perf_counter()
+        result = cognition.analyze_event(evt)
+        return time.perf_counter() - t0, result
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for elapsed, result in pool.map(run_one, events):
+            analyze_times.append(elapsed)
+            if not result or not result.get('summary'): failures += 1
+    wall = time.perf_counter() - wall
+    analyze_stats = fetch_server_stats(base_url)
+
+    # MasterAgent 的回答生成只依赖 llm_client，这里绕开记忆库直接测流式回答
+    from src.agent.master_agent import MasterAgent
+    agent = MasterAgent.__new__(MasterAgent)
+    agent.llm_client = cognition.llm_client
+    first_token, answer_times = [], []
+    for _ in range(args.queries):
+        t0 = time.perf_counter()
+        got_first = False
+        for _chunk in agent._generate_final_answer("今天发生了什么？", "【今日活动流水】:\n- [09:00] 长者在客厅看电视"):
+            if not got_first:
+                first_token.append(time.perf_counter() - t0)
+                got_first = True
+        answer_times.append(time.perf_counter() - t0)
+
+    stats = fetch_server_stats(base_url)
+    server.shutdown()
+
+    # 客户端耗时减去服务端注入的延迟 (含吐字时间)，即为排队、序列化、解析与网关开销
+    server_per_event = sum(analyze_stats["latencies"]) / max(args.events, 1)
+    overhead = [t - server_per_event for t in analyze_times]
+    print("\n=== 结果 ===")
+    print(_summary("analyze_event", analyze_times))
+    print(_summary("server_side", analyze_stats["latencies"]))
+    print(_summary("our_overhead", overhead))
+    print(_summary("answer_ttft", first_token))
+    print(_summary("answer_total", answer_times))
+    print(f"吞吐: {args.events / wall:.2f} 事件/秒 | 分析阶段请求 {analyze_stats['requests']} 次 ({analyze_stats['requests'] / max(args.events, 1):.2f} 次/事件) "
+          f"| 注入错误 {stats['errors']} | 分析失败 {failures}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# tools/mock_llm_server.py
+"""
+本地 OpenAI 兼容的模型替身服务，用于离线回归与端到端压测。
+
+实现 /chat/completions (含 stream=True 的 SSE)，延迟分布、吐字速度、错误率与返回内容均可配置。
+返回内容按请求类型给出符合 CognitiveCore._clean_and_parse_json 与 MasterAgent.execute_query_steps 预期的罐头数据：
+- 带图片的视觉请求 -> 摘要/场景标签/评分 JSON (Prompt 要求时附带实体与关系)
+- 知识图谱抽取请求 -> {"entities", "relationships"}；批量抽取请求按 event_id 分组返回
+- 意图分类请求     -> 路由名称
+- 其他             -> Markdown 文本
+
+用法:
+    python tools/mock_llm_server.py --port 8900 --latency-median 0.8 --latency-sigma 0.4 --tps 40 --error-rate 0.02
+    # .env 中设置 LVM_BASE_URL=LLM_BASE_URL=http://127.0.0.1:8900/v1
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSES = {
+    "vision": {
+        "summary": "画面中出现一人。长者坐在沙发上看电视，手边放着一杯水。",
+        "scene_label": "单人独处",
+        "interaction_score": 2
+    },
+    "vision_kg": {
+        "entities": [{"name": "长者", "type": "Person"}, {"name": "沙发", "type": "Object"}, {"name": "水杯", "type": "Object"}],
+        "relationships": [{"source": "长者", "relation": "坐在", "target": "沙发"}, {"source": "长者", "relation": "使用", "target": "水杯"}]
+    },
+    "kg": {
+        "entities": [{"name": "长者", "type": "Person"}, {"name": "沙发", "type": "Object"}],
+        "relationships": [{"source": "长者", "relation": "坐在", "target": "沙发"}]
+    },
+    "route": "memory_retrieval",
+    "text": "## 今日概况\n\n长者今天上午在客厅看电视，下午短暂休息，整体状态平稳。"
+}
+
+
+class MockConfig:
+    def __init__(self, latency_median=0.5, latency_sigma=0.3, tps=50.0, error_rate=0.0, error_status=429, responses=None):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.tps = tps
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.responses = dict(DEFAULT_RESPONSES)
+        if responses: self.responses.update(responses)
+        # 服务端记录的注入延迟，供压测脚本扣除后得到客户端自身开销
+        self.stats_lock = threading.Lock()
+        self.latencies = []
+        self.requests = 0
+        self.errors = 0
+
+    def sample_latency(self):
+        """对数正态分布：中位数 latency_median，离散度 latency_sigma"""
+        if self.latency_median <= 0: return 0.0
+        return random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+
+
+def _prompt_text(messages):
+    parts = []
+    has_image = False
+    for msg in messages or []:
+        content = msg.get('content')
+        if isinstance(content, list):
+            for item in content:
+                if item.get('type') == 'text': parts.append(item.get('text', ''))
+                elif item.get('type') == 'image_url': has_image = True
+        elif isinstance(content, str):
+            parts.append(content)
+    return "\n".join(parts), has_image
+
+
+def build_content(cfg, body):
+    """按请求类型挑选罐头响应，返回字符串内容"""
+    text, has_image = _prompt_text(body.get('messages'))
+    r = cfg.responses
+    if has_image:
+        data = dict(r["vision"])
+        if '"entities"' in text: data.update(r["vision_kg"])
+        return json.dumps(data, ensure_ascii=False)
+    if text.startswith("批量提取实体和关系"):
+        ids = re.findall(r'"event_id":\s*"([^"]+)"', text)
+        return json.dumps({"results": {eid: r["kg"] for eid in ids}}, ensure_ascii=False)
+    if text.startswith("提取实体和关系"):
+        return json.dumps(r["kg"], ensure_ascii=False)
+    if "意图分类" in text:
+        return r["route"]
+    return r["text"]
+
+
+def _tokens(content):
+    """粗略切分 token：中文按字，英文/数字按词"""
+    return re.findall(r'[一-鿿]|\w+|\s+|[^\w\s]', content) or [content]
+
+
+def make_handler(cfg):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            raw = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_GET(self):
+            if self.path.rstrip('/').endswith('/models'):
+                self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "local"}]})
+            elif self.path.rstrip('/').endswith('/stats'):
+                with cfg.stats_lock:
+                    lat = sorted(cfg.latencies)
+                    payload = {"requests": cfg.requests, "errors": cfg.errors, "latencies": lat}
+                self._send_json(200, payload)
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": {"message": "invalid json"}})
+                return
+
+            latency = cfg.sample_latency()
+            with cfg.stats_lock:
+                cfg.requests += 1
+            time.sleep(latency)
+
+            if random.random() < cfg.error_rate:
+                with cfg.stats_lock:
+                    cfg.errors += 1
+                self._send_json(cfg.error_status, {"error": {"message": "mock injected error", "type": "mock_error"}})
+                return
+
+            content = build_content(cfg, body)
+            tokens = _tokens(content)
+            model = body.get('model', 'mock')
+            cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            created = int(time.time())
+
+            if body.get('stream'):
+                self._stream(cid, created, model, tokens)
+            else:
+                time.sleep(len(tokens) / cfg.tps if cfg.tps > 0 else 0)
+                self._send_json(200, {
+                    "id": cid, "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)}
+                })
+            with cfg.stats_lock:
+                cfg.latencies.append(latency + (len(tokens) / cfg.tps if cfg.tps > 0 else 0))
+
+        def _stream(self, cid, created, model, tokens):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            interval = 1 / cfg.tps if cfg.tps > 0 else 0
+            for tok in tokens:
+                chunk = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                if interval: time.sleep(interval)
+            end = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                   "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            self.wfile.write(f"data: {json.dumps(end)}\n\ndata: [DONE]\n\n".encode('utf-8'))
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+def start_server(cfg, host="127.0.0.1", port=0):
+    """在后台线程启动服务，返回 (server, base_url)；port=0 时自动分配端口"""
+    server = ThreadingHTTPServer((host, port), make_handler(cfg))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HearthScribe 本地模型替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-median", type=float, default=0.5, help="首包延迟中位数 (秒)")
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="对数正态分布的离散度")
+    parser.add_argument("--tps", type=float, default=50.0, help="每秒输出 token 数，0 表示不限")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误的概率 (0~1)")
+    parser.add_argument("--error-status", type=int, default=429, help="注入错误的 HTTP 状态码")
+    parser.add_argument("--responses", help="覆盖罐头响应的 JSON 文件，键同 DEFAULT_RESPONSES")
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses, encoding='utf-8') as f:
+            responses = json.load(f)
+
+    cfg = MockConfig(args.latency_median, args.latency_sigma, args.tps, args.error_rate, args.error_status, responses)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(cfg))
+    server.daemon_threads = True
+    print(f"🧪 模型替身服务已启动: http://{args.host}:{args.port}/v1 (Ctrl+C 退出)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 服务停止")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+
+# 将项目根目录加入 Python 搜索路径，这样才能 import config 和 src
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from src.memory.sqlite_store import SQLiteStore
+from src.memory.migrations import MIGRATIONS
+from src.memory.heatmap import OccupancyHeatmap
+from src.perception.detection_log import DetectionLog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从逐帧检测日志重算活动热力图 (覆盖日志涉及的小时)")
+    parser.add_argument("--days", type=int, default=7, help="回填最近 N 天")
+    parser.add_argument("--db", default=config.SQLITE_DB_PATH, help="SQLite 数据库路径")
+    parser.add_argument("--log", default=config.DETECTION_LOG_PATH, help="检测日志目录")
+    args = parser.parse_args()
+
+    db = SQLiteStore(args.db)
+    log = DetectionLog(args.log)
+    try:
+        db.migrate(MIGRATIONS)
+        heatmap = OccupancyHeatmap(db)
+        end = datetime.now()
+        start = (end - timedelta(days=args.days)).replace(minute=0, second=0, microsecond=0)
+        # 按天读取，控制内存占用
+        t0, total_rows, total_grids = time.time(), 0, 0
+        day = start
+        while day < end:
+            table = log.read(day.timestamp(), min(day + timedelta(days=1), end).timestamp())
+            total_rows += table.num_rows
+            total_grids += heatmap.ingest(table, replace=True)
+            day += timedelta(days=1)
+        print(f"✅ 已处理 {total_rows} 行检测记录 -> {total_grids} 个小时网格 ({time.time() - t0:.2f}s)")
+    finally:
+        log.stop()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
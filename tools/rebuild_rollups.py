@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+import argparse
+
+# 将项目根目录加入 Python 搜索路径，这样才能 import config 和 src
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from src.memory.sqlite_store import SQLiteStore
+from src.memory.migrations import MIGRATIONS
+from src.memory.partitions import PartitionManager
+from src.memory import rollups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按 events 表 (含已封存分片) 全量重算小时 / 天级统计汇总 (rollup_hourly / rollup_daily)")
+    parser.add_argument("--db", default=config.SQLITE_DB_PATH, help="SQLite 数据库路径")
+    args = parser.parse_args()
+
+    # 只打开 SQLite，不加载向量模型
+    db = SQLiteStore(args.db)
+    try:
+        db.migrate(MIGRATIONS)
+        t0 = time.time()
+        partitions = PartitionManager(db)
+        archived = partitions.query(rollups.REBUILD_SQL, include_hot=False)
+        partitions.close()
+        with db.write() as c:
+            n = rollups.rebuild(c, archived)
+            hours = c.execute("SELECT COUNT(*) FROM rollup_hourly").fetchone()[0]
+            days = c.execute("SELECT COUNT(*) FROM rollup_daily").fetchone()[0]
+        print(f"✅ 已重算 {n} 个事件 -> {hours} 个小时桶, {days} 个天桶 ({time.time() - t0:.2f}s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import os
+import sys
+import json
+import argparse
+
+# 将项目根目录加入 Python 搜索路径，这样才能 import config 和 src
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from src.memory.long_term_memory import LongTermMemory
+from src.memory.retention import RetentionEngine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按保留策略清理事件图片、摘要、检测日志与告警快照 (默认只输出清理报告)")
+    parser.add_argument("--apply", action="store_true", help="实际执行清理")
+    args = parser.parse_args()
+
+    ltm = LongTermMemory(config.LANCEDB_PATH, config.SQLITE_DB_PATH)
+    try:
+        report = RetentionEngine(ltm).run_once(dry_run=not args.apply)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        if not args.apply: print("ℹ️ 以上为预计清理量，使用 --apply 执行")
+    finally:
+        ltm.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -64,22 +64,21 @@ def test_database():
         memory = LongTermMemory(config.LANCEDB_PATH, config.SQLITE_DB_PATH)
         
         # 简单查一下 SQLite
-        with memory.db_lock:
-            c = memory.sqlite_conn.cursor()
+        with memory.db.read() as c:
             c.execute("SELECT COUNT(*) FROM events")
             count = c.fetchone()[0]
+            # 查一条最新的看看
+            c.execute("SELECT summary, start_time FROM events ORDER BY start_time DESC LIMIT 1")
+            row = c.fetchone()
             
         print(f"✅ 数据库连接成功")
         if count > 0:
             print(f"✅ 数据库中已有 {GREEN}{count}{RESET} 条记忆片段。")
             
-            # 查一条最新的看看
-            c.execute("SELECT summary, start_time FROM events ORDER BY start_time DESC LIMIT 1")
-            row = c.fetchone()
             if row:
                 t_str = datetime.fromtimestamp(row[1]).strftime('%H:%M:%S')
                 # 简单清洗一下摘要显示
-                summary_preview = row[0].split("|||")[0][:50]
+                summary_preview = row[0][:50]
                 print(f"   📝 最新一条 ({t_str}): {summary_preview}...")
         else:
             print(f"{YELLOW}⚠️ 警告: 数据库是空的！{RESET}")